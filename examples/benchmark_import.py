@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measure the cold import time of the hcga modules, and the heavy dependencies they load.
+Each import is timed in a fresh interpreter, as for a new worker or command line call.
+"""
+
+import subprocess
+import sys
+import json
+
+modules = ['hcga', 'hcga.Operations', 'hcga.Operations.operations', 'hcga.graphs']
+heavy_modules = ['pandas', 'scipy.stats', 'statsmodels', 'matplotlib', 'seaborn', 'sklearn', 'fa2', 'multiprocessing.pool']
+n_repeats = 5
+
+code = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - start, [m for m in {heavy_modules} if m in sys.modules]]))
+"""
+
+for module in modules:
+    times = []
+    for repeat in range(n_repeats):
+        output = subprocess.check_output([sys.executable, '-c', code.format(module = module, heavy_modules = heavy_modules)])
+        import_time, loaded = json.loads(output.decode().strip().splitlines()[-1])
+        times.append(import_time)
+
+    print('{:30s} {:8.3f} s (min of {}), loads: {}'.format(module, min(times), n_repeats, ', '.join(loaded) if loaded else '-'))
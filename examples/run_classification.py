@@ -14,7 +14,7 @@ g = Graphs(directory='./datasets/', dataset=dataset)
 #g.graphs = [g.graphs[i] for i in graph_subset]
 #g.graph_labels = [g.graph_labels[i] for i in graph_subset]
 
-g.load_feature_matrix(filename = 'Output_' + dataset + '/feature_matrix.pkl' )
+g.load_feature_matrix(filename = 'Output_' + dataset + '/feature_matrix' )
 
 if dataset =='HELICENES':
     lab_mean = np.mean(g.graph_labels)
@@ -23,4 +23,4 @@ if not os.path.isdir('Output_' + dataset):
     os.mkdir('Output_' + dataset)
 
 #save the features
-g.save_feature_matrix(filename = 'Output_' + dataset + '/feature_matrix.pkl' )
+g.save_feature_matrix(filename = 'Output_' + dataset + '/feature_matrix' )
@@ -2,10 +2,18 @@
 
 .. moduleauthor:: Robert Peach
 
+The operation modules are imported when they are first accessed (or by the
+operation registry when the operation runs), so that importing this package
+does not load the dependencies of every operation.
+
 """
-import hcga.Operations.basic_stats
-import hcga.Operations.centrality_degree
-import hcga.Operations.centrality_eigenvector
-import hcga.Operations.clustering
-import hcga.Operations.communities_modularity
-import hcga.Operations.utils
\ No newline at end of file
+from importlib import import_module
+
+
+def __getattr__(name):
+    try:
+        return import_module('hcga.Operations.' + name)
+    except ModuleNotFoundError as error:
+        if error.name != 'hcga.Operations.' + name:
+            raise
+        raise AttributeError("module 'hcga.Operations' has no attribute {}".format(name))
@@ -21,13 +21,15 @@
 
 import numpy as np
 import networkx as nx
+from hcga.Operations.precomputed import Precomputed
 
 class Assortativity():
     """
     Assortativity class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -65,8 +67,8 @@ class Assortativity():
         N = G.number_of_nodes()
         
         # Compute some assortativity features
-        feature_list['degree_assortativity_coeff'] = nx.degree_assortativity_coefficient(G)
-        feature_list['degree_pearson_corr_coef'] = nx.degree_pearson_correlation_coefficient(G)
+        feature_list['degree_assortativity_coeff'] = self.precomputed.get('degree_assortativity_coefficient')
+        feature_list['degree_pearson_corr_coef'] = self.precomputed.get('degree_pearson_correlation_coefficient')
         
 
         self.features = feature_list
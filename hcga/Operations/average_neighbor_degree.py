@@ -21,14 +21,16 @@
 
 from networkx.algorithms import assortativity
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 import numpy as np
 
 class AverageNeighborDegree():
     """
     Average neighbor degree class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
         
@@ -67,7 +69,7 @@ class AverageNeighborDegree():
         G = self.G
         feature_list = {}
         #Calculate the average neighbor degree of each node
-        average_neighbor_degree = np.asarray(list(assortativity.average_neighbor_degree(G).values()))
+        average_neighbor_degree = self.precomputed.get('average_neighbor_degree')
         # Basic stats regarding the average neighbor degree distribution
         feature_list['mean'] = average_neighbor_degree.mean()
         feature_list['std'] = average_neighbor_degree.std()
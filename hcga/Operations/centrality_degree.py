@@ -22,6 +22,7 @@
 
 from networkx.algorithms import centrality
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 import numpy as np
 
 
@@ -31,8 +32,9 @@ class DegreeCentrality():
     Degree centrality class
     """
  
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = []
 
@@ -79,7 +81,7 @@ class DegreeCentrality():
         feature_list = {}
 
         #Calculate the degree centrality of each node
-        degree_centrality = np.asarray(list(centrality.degree_centrality(G).values()))
+        degree_centrality = self.precomputed.get('degree_centrality')
 
         # Basic stats regarding the degree centrality distribution
         feature_list['mean'] = degree_centrality.mean()
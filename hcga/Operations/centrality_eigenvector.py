@@ -23,16 +23,16 @@ from networkx.algorithms import centrality
 from hcga.Operations import utils
 import numpy as np
 import scipy as sp
+from hcga.Operations.precomputed import Precomputed
 
 
 class EigenCentrality():
     """
     Centrality eigenvector
     """
-    def __init__(self, G, eigens):
+    def __init__(self, G, precomputed = None):
         self.G = G
-        self.eigenvectors = eigens[1]
-        self.eigenvalues = eigens[0]
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         
         self.feature_names = []
         self.features = {}
@@ -60,8 +60,9 @@ class EigenCentrality():
         G : graph
           A networkx graph
 
-        eigens: numpy array
-            Numpy array 1 x N vector of eigenvectors
+        precomputed: Precomputed
+            precomputed data of the graph, with the eigenvalues and eigenvectors
+            of the adjacency matrix
         
 
 
@@ -97,11 +98,11 @@ class EigenCentrality():
 
         feature_list = {}
 
-        eigenvalues = self.eigenvalues
+        eigenvalues, eigenvectors = self.precomputed.get('eigens')
         
         
         # extract the precomputed eigenvectors from the operations object
-        eigenvector = self.eigenvectors[:,np.argmax(eigenvalues.real)]
+        eigenvector = eigenvectors[:,np.argmax(eigenvalues.real)]
             
         
         largest = eigenvector.flatten().real
@@ -19,8 +19,9 @@
 # You should have received a copy of the GNU General Public License
 # along with hcga.  If not, see <http://www.gnu.org/licenses/>.
 
-from fa2 import ForceAtlas2
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
+from hcga import layout
 import numpy as np
 
 
@@ -28,8 +29,9 @@ class ForceCentrality():
     """
     Force centrality class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -53,11 +55,16 @@ class ForceCentrality():
 
         Notes
         -----
-        This feature uses the force atlas package to create a force-directed graph.
-        
-        Force atlas computed using:
+        This feature uses force atlas to create a force-directed graph, and the
+        force centrality of a node is its distance to the centre of the layout,
+        averaged over several random starts.
+
+        Force atlas adapted from:
             `Force Atlas <https://github.com/bhargavchippada/forceatlas2>`_
 
+        All the random starts are computed at once (see hcga.layout), and stop
+        when the layout has converged.
+
         """
 
         # Defining the input arguments
@@ -72,34 +79,10 @@ class ForceCentrality():
         n_force = 20
         
         #find node position with force atlas, and distance to the center is the centrality
-        forceatlas2 = ForceAtlas2(
-                # Tuning
-                scalingRatio=2.0,
-                strongGravityMode=False,
-                gravity=1.0,
-                # Log
-                verbose=False)
-        
-        #producing a zero array in case force atlas fails.        
-        c = np.zeros(G.number_of_nodes())
-
-        try:
-            pos = forceatlas2.forceatlas2_networkx_layout(G, pos=None, iterations=2000)
-            c = np.linalg.norm(np.array(list(pos.values())),axis=1)        
-
-        except Exception as e:
-            print('Exception for centrality_force', e)
-            
-            
-        # this changes each time so we must average of n_force times
-        for i in range(n_force-1):
-            try:
-                pos = forceatlas2.forceatlas2_networkx_layout(G, pos=None, iterations=2000)
-                c += np.linalg.norm(np.array(list(pos.values())), axis=1)                    
-                c = -c/n_force
-
-            except Exception as e:
-                print('Exception for centrality_force (2nd)', e)
+        # this changes with the random start so we average over n_force starts
+        pos = layout.forceatlas2(self.precomputed.get('adjacency'), n_starts = n_force, iterations = 2000,
+                                 scaling_ratio = 2.0, gravity = 1.0, seed = 0)
+        c = np.linalg.norm(pos, axis = 2).mean(axis = 0)
 
 
         feature_list['mean']=np.mean(c)
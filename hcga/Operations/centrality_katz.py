@@ -21,14 +21,16 @@
 
 from networkx.algorithms import centrality
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 import numpy as np
 
 class KatzCentrality():
     """
     Eccentricity class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
         
@@ -67,7 +69,7 @@ class KatzCentrality():
         
         try:            
             #Calculate the Katz centrality of each node
-            katz_centrality = np.asarray(list(centrality.katz_centrality(G).values()))
+            katz_centrality = self.precomputed.get('katz_centrality')
             # Basic stats regarding the Katz centrality distribution
             feature_list['mean'] = katz_centrality.mean()
             feature_list['std'] = katz_centrality.std()
@@ -19,8 +19,9 @@
 # You should have received a copy of the GNU General Public License
 # along with hcga.  If not, see <http://www.gnu.org/licenses/>.
 
-from networkx.algorithms import centrality
+from hcga import random_walks
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 import numpy as np
 import networkx as nx
 
@@ -31,8 +32,9 @@ class SecondOrderCentrality():
     Second order centrality class
     """
  
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -57,7 +59,8 @@ class SecondOrderCentrality():
 
         Notes
         -----
-        Second order centrality calculations using networkx:
+        Second order centrality calculated as networkx, from sparse solves of the
+        grounded Laplacian instead of dense inversions (see hcga.random_walks):
             `Networkx_centrality <https://networkx.github.io/documentation/stable/reference/algorithms/centrality.html#second-order-centrality>`_ 
         """
         
@@ -70,7 +73,7 @@ class SecondOrderCentrality():
         
         if not nx.is_directed(G):
             # Calculate the second order centrality of each node
-            second_order_centrality = np.asarray(list(centrality.second_order_centrality(G).values()))
+            second_order_centrality = random_walks.second_order_centrality(self.precomputed.get('adjacency'))
         
             # Basic stats regarding the second order centrality distribution
             feature_list['mean'] = second_order_centrality.mean()
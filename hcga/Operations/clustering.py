@@ -22,14 +22,16 @@
 import pandas as pd
 import numpy as np
 import networkx as nx
+from hcga.Operations.precomputed import Precomputed
 
 class Clustering():
     """
     Clustering class
     """    
     
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -66,10 +68,10 @@ class Clustering():
         
         if not nx.is_directed(G):
             # Calculating number of triangles
-            feature_list['num_triangles']=np.asarray(list(nx.triangles(G).values())).mean()
+            feature_list['num_triangles']=self.precomputed.get('triangles').mean()
                 
             # graph transivity
-            C = nx.transitivity(G)
+            C = self.precomputed.get('transitivity')
             feature_list['transitivity'] = C
         else:
             feature_list['num_triangles'] = np.nan
@@ -77,9 +79,10 @@ class Clustering():
         
 
         # Average clustering coefficient
-        feature_list['clustering_mean']=nx.average_clustering(G)
-        feature_list['clustering_std']=np.asarray(list(nx.clustering(G).values())).std()
-        feature_list['clustering_median']=np.median(np.asarray(list(nx.clustering(G).values())))
+        clustering = self.precomputed.get('clustering')
+        feature_list['clustering_mean']=sum(clustering)/len(clustering)
+        feature_list['clustering_std']=clustering.std()
+        feature_list['clustering_median']=np.median(clustering)
 
 
         # generalised degree
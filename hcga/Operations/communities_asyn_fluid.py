@@ -22,21 +22,20 @@
 import numpy as np
 import networkx as nx
 
-from hcga.Operations.utils import clustering_quality
+from hcga.Operations.utils import partition_quality
+from hcga.Operations.precomputed import Precomputed
 
-from collections import Counter
 from networkx.exception import NetworkXError
-from networkx.algorithms.components import is_connected
-from networkx.utils import groups
-from networkx.utils import py_random_state
+from networkx.utils import np_random_state
 
 
 class AsynfluidCommunities():
     """
     Asyn fluid communities class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -84,14 +83,17 @@ class AsynfluidCommunities():
 
             qual_names = ['mod','coverage','performance','inter_comm_edge','inter_comm_nedge','intra_comm_edge']
 
-        
+            A = self.precomputed.get('adjacency')
+
+            # the communities for k are found from the ones for k-1
+            seed = np.random.RandomState(0)
+            labels = None
+
             for i in range(2,kmax):    
                  
                 #if not enough nodes, last elements are the max ones
-                if i > len(G): 
-                    c,density = list(asyn_fluidc(G,len(G)))       
-                else:
-                    c,density = list(asyn_fluidc(G,i))       
+                labels, density = asyn_fluidc(A, min(i, len(G)), seed = seed, labels = labels)
+                sizes = np.bincount(labels, minlength = len(density))
                 
                 #total density
                 feature_list['total_density_'+str(i)]=sum(density)
@@ -102,15 +104,15 @@ class AsynfluidCommunities():
 
 
                 # length of most dense community
-                feature_list['most_dense_'+str(i)]=len(c[np.argmax(density)])
+                feature_list['most_dense_'+str(i)]=sizes[np.argmax(density)]
 
                 
                 # length of least dense community
-                feature_list['least_dense_'+str(i)]=len(c[np.argmin(density)])
+                feature_list['least_dense_'+str(i)]=sizes[np.argmin(density)]
 
 
                 # clustering quality functions       
-                qual_names,qual_vals = clustering_quality(G,c)
+                qual_vals = partition_quality(A, labels)
 
                 
                 for j in range(len(qual_names)):
@@ -118,7 +120,7 @@ class AsynfluidCommunities():
                     
                     
                 # calculate size ratio of the top 2 largest communities
-                feature_list['num_nodes_ratio_'+str(i)]=(len(c[0])/len(c[1]))
+                feature_list['num_nodes_ratio_'+str(i)]=(sizes[0]/sizes[1])
 
         else:
             
@@ -147,9 +149,9 @@ class AsynfluidCommunities():
 
 
 
-@py_random_state(3)
-def asyn_fluidc(G, k, max_iter=100, seed=None):
-    """Returns communities in `G` as detected by Fluid Communities algorithm.
+@np_random_state(3)
+def asyn_fluidc(A, k, max_iter=100, seed=None, labels=None):
+    """Returns communities of a graph as detected by Fluid Communities algorithm.
 
     The asynchronous fluid communities algorithm is described in
     [1]_. The algorithm is based on the simple idea of fluids interacting
@@ -168,27 +170,40 @@ def asyn_fluidc(G, k, max_iter=100, seed=None):
     no vertex changes the community it belongs to, the algorithm has converged
     and returns.
 
-    This is the original version of the algorithm described in [1]_.
-    Unfortunately, it does not support weighted graphs yet.
+    This is the original version of the algorithm described in [1]_, on the
+    adjacency matrix of the graph. The number of vertices of each community in
+    the neighbourhood of each vertex is kept in an array, updated when a vertex
+    changes of community, so that the densities of all the communities around a
+    vertex are obtained with one vectorised product. It does not support
+    weighted graphs, the edge weights are ignored.
 
     Parameters
     ----------
-    G : Graph
+    A : sparse matrix
+        Adjacency matrix of a connected undirected graph.
 
     k : integer
         The number of communities to be found.
 
     max_iter : integer
-        The number of maximum iterations allowed. By default 15.
+        The number of maximum iterations allowed. By default 100.
 
     seed : integer, random_state, or None (default)
         Indicator of random number generation state.
         See :ref:`Randomness<randomness>`.
 
+    labels : array
+        Communities of the vertices found with less than k communities, used as
+        starting point (warm start). The missing communities are initialized in
+        random vertices of communities with more than one vertex.
+
     Returns
     -------
-    communities : iterable
-        Iterable of communities given as sets of nodes.
+    labels : array
+        Community of each vertex.
+
+    density : array
+        Density of each community.
 
     Notes
     -----
@@ -200,25 +215,53 @@ def asyn_fluidc(G, k, max_iter=100, seed=None):
        Competitive and Highly Scalable Community Detection Algorithm".
        [https://arxiv.org/pdf/1703.09307.pdf].
     """
+    import scipy.sparse
+    from scipy.sparse.csgraph import connected_components
+
+    n = A.shape[0]
+
     # Initial checks
-    if not isinstance(k, int):
+    if not isinstance(k, (int, np.integer)):
         raise NetworkXError("k must be an integer.")
     if not k > 0:
         raise NetworkXError("k must be greater than 0.")
-    if not is_connected(G):
+    if n == 0 or connected_components(A, directed=False)[0] != 1:
         raise NetworkXError("Fluid Communities require connected Graphs.")
-    if len(G) < k:
+    if n < k:
         raise NetworkXError("k cannot be bigger than the number of nodes.")
+
+    # Neighbourhood of each vertex, including itself
+    M = scipy.sparse.csr_matrix((np.ones(A.nnz), A.indices, A.indptr), shape=A.shape)
+    M = (M + scipy.sparse.identity(n)).tocsr()
+
     # Initialization
     max_density = 1.0
-    vertices = list(G)
-    seed.shuffle(vertices)
-    communities = {n: i for i, n in enumerate(vertices[:k])}
-    density = {}
-    com_to_numvertices = {}
-    for vertex in communities.keys():
-        com_to_numvertices[communities[vertex]] = 1
-        density[communities[vertex]] = max_density
+    labels = np.full(n, -1, dtype=np.int64) if labels is None else np.array(labels, dtype=np.int64)
+    com_to_numvertices = np.bincount(labels[labels >= 0], minlength=k)
+    if len(com_to_numvertices) > k:
+        raise NetworkXError("labels have more than k communities.")
+
+    # number of vertices of each community in the neighbourhood of each vertex
+    assigned = np.flatnonzero(labels >= 0)
+    P = scipy.sparse.csr_matrix((np.ones(len(assigned)), (assigned, labels[assigned])), shape=(n, k))
+    counts = (M @ P).toarray()
+
+    def move(vertex, new_com):
+        neighbours = M.indices[M.indptr[vertex]:M.indptr[vertex + 1]]
+        multiplicity = M.data[M.indptr[vertex]:M.indptr[vertex + 1]]
+        if labels[vertex] >= 0:
+            com_to_numvertices[labels[vertex]] -= 1
+            counts[neighbours, labels[vertex]] -= multiplicity
+        labels[vertex] = new_com
+        com_to_numvertices[new_com] += 1
+        counts[neighbours, new_com] += multiplicity
+
+    for com in np.flatnonzero(com_to_numvertices == 0):
+        candidates = np.flatnonzero((labels == -1) | (com_to_numvertices[labels] > 1))
+        move(seed.choice(candidates), com)
+
+    density = max_density / com_to_numvertices
+
     # Set up control variables and start iterating
     iter_count = 0
     cont = True
@@ -226,56 +269,30 @@ def asyn_fluidc(G, k, max_iter=100, seed=None):
         cont = False
         iter_count += 1
         # Loop over all vertices in graph in a random order
-        vertices = list(G)
-        seed.shuffle(vertices)
-        for vertex in vertices:
-            # Updating rule
-            com_counter = Counter()
-            # Take into account self vertex community
-            try:
-                com_counter.update({communities[vertex]:
-                                    density[communities[vertex]]})
-            except KeyError:
-                pass
-            # Gather neighbour vertex communities
-            for v in G[vertex]:
-                try:
-                    com_counter.update({communities[v]:
-                                        density[communities[v]]})
-                except KeyError:
-                    continue
+        for vertex in seed.permutation(n):
+            # Updating rule: density of the communities in the neighbourhood
+            # (zero for the communities not in the neighbourhood)
+            com_density = counts[vertex] * density
+            max_freq = com_density.max()
+            if max_freq == 0:
+                continue
+            # If actual vertex com in best communities, it is preserved
+            if labels[vertex] >= 0 and max_freq - com_density[labels[vertex]] < 0.0001:
+                continue
             # Check which is the community with highest density
-            new_com = -1
-            if len(com_counter.keys()) > 0:
-                max_freq = max(com_counter.values())
-                best_communities = [com for com, freq in com_counter.items()
-                                    if (max_freq - freq) < 0.0001]
-                # If actual vertex com in best communities, it is preserved
-                try:
-                    if communities[vertex] in best_communities:
-                        new_com = communities[vertex]
-                except KeyError:
-                    pass
-                # If vertex community changes...
-                if new_com == -1:
-                    # Set flag of non-convergence
-                    cont = True
-                    # Randomly chose a new community from candidates
-                    new_com = seed.choice(best_communities)
-                    # Update previous community status
-                    try:
-                        com_to_numvertices[communities[vertex]] -= 1
-                        density[communities[vertex]] = max_density / \
-                            com_to_numvertices[communities[vertex]]
-                    except KeyError:
-                        pass
-                    # Update new community status
-                    communities[vertex] = new_com
-                    com_to_numvertices[communities[vertex]] += 1
-                    density[communities[vertex]] = max_density / \
-                        com_to_numvertices[communities[vertex]]
+            best_communities = np.flatnonzero((counts[vertex] > 0) & (max_freq - com_density < 0.0001))
+            # Set flag of non-convergence
+            cont = True
+            # Randomly chose a new community from candidates
+            old_com = labels[vertex]
+            new_com = best_communities[seed.randint(len(best_communities))]
+            move(vertex, new_com)
+            # Update communities status
+            if old_com >= 0:
+                density[old_com] = max_density / com_to_numvertices[old_com]
+            density[new_com] = max_density / com_to_numvertices[new_com]
         # If maximum iterations reached --> output actual results
         if iter_count > max_iter:
             break
-    # Return results by grouping communities as list of vertices
-    return list(iter(groups(communities).values())), list(density.values())
+
+    return labels, density
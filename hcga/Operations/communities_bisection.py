@@ -20,21 +20,24 @@
 # along with hcga.  If not, see <http://www.gnu.org/licenses/>.
 
 import numpy as np
-from hcga.Operations.utils import clustering_quality
+from hcga.Operations.utils import clustering_quality, partition_quality
+from hcga.Operations.precomputed import Precomputed
 import networkx as nx
 
 from networkx.algorithms.community import kernighan_lin_bisection
+from networkx.utils import np_random_state
 
 class BisectionCommunities():
     """
     Bisection communities class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
-    def feature_extraction(self):
+    def feature_extraction(self, params = None):
         
         """Compute the measures based on the Kernighan–Lin Bisection communities algorithm.
 
@@ -43,6 +46,10 @@ class BisectionCommunities():
         G : graph
            A networkx graph
 
+        params: list
+            optional parameter from operations.csv: the bisection backend, 'multilevel'
+            (default, see multilevel_bisection) or 'kernighan_lin' (networkx)
+
         Returns
         -------
         feature_list : dict
@@ -59,31 +66,52 @@ class BisectionCommunities():
         
         This algorithm paritions a network into two sets by iteratively swapping pairs of nodes to reduce the edge cut between the two sets.
 
+        By default, the same balanced bisection is found with a multilevel scheme [2]_: the graph
+        is coarsened by matching its nodes, the coarsest graph is bisected, and the bisection is
+        refined with Fiduccia-Mattheyses passes at each level while the graph is uncoarsened.
+
         References
         ----------
         .. [1] Kernighan, B. W.; Lin, Shen (1970).
            "An efficient heuristic procedure for partitioning graphs."
            *Bell Systems Technical Journal* 49: 291--307.
            Oxford University Press 2011.
+        .. [2] Karypis, G.; Kumar, V. (1998).
+           "A fast and high quality multilevel scheme for partitioning irregular graphs."
+           *SIAM Journal on Scientific Computing* 20(1): 359--392.
 
         """
 
         G = self.G
 
+        backend = params[0] if params else 'multilevel'
+
         feature_list = {}
         
         if not nx.is_directed(G):
 
+            A = self.precomputed.get('adjacency')
 
-            c = list(kernighan_lin_bisection(G))        
-        
+            if backend == 'multilevel':
+                side = multilevel_bisection(A, seed = 0)
+                sizes = np.bincount(side, minlength = 2)
 
+                # clustering quality functions       
+                qual_names = ['mod','coverage','performance','inter_comm_edge','inter_comm_nedge','intra_comm_edge']
+                qual_vals = partition_quality(A, side)
+
+            elif backend == 'kernighan_lin':
+                c = list(kernighan_lin_bisection(G))        
+                sizes = [len(c[0]), len(c[1])]
+
+                # clustering quality functions       
+                qual_names,qual_vals = clustering_quality(G,c,A)           
+
+            else:
+                raise ValueError('Unknown bisection backend {}'.format(backend))
         
             # calculate ratio of the two communities
-            feature_list['node_ratio']=(len(c[0])/len(c[1]))
-        
-            # clustering quality functions       
-            qual_names,qual_vals = clustering_quality(G,c)           
+            feature_list['node_ratio']=(sizes[0]/sizes[1])
 
             for i in range(len(qual_names)):
                 feature_list[qual_names[i]]=qual_vals[i]
@@ -100,3 +128,219 @@ class BisectionCommunities():
 
 
         self.features = feature_list
+
+
+
+@np_random_state(3)
+def multilevel_bisection(A, max_iter = 10, coarsest_size = 40, seed = None):
+    """Balanced bisection of a graph minimising the edge cut, with a multilevel scheme
+
+    As networkx kernighan_lin_bisection, the first side has n // 2 nodes and the second
+    (n + 1) // 2 nodes, and the cut is the total weight of the edges between them.
+
+    The graph is coarsened by heavy edge matchings until it has at most coarsest_size nodes
+    (or the matchings stop reducing it), the coarsest graph is bisected along its Fiedler
+    vector, and the bisection is projected back level by level, refined at each level by
+    Fiduccia-Mattheyses passes. The coarse levels allow an imbalance of the largest node
+    weight, the finest level is exactly balanced.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        weighted adjacency matrix of an undirected graph
+    max_iter : int
+        maximum number of refinement passes at each level
+    coarsest_size : int
+        number of nodes under which the graph is not coarsened further
+    seed : integer, random_state, or None (default)
+        seed of the random order of the matchings
+
+    Returns
+    -------
+    side : array
+        side (0 or 1) of each node
+    """
+    import scipy.sparse
+
+    A = scipy.sparse.csr_matrix(A, dtype = float)
+    A = (A - scipy.sparse.diags(A.diagonal())).tocsr()
+    A.eliminate_zeros()
+
+    target = A.shape[0] // 2
+    node_weights = np.ones(A.shape[0])
+
+    # coarsening
+    levels = []
+    while A.shape[0] > coarsest_size:
+        labels = _heavy_edge_matching(A, seed)
+        n_coarse = labels.max() + 1
+        if n_coarse > 0.9 * A.shape[0]:
+            break
+
+        levels.append((A, node_weights, labels))
+        P = scipy.sparse.csr_matrix((np.ones(len(labels)), (np.arange(len(labels)), labels)),
+                                    shape = (len(labels), n_coarse))
+        A = (P.T @ A @ P).tocsr()
+        A = (A - scipy.sparse.diags(A.diagonal())).tocsr()
+        A.eliminate_zeros()
+        node_weights = P.T @ node_weights
+
+    # bisection of the coarsest graph, then refinement while uncoarsening
+    side = _initial_bisection(A, node_weights, target)
+    side = _fm_refinement(A, node_weights, side, target, node_weights.max() - 1, max_iter)
+
+    for A, node_weights, labels in reversed(levels):
+        side = _fm_refinement(A, node_weights, side[labels], target, node_weights.max() - 1, max_iter)
+
+    return side
+
+
+def _heavy_edge_matching(A, seed):
+    """Match each node, in random order, with its unmatched neighbour of heaviest edge
+
+    Returns the coarse node of each node
+    """
+
+    indptr, indices, data = A.indptr.tolist(), A.indices.tolist(), A.data.tolist()
+    labels = [-1] * A.shape[0]
+    n_coarse = 0
+
+    for node in seed.permutation(A.shape[0]).tolist():
+        if labels[node] != -1:
+            continue
+
+        match, match_weight = -1, -np.inf
+        for j in range(indptr[node], indptr[node + 1]):
+            if labels[indices[j]] == -1 and data[j] > match_weight:
+                match, match_weight = indices[j], data[j]
+
+        labels[node] = n_coarse
+        if match != -1:
+            labels[match] = n_coarse
+        n_coarse += 1
+
+    return np.array(labels)
+
+
+def _initial_bisection(A, node_weights, target, max_spectral_size = 500):
+    """Bisection along the Fiedler vector (or a breadth first order for large graphs),
+    with the first side of weight as close as possible to target
+    """
+    from scipy.sparse.csgraph import breadth_first_order
+
+    n = A.shape[0]
+    if n > max_spectral_size:
+        order = breadth_first_order(A, 0, directed = False, return_predecessors = False)
+        order = np.concatenate([order, np.setdiff1d(np.arange(n), order)])
+    elif n > 1:
+        adjacency = A.toarray()
+        laplacian = np.diag(adjacency.sum(axis = 1)) - adjacency
+        order = np.argsort(np.linalg.eigh(laplacian)[1][:, 1], kind = 'stable')
+    else:
+        order = np.arange(n)
+
+    cumulative_weights = np.concatenate([[0], np.cumsum(node_weights[order])])
+    n_first = np.argmin(np.abs(cumulative_weights - target))
+
+    side = np.ones(n, dtype = np.int64)
+    side[order[:n_first]] = 0
+
+    return side
+
+
+def _fm_refinement(A, node_weights, side, target, tolerance, max_iter, max_bad_moves = 100):
+    """Fiduccia-Mattheyses refinement of a bisection
+
+    Each pass moves the unlocked node of largest gain (decrease of the cut) whose move keeps
+    the weight of the first side within tolerance plus the largest node weight of target,
+    until max_bad_moves moves have not improved the best bisection, and goes back to the best
+    bisection met. Bisections within tolerance of target are better than the others, then the
+    ones with the smallest cut are better. The passes stop when they do not improve the bisection.
+    """
+    import heapq
+
+    n = A.shape[0]
+    indptr, indices, data = A.indptr.tolist(), A.indices.tolist(), A.data.tolist()
+    rows = np.repeat(np.arange(n), np.diff(A.indptr))
+    weights = node_weights.tolist()
+    max_weight = max(weights) if n > 0 else 0
+
+    side = np.asarray(side, dtype = np.int64)
+
+    def score(weight, cut):
+        return (max(0., abs(weight - target) - tolerance), cut)
+
+    for iteration in range(max_iter):
+        # gain of each node: weight of its external edges minus weight of its internal edges
+        external = side[rows] != side[A.indices]
+        gains = np.bincount(rows, weights = np.where(external, A.data, -A.data), minlength = n)
+        cut = A.data[external].sum() / 2
+        weight = node_weights[side == 0].sum()
+
+        gains = gains.tolist()
+        side = side.tolist()
+        heaps = ([], [])
+        for node in range(n):
+            heaps[side[node]].append((-gains[node], node))
+        heapq.heapify(heaps[0])
+        heapq.heapify(heaps[1])
+
+        locked = [False] * n
+        moves = []
+        best_score, n_best_moves = score(weight, cut), 0
+
+        while len(moves) - n_best_moves < max_bad_moves:
+            # the sides a node can be moved from
+            if weight > target + tolerance:
+                from_sides = [0]
+            elif weight < target - tolerance:
+                from_sides = [1]
+            else:
+                from_sides = [0, 1]
+
+            best = None
+            for from_side in from_sides:
+                heap = heaps[from_side]
+                while heap and (locked[heap[0][1]] or -heap[0][0] != gains[heap[0][1]]):
+                    heapq.heappop(heap)
+                if not heap:
+                    continue
+                node = heap[0][1]
+                new_weight = weight - weights[node] if from_side == 0 else weight + weights[node]
+                if abs(new_weight - target) > tolerance + max_weight and len(from_sides) > 1:
+                    continue
+                if best is None or gains[node] > gains[best]:
+                    best = node
+
+            if best is None:
+                break
+
+            node = best
+            heapq.heappop(heaps[side[node]])
+            locked[node] = True
+            weight += weights[node] if side[node] == 1 else -weights[node]
+            side[node] = 1 - side[node]
+            cut -= gains[node]
+            gains[node] = -gains[node]
+
+            for j in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[j]
+                if locked[neighbour]:
+                    continue
+                gains[neighbour] += -2 * data[j] if side[neighbour] == side[node] else 2 * data[j]
+                heapq.heappush(heaps[side[neighbour]], (-gains[neighbour], neighbour))
+
+            moves.append(node)
+            excess, new_cut = score(weight, cut)
+            if excess < best_score[0] or (excess == best_score[0] and new_cut < best_score[1] - 1e-10):
+                best_score, n_best_moves = (excess, new_cut), len(moves)
+
+        # go back to the best bisection of the pass
+        for node in moves[n_best_moves:]:
+            side[node] = 1 - side[node]
+        side = np.array(side, dtype = np.int64)
+
+        if n_best_moves == 0:
+            break
+
+    return side
@@ -21,17 +21,17 @@
 
 
 import numpy as np
-from hcga.Operations.utils import clustering_quality
+from hcga.Operations.utils import partition_quality
+from hcga.Operations.precomputed import Precomputed
 import networkx as nx
 
-from networkx.algorithms.community import label_propagation_communities
-
 class LabelpropagationCommunities():
     """
     Label propagation communities class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -54,6 +54,9 @@ class LabelpropagationCommunities():
         -----
         Implementation of networkx code:
             `Networkx_label_propagation <https://networkx.github.io/documentation/networkx-2.2/_modules/networkx/algorithms/community/label_propagation.html#label_propagation_communities>`_
+
+        The communities are the ones of networkx, computed on the adjacency matrix with
+        vectorised updates of the nodes of each colour (see semisynchronous_label_propagation).
     
 
         
@@ -77,17 +80,23 @@ class LabelpropagationCommunities():
         
         if not nx.is_directed(G):
     
-            c = list(label_propagation_communities(G))              
+            A = self.precomputed.get('adjacency')
+            labels = semisynchronous_label_propagation(A)
     
+            # communities in the order of their first node, as networkx
+            communities, first_nodes, labels, sizes = np.unique(labels, return_index = True,
+                                                                return_inverse = True, return_counts = True)
+            sizes = sizes[np.argsort(first_nodes)]
             
             # calculate ratio of the two communities
-            if len(c)>1:
-                feature_list['node_ratio']=(len(c[0])/len(c[1]))
+            if len(sizes)>1:
+                feature_list['node_ratio']=(sizes[0]/sizes[1])
             else:
                 feature_list['node_ratio']=0
             
             # clustering quality functions       
-            qual_names,qual_vals = clustering_quality(G,c)  
+            qual_names = ['mod','coverage','performance','inter_comm_edge','inter_comm_nedge','intra_comm_edge']
+            qual_vals = partition_quality(A, labels)
             
             for i in range(len(qual_names)):
                 feature_list[qual_names[i]]=qual_vals[i]         
@@ -106,3 +115,113 @@ class LabelpropagationCommunities():
             
 
         self.features = feature_list
+
+
+
+def semisynchronous_label_propagation(A):
+    """Communities of a graph found by semi-synchronous label propagation, from its adjacency matrix
+
+    Same algorithm and result as networkx label_propagation_communities, on the CSR arrays
+    of the adjacency matrix. The nodes are coloured greedily in decreasing order of degree,
+    so that neighbours have different colours. Each node starts with its own label, and the
+    nodes of each colour are updated together with the most frequent label of their
+    neighbours (with the Prec-Max tie breaking rule: the label is kept if it is one of the
+    most frequent, otherwise the largest one is taken), until every node has one of the
+    most frequent labels of its neighbours.
+
+    The frequencies of the neighbour labels of a set of nodes are obtained at once by
+    sorting the (node, label) pairs of their edges.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of an undirected graph
+
+    Returns
+    -------
+    labels : array
+        community label of each node (the index of one of its nodes)
+    """
+    import scipy.sparse
+
+    A = scipy.sparse.csr_matrix(A)
+    n = A.shape[0]
+    rows = np.repeat(np.arange(n), np.diff(A.indptr))
+    has_neighbours = np.diff(A.indptr) > 0
+
+    colours = _greedy_colouring(A)
+    colour_edges = [np.flatnonzero(colours[rows] == colour) for colour in range(colours.max() + 1 if n else 0)]
+
+    labels = np.arange(n)
+    while not _labeling_complete(rows, A.indices, labels, has_neighbours):
+        # Update the labels of every node with the same colour.
+        for edges in colour_edges:
+            nodes, best_labels = _best_labels(rows[edges], A.indices[edges], labels)
+            labels[nodes] = best_labels
+
+    return labels
+
+
+def _greedy_colouring(A):
+    """Greedy colouring of the nodes in decreasing order of degree (largest_first of networkx)"""
+
+    n = A.shape[0]
+    indptr, indices = A.indptr.tolist(), A.indices.tolist()
+
+    # self-loops count twice in the degrees
+    degrees = np.diff(A.indptr) + (A.diagonal() != 0)
+    colours = [-1] * n
+    for node in np.argsort(-degrees, kind = 'stable').tolist():
+        neighbour_colours = {colours[neighbour] for neighbour in indices[indptr[node]:indptr[node + 1]]}
+        colour = 0
+        while colour in neighbour_colours:
+            colour += 1
+        colours[node] = colour
+
+    return np.array(colours, dtype = np.int64)
+
+
+def _neighbour_label_frequencies(rows, cols, labels):
+    """Frequencies of the labels of the neighbours of the nodes, for the edges (rows, cols)
+
+    Returns the arrays of (node, label, frequency) sorted by node and label, and the mask
+    of the labels of largest frequency for each node
+    """
+
+    n = len(labels)
+    pairs, frequencies = np.unique(rows * n + labels[cols], return_counts = True)
+    nodes, neighbour_labels = pairs // n, pairs % n
+
+    starts = np.flatnonzero(np.concatenate([[True], nodes[1:] != nodes[:-1]])) if len(nodes) else np.array([], dtype = int)
+    max_frequencies = np.maximum.reduceat(frequencies, starts) if len(nodes) else frequencies
+    is_max = frequencies == np.repeat(max_frequencies, np.diff(np.append(starts, len(nodes))))
+
+    return nodes, neighbour_labels, is_max
+
+
+def _best_labels(rows, cols, labels):
+    """New labels of the nodes of the edges (rows, cols), with Prec-Max tie breaking"""
+
+    nodes, neighbour_labels, is_max = _neighbour_label_frequencies(rows, cols, labels)
+    nodes, neighbour_labels = nodes[is_max], neighbour_labels[is_max]
+
+    # the last most frequent label of each node is the largest one
+    last = np.append(nodes[1:] != nodes[:-1], True)
+    best_nodes, best_labels = nodes[last], neighbour_labels[last]
+
+    # the current label is kept if it is one of the most frequent
+    keep = np.zeros(len(labels), dtype = bool)
+    keep[nodes[neighbour_labels == labels[nodes]]] = True
+    best_labels = np.where(keep[best_nodes], labels[best_nodes], best_labels)
+
+    return best_nodes, best_labels
+
+
+def _labeling_complete(rows, cols, labels, has_neighbours):
+    """Whether every node with neighbours has one of the most frequent labels of its neighbours"""
+
+    nodes, neighbour_labels, is_max = _neighbour_label_frequencies(rows, cols, labels)
+    complete = np.zeros(len(labels), dtype = bool)
+    complete[nodes[is_max & (neighbour_labels == labels[nodes])]] = True
+
+    return bool(np.all(complete[has_neighbours]))
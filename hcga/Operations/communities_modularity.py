@@ -20,21 +20,24 @@
 # along with hcga.  If not, see <http://www.gnu.org/licenses/>.
 
 import numpy as np
-from hcga.Operations.utils import clustering_quality
+from hcga.Operations.utils import clustering_quality, partition_quality
+from hcga.Operations.precomputed import Precomputed
 import networkx as nx
 
 from networkx.algorithms.community import greedy_modularity_communities
+from networkx.utils import np_random_state
 
 class ModularityCommunities():
     """
     Modularity communities class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
-    def feature_extraction(self):
+    def feature_extraction(self, params = None):
 
         """
         
@@ -46,10 +49,16 @@ class ModularityCommunities():
         and joins the pair of communities that most increases modularity until no
         such pair exists.
 
+        The Louvain method [3]_ can be used instead, for large graphs (see louvain_communities).
+
         Parameters
         ----------
         G : NetworkX graph
 
+        params: list
+            optional parameter from operations.csv: the community detection backend,
+            'greedy' (default) or 'louvain'
+
         Returns
         -------
         feature_list:  dict
@@ -67,33 +76,50 @@ class ModularityCommunities():
         .. [2] Clauset, A., Newman, M. E., & Moore, C.
            "Finding community structure in very large networks."
            Physical Review E 70(6), 2004.
+        .. [3] Blondel, V.D. et al. "Fast unfolding of communities in
+           large networks" J. Stat. Mech 10008, 1-12 (2008).
         """
         
         
         G = self.G
 
+        backend = params[0] if params else 'greedy'
+
         feature_list = {}
         
         if not nx.is_directed(G):
 
+            A = self.precomputed.get('adjacency')
     
             # The optimised number of communities using greedy modularity
-            c = list(greedy_modularity_communities(G))
+            if backend == 'greedy':
+                c = list(greedy_modularity_communities(G))
+                sizes = [len(comm) for comm in c]
+
+                # clustering quality functions       
+                qual_names,qual_vals = clustering_quality(G,c,A)      
+
+            elif backend == 'louvain':
+                labels = louvain_communities(A, seed = 0)
+                sizes = sorted(np.bincount(labels), reverse = True)
+
+                qual_names = ['mod','coverage','performance','inter_comm_edge','inter_comm_nedge','intra_comm_edge']
+                qual_vals = partition_quality(A, labels)
+
+            else:
+                raise ValueError('Unknown modularity backend {}'.format(backend))
             
             # calculate number of communities
-            feature_list['num_comms_greedy_mod']=len(c)  
+            feature_list['num_comms_greedy_mod']=len(sizes)  
         
             # calculate ratio of largest to smallest community
-            feature_list['ratio_max_min_num_nodes']=(len(c[0])/len(c[-1]))      
+            feature_list['ratio_max_min_num_nodes']=(sizes[0]/sizes[-1])      
         
             # calculate ratio of largest to 2nd largest community
-            if len(c)>1:
-                feature_list['ratio_max_2max_num_nodes']=(len(c[0])/len(c[1]))
+            if len(sizes)>1:
+                feature_list['ratio_max_2max_num_nodes']=(sizes[0]/sizes[1])
             else:
                 feature_list['ratio_max_2max_num_nodes']=np.nan
-        
-            # clustering quality functions       
-            qual_names,qual_vals = clustering_quality(G,c)      
                 
             for i in range(len(qual_names)):
                 feature_list[qual_names[i]]=qual_vals[i]   
@@ -111,3 +137,93 @@ class ModularityCommunities():
 
 
         self.features = feature_list
+
+
+
+@np_random_state(2)
+def louvain_communities(A, resolution = 1, seed = None, threshold = 1e-7):
+    """Communities of a graph found with the Louvain method, from its adjacency matrix
+
+    Each node starts in its own community. In random order, each node is moved to the
+    neighbouring community with the largest modularity gain, until no move increases the
+    modularity by more than threshold. The communities are then merged into the nodes of a
+    new graph, with the block edge weights as edges, and the procedure is repeated until
+    the communities do not change.
+
+    As the greedy modularity maximisation of networkx, the edge weights are not considered.
+    The moves of each level are done on the CSR arrays of the adjacency matrix (as lists,
+    faster than numpy for the few neighbours of a node), and the aggregation of the
+    communities is a sparse matrix product.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of an undirected graph
+    resolution : float
+        resolution parameter of the modularity
+    seed : integer, random_state, or None (default)
+        seed of the random order of the nodes
+    threshold : float
+        minimal gain of modularity (times the number of edges) of a move
+
+    Returns
+    -------
+    labels : array
+        community of each node
+    """
+    import scipy.sparse
+
+    A = scipy.sparse.csr_matrix((np.ones(A.nnz), A.indices, A.indptr), shape = A.shape)
+    # self-loops count twice in the degrees
+    A = (A + scipy.sparse.diags(A.diagonal())).tocsr()
+
+    node_labels = np.arange(A.shape[0])
+    total_degree = A.sum()
+    if total_degree == 0:
+        return node_labels
+
+    while True:
+        n = A.shape[0]
+        indptr, indices, data = A.indptr.tolist(), A.indices.tolist(), A.data.tolist()
+        degrees = np.asarray(A.sum(axis = 1)).ravel().tolist()
+        labels = list(range(n))
+        community_degrees = list(degrees)
+
+        improved = False
+        moved = True
+        while moved:
+            moved = False
+            for node in seed.permutation(n).tolist():
+                # weights of the edges to each neighbouring community
+                community_weights = {}
+                for j in range(indptr[node], indptr[node + 1]):
+                    if indices[j] != node:
+                        community = labels[indices[j]]
+                        community_weights[community] = community_weights.get(community, 0.) + data[j]
+
+                old_community = labels[node]
+                community_degrees[old_community] -= degrees[node]
+                scale = resolution * degrees[node] / total_degree
+
+                new_community = old_community
+                best_gain = community_weights.get(old_community, 0.) - community_degrees[old_community] * scale + threshold
+                for community, weight in community_weights.items():
+                    gain = weight - community_degrees[community] * scale
+                    if gain > best_gain:
+                        new_community, best_gain = community, gain
+
+                if new_community != old_community:
+                    moved = improved = True
+                labels[node] = new_community
+                community_degrees[new_community] += degrees[node]
+
+        if not improved:
+            break
+
+        # aggregate the communities into nodes
+        communities, labels = np.unique(labels, return_inverse = True)
+        node_labels = labels[node_labels]
+        P = scipy.sparse.csr_matrix((np.ones(n), (np.arange(n), labels)), shape = (n, len(communities)))
+        A = (P.T @ A @ P).tocsr()
+
+    return node_labels
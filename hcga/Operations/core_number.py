@@ -71,7 +71,8 @@ class CoreNumber():
         bins = [10,20,50]
         
 
-        G = self.G
+        # the self-loops are removed from a copy, the graph is shared with the other operations
+        G = self.G.copy()
         feature_list = {}
         
         
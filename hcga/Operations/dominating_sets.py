@@ -21,14 +21,17 @@
 
 import numpy as np
 import networkx as nx
+from hcga import heuristics
+from hcga.Operations.precomputed import Precomputed
 
 
 class DominatingSets():
     """
     Dominating set class
     """    
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -53,7 +56,9 @@ class DominatingSets():
 
         Notes
         -----
-        Core number calculations using networkx:
+        The dominating set takes the nodes in order, as networkx.dominating_set, the
+        minimum dominating set is the greedy set cover of the closed neighbourhoods [2]_,
+        and the edge dominating set is a maximal matching (see hcga.heuristics):
             `Networkx_dominating_set <https://networkx.github.io/documentation/stable/reference/algorithms/dominating.html>`_
             
 
@@ -61,8 +66,8 @@ class DominatingSets():
         ----------
         .. [1] https://en.wikipedia.org/wiki/Dominating_set
     
-        .. [2] Abdol-Hossein Esfahanian. Connectivity Algorithms.
-            http://www.cse.msu.edu/~cse835/Papers/Graph_connectivity_revised.pdf
+        .. [2] Vazirani, Vijay V. *Approximation Algorithms*.
+            Springer Science & Business Media, 2001.
     
 
         """
@@ -75,9 +80,11 @@ class DominatingSets():
         if not nx.is_directed(G):            
     
     
-            dom_set = nx.dominating_set(G)
-            dom_set_min = min_weighted_dominating_set(G)
-            edges_dom = min_edge_dominating_set(G)
+            A = self.precomputed.get('adjacency')
+
+            dom_set = heuristics.dominating_set(A)
+            dom_set_min = heuristics.min_dominating_set(A)
+            edges_dom = self.precomputed.get('maximal_matching')
             
             feature_list['len_domset']=len(dom_set)             
             feature_list['len_min_domset']=len(dom_set_min)            
@@ -94,137 +101,3 @@ class DominatingSets():
 
         self.features = feature_list
 
-
-def min_weighted_dominating_set(G, weight=None):
-    r"""Returns a dominating set that approximates the minimum weight node
-    dominating set.
-
-    Parameters
-    ----------
-    G : NetworkX graph
-        Undirected graph.
-
-    weight : string
-        The node attribute storing the weight of an node. If provided,
-        the node attribute with this key must be a number for each
-        node. If not provided, each node is assumed to have weight one.
-
-    Returns
-    -------
-    min_weight_dominating_set : set
-        A set of nodes, the sum of whose weights is no more than `(\log
-        w(V)) w(V^*)`, where `w(V)` denotes the sum of the weights of
-        each node in the graph and `w(V^*)` denotes the sum of the
-        weights of each node in the minimum weight dominating set.
-
-    Notes
-    -----
-    This algorithm computes an approximate minimum weighted dominating
-    set for the graph `G`. The returned solution has weight `(\log
-    w(V)) w(V^*)`, where `w(V)` denotes the sum of the weights of each
-    node in the graph and `w(V^*)` denotes the sum of the weights of
-    each node in the minimum weight dominating set for the graph.
-
-    This implementation of the algorithm runs in $O(m)$ time, where $m$
-    is the number of edges in the graph.
-
-    References
-    ----------
-    .. [1] Vazirani, Vijay V.
-           *Approximation Algorithms*.
-           Springer Science & Business Media, 2001.
-
-    """
-    # The unique dominating set for the null graph is the empty set.
-    if len(G) == 0:
-        return set()
-
-    # This is the dominating set that will eventually be returned.
-    dom_set = set()
-
-    def _cost(node_and_neighborhood):
-        """Returns the cost-effectiveness of greedily choosing the given
-        node.
-
-        `node_and_neighborhood` is a two-tuple comprising a node and its
-        closed neighborhood.
-
-        """
-        v, neighborhood = node_and_neighborhood
-        return G.nodes[v].get(weight, 1) / len(neighborhood - dom_set)
-
-    # This is a set of all vertices not already covered by the
-    # dominating set.
-    vertices = set(G)
-    # This is a dictionary mapping each node to the closed neighborhood
-    # of that node.
-    neighborhoods = {v: {v} | set(G[v]) for v in G}
-
-    # Continue until all vertices are adjacent to some node in the
-    # dominating set.
-    while vertices:
-        # Find the most cost-effective node to add, along with its
-        # closed neighborhood.
-        dom_node, min_set = min(neighborhoods.items(), key=_cost)
-        # Add the node to the dominating set and reduce the remaining
-        # set of nodes to cover.
-        dom_set.add(dom_node)
-        del neighborhoods[dom_node]
-        vertices -= min_set
-
-    return dom_set
-
-def min_edge_dominating_set(G):
-    r"""Returns minimum cardinality edge dominating set.
-
-    Parameters
-    ----------
-    G : NetworkX graph
-      Undirected graph
-
-    Returns
-    -------
-    min_edge_dominating_set : set
-      Returns a set of dominating edges whose size is no more than 2 * OPT.
-
-    Notes
-    -----
-    The algorithm computes an approximate solution to the edge dominating set
-    problem. The result is no more than 2 * OPT in terms of size of the set.
-    Runtime of the algorithm is $O(|E|)$.
-    """
-    if not G:
-        raise ValueError("Expected non-empty NetworkX graph!")
-    return maximal_matching(G)
-
-def maximal_matching(G):
-    r"""Find a maximal matching in the graph.
-
-    A matching is a subset of edges in which no node occurs more than once.
-    A maximal matching cannot add more edges and still be a matching.
-
-    Parameters
-    ----------
-    G : NetworkX graph
-        Undirected graph
-
-    Returns
-    -------
-    matching : set
-        A maximal matching of the graph.
-
-    Notes
-    -----
-    The algorithm greedily selects a maximal matching M of the graph G
-    (i.e. no superset of M exists). It runs in $O(|E|)$ time.
-    """
-    matching = set()
-    nodes = set()
-    for u, v in G.edges():
-        # If the edge isn't covered, add it to the matching
-        # then remove neighborhood of u and v from consideration.
-        if u not in nodes and v not in nodes and u != v:
-            matching.add((u, v))
-            nodes.add(u)
-            nodes.add(v)
-    return matching
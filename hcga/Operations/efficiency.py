@@ -22,13 +22,16 @@
 
 import networkx as nx
 import numpy as np
+from hcga import efficiency
+from hcga.Operations.precomputed import Precomputed
 
 class Efficiency():
     """
     Efficiency class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -53,7 +56,9 @@ class Efficiency():
         
         Notes
         -----
-        Degree centrality calculations using networkx:
+        Efficiency calculations as networkx, with the global efficiency from the shared
+        distance matrix and the local efficiencies from batched searches of the ego
+        networks (see hcga.efficiency):
             `Networkx_efficiency <https://networkx.github.io/documentation/stable/reference/algorithms/efficiency.html>`_
         
         """
@@ -65,8 +70,8 @@ class Efficiency():
         
         if not nx.is_directed(G):            
             #Efficiency calculations
-            feature_list['local_efficiency']=nx.local_efficiency(G)
-            feature_list['global_efficiency']=nx.global_efficiency(G)
+            feature_list['local_efficiency']=efficiency.local_efficiencies(self.precomputed.get('adjacency')).mean()
+            feature_list['global_efficiency']=efficiency.global_efficiency(self.precomputed.get('distance_matrix'))
         else:
             feature_list['local_efficiency']=np.nan
             feature_list['global_efficiency']=np.nan
@@ -21,6 +21,8 @@
 
 import numpy as np
 import networkx as nx
+from hcga import heuristics
+from hcga.Operations.precomputed import Precomputed
 
 
 class IndependentSets():
@@ -28,12 +30,13 @@ class IndependentSets():
     Independent sets class
     """
     
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
-    def feature_extraction(self):
+    def feature_extraction(self, params = None):
 
         """Compute independent set measures.
 
@@ -47,6 +50,10 @@ class IndependentSets():
         G : graph
            A networkx graph
 
+        params : list
+           number of random node orders the greedy maximal independent sets are
+           averaged over (default 10)
+
         Returns
         -------
         feature_list :list
@@ -55,7 +62,8 @@ class IndependentSets():
 
         Notes
         -----
-        Eccentricity using networkx:
+        The greedy maximal independent sets of all the orders are computed together
+        (see hcga.heuristics), as networkx.maximal_independent_set:
             `Networkx_maximal_indpendent_sets <https://networkx.github.io/documentation/stable/reference/algorithms/generated/networkx.algorithms.mis.maximal_independent_set.html#networkx.algorithms.mis.maximal_independent_set>`_   
         
 
@@ -65,16 +73,19 @@ class IndependentSets():
 
         G = self.G
 
+        n_sets = int(params[0]) if params else 10
+
         feature_list = {}
         
         if not nx.is_directed(G):            
     
     
-            ind_set = nx.maximal_independent_set(G, seed = 10)
+            ind_sets = heuristics.maximal_independent_sets(self.precomputed.get('adjacency'), n_sets, seed = 10)
+            len_ind_set = ind_sets.sum(axis = 1).mean()
             
-            feature_list['num_ind_nodes_norm']=len(ind_set)
+            feature_list['num_ind_nodes_norm']=len_ind_set
             
-            feature_list['ratio__ind_nodes_norm']=len(ind_set)/len(G)
+            feature_list['ratio__ind_nodes_norm']=len_ind_set/len(G)
         else:
             feature_list['num_ind_nodes_norm']=np.nan
             feature_list['ratio__ind_nodes_norm']=np.nan
@@ -23,16 +23,20 @@
 import networkx as nx
 import numpy as np
 
+from hcga.Operations.precomputed import Precomputed
+from hcga import connectivity
+
 class kComponents():
     """
     k components class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
-    def feature_extraction(self):
+    def feature_extraction(self, params = None):
 
         """
         Compute features related to the k components of the network
@@ -44,6 +48,9 @@ class kComponents():
         ----------
         G : graph
           A networkx graph
+        params : list
+          'exact', 'approximate' or 'auto' (default) to search the node cuts
+          approximately for graphs with more than 500 nodes
 
         Returns
         -------
@@ -52,22 +59,29 @@ class kComponents():
         
         Notes
         -----
-        K components calculations using networkx:
+        K components calculations adapted from networkx:
             `Networkx_kcomponents <https://networkx.github.io/documentation/stable/reference/algorithms/generated/networkx.algorithms.connectivity.kcomponents.k_components.html#networkx.algorithms.connectivity.kcomponents.k_components>`_            
+
+        The k-components are found by the flow engine hcga.connectivity, which splits
+        each biconnected block along node cuts, and reuses the node connectivity and the
+        flow network of the graph computed for the node connectivity features.
         """
         
 
         G = self.G
         
-        
-        # This function is very slow for some graphs... 
+        mode = params[0] if params else 'auto'
+        approximate = mode == 'approximate' or (mode == 'auto' and G.number_of_nodes() > 500)
         
         feature_list = {}
         if not nx.is_directed(G):            
             # Calculate the k_components
-            k_components=nx.k_components(G)
+            k_components=connectivity.k_components(self.precomputed.get('adjacency'),
+                                                   self.precomputed.get('node_flow_network'),
+                                                   self.precomputed.get('node_connectivity'),
+                                                   approximate = approximate)
             k_components_keys=np.asarray(list(k_components.keys()))
-            k_components_vals=np.asarray(list(k_components.values()))
+            k_components_vals=list(k_components.values())
             
             # Calculate basic features related to k_components
             num_k=0
@@ -21,13 +21,15 @@
 
 
 import networkx as nx
+from hcga.Operations.precomputed import Precomputed
 
 class MaximalMatching():
     """
     Maximal matching class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -53,7 +55,8 @@ class MaximalMatching():
            
         Notes
         -----
-        Maximal matching calculations using networkx:
+        The maximal matching is the greedy matching for a random order of the edges
+        (see hcga.heuristics), shared with the edge dominating set:
             `Networkx_maximal_matching <https://networkx.github.io/documentation/stable/reference/algorithms/matching.html>`_
 
 
@@ -65,11 +68,12 @@ class MaximalMatching():
         feature_list = {}
         
         E=nx.number_of_edges(G)
+        matching=self.precomputed.get('maximal_matching')
         # Calculate number of edges in maximal matching
-        feature_list['num_edges']=len(nx.maximal_matching(G))
+        feature_list['num_edges']=len(matching)
         # Calculate the total ratio of edges in the maximal matching to the
         #in the network
-        feature_list['ratio']=len(nx.maximal_matching(G))/E
+        feature_list['ratio']=len(matching)/E
         
 
         self.features = feature_list
@@ -20,13 +20,15 @@
 # along with hcga.  If not, see <http://www.gnu.org/licenses/>.
 
 import networkx as nx
+from hcga.Operations.precomputed import Precomputed
 
 class MinimumCuts():
     """
     Minimum cuts class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -49,7 +51,9 @@ class MinimumCuts():
         -----
         Calculations using networkx:
             `Networkx_minimum_cuts <https://networkx.github.io/documentation/stable/reference/algorithms/connectivity.html>`_
-        
+
+        The sizes of the minimum node and edge cuts are the node and edge connectivities,
+        shared with NodeConnectivity (see hcga.connectivity).
         """
         
         G = self.G
@@ -57,7 +61,7 @@ class MinimumCuts():
         feature_list = {}
         
         #Compute minimum cuts
-        feature_list['min_node_cut_size']=len(nx.minimum_node_cut(G))
-        feature_list['min_edge_cut_size']=len(nx.minimum_edge_cut(G))
+        feature_list['min_node_cut_size']=self.precomputed.get('node_connectivity')
+        feature_list['min_edge_cut_size']=self.precomputed.get('edge_connectivity')
         
         self.features = feature_list
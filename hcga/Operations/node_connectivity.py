@@ -23,10 +23,13 @@ import numpy as np
 import networkx as nx
 
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
+from hcga import connectivity
 
 class NodeConnectivity():
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -63,6 +66,10 @@ class NodeConnectivity():
         digraph and the computation of local node connectivity see
         :meth:`local_node_connectivity`. This implementation is based
         on algorithm 11 in [1]_.
+
+        All the connectivities are computed by the flow engine hcga.connectivity: the local
+        node connectivities of all the pairs of nodes with maximum flows on the auxiliary
+        network, built once, and the edge connectivity with a Gomory-Hu tree (n - 1 flows).
         
         References
         ----------
@@ -81,13 +88,7 @@ class NodeConnectivity():
         feature_list = {}
 
         # calculating node connectivity
-        node_connectivity = nx.all_pairs_node_connectivity(G)
-        N = G.number_of_nodes()
-        
-        node_conn = np.zeros([N,N])
-        for key1, value1 in node_connectivity.items():    
-            for key2, value2 in value1.items():
-                node_conn[key1,key2] = value2
+        node_conn = self.precomputed.get('node_connectivity_matrix').astype(float)
 
         # mean and median minimum number of nodes to remove connectivity
         feature_list = utils.summary_statistics(feature_list,list(np.triu(node_conn).flatten()),'node_conn')
@@ -107,9 +108,9 @@ class NodeConnectivity():
             feature_list['opt_model_max{}'.format(bins[i])]=opt_mod_max              
         
         # Calculate connectivity
-        feature_list['node_connectivity']=nx.node_connectivity(G)
-        feature_list['average_node_connectivity']=nx.average_node_connectivity(G)
-        feature_list['edge_connectivity']=nx.edge_connectivity(G)
+        feature_list['node_connectivity']=self.precomputed.get('node_connectivity')
+        feature_list['average_node_connectivity']=connectivity.average_node_connectivity(node_conn)
+        feature_list['edge_connectivity']=self.precomputed.get('edge_connectivity')
         
         # calculate the wiener index 
         feature_list['wiener_index']=nx.wiener_index(G)
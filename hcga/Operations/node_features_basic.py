@@ -22,6 +22,7 @@
 import networkx as nx
 import numpy as np
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 
 
 class NodeFeaturesBasic():
@@ -29,8 +30,9 @@ class NodeFeaturesBasic():
     Node features class
     """
     
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
         
@@ -86,21 +88,16 @@ class NodeFeaturesBasic():
         if 'feat' in G.nodes[0].keys():
             try:
                 
-                # Create a matrix features from each node
-                node_matrix = np.array([G.nodes[0]['feat']])
-                for i in range(1,N):
-                    node_matrix = np.vstack([node_matrix,G.nodes[i]['feat']])
-                
+                # Matrix of the features of each node, gathered once for all the node operations
+                node_matrix = self.precomputed.get('node_features')
                 
                 num_feats = node_matrix.shape[1]
                 
-                for i in range(0,num_feats):                
-                    feature_list['mean_feat'+str(i)] = np.mean(node_matrix,0)[i]
-                    feature_list['max_feat'+str(i)] = np.max(node_matrix,0)[i]
-                    feature_list['min_feat'+str(i)] = np.min(node_matrix,0)[i]
-                    feature_list['median_feat'+str(i)] = np.median(node_matrix,0)[i]
-                    feature_list['std_feat'+str(i)] = np.std(node_matrix,0)[i]
-                    feature_list['sum_feat'+str(i)] = np.sum(node_matrix,0)[i]            
+                feat_stats = [('mean', node_matrix.mean(0)), ('max', node_matrix.max(0)), ('min', node_matrix.min(0)),
+                              ('median', np.median(node_matrix, 0)), ('std', node_matrix.std(0)), ('sum', node_matrix.sum(0))]
+                for i in range(0,num_feats):
+                    for stat, values in feat_stats:
+                        feature_list[stat + '_feat' + str(i)] = values[i]
                 
                 # Calculate some basic stats from this matrix
                 feature_list['mean'] = np.mean(node_matrix)
@@ -113,7 +110,7 @@ class NodeFeaturesBasic():
                 dim=np.shape(node_matrix)
                  
                 # List containing the mean of each feature for all nodes
-                mean_feat_val_list = [np.mean(node_matrix[:,i]) for i in range(dim[1])]
+                mean_feat_val_list = feat_stats[0][1]
                 
                 # Calculate some basic stats from the mean of each feature
                 feature_list['feat_mean_max'] = np.max(mean_feat_val_list)
@@ -129,7 +126,7 @@ class NodeFeaturesBasic():
                     feature_list['feat_powerlaw_SSE_{}'.format(bins[i])] = utils.power_law_fit(mean_feat_val_list,bins=bins[i])[1] # value sse in power law
            
                 # List containing the mean feature value for each node
-                mean_node_feat_list = [np.mean(node_matrix[i,:]) for i in range(dim[0])]
+                mean_node_feat_list = node_matrix.mean(1)
                 
                 # Calculate some basic stats from the mean feature value for each node
                 feature_list['node_mean_max'] = np.max(mean_node_feat_list)
@@ -145,7 +142,7 @@ class NodeFeaturesBasic():
                     feature_list['node_powerlaw_SSE_{}'.format(bins[i])] = utils.power_law_fit(mean_node_feat_list,bins=bins[i])[1] # value sse in power law
                 
                 # Divide the mean of the features of a node by its degree
-                mean_node_feat_norm = [mean_node_feat_list[i]-node_degrees[i] for i in range(N)]
+                mean_node_feat_norm = mean_node_feat_list - np.asarray(node_degrees)
                 
                 # Calculate some basic stats for this normalisation
                 feature_list['norm_mean'] = np.mean(mean_node_feat_norm)
@@ -22,6 +22,7 @@
 import networkx as nx
 import numpy as np
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 
 
 class NodeFeaturesConv():
@@ -29,12 +30,13 @@ class NodeFeaturesConv():
     Node features convoluted class    
     """
     
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
         
-    def feature_extraction(self):
+    def feature_extraction(self, params = None):
         """
         Computes measures based on the node features/attributes convoluted over the graph structure.
         We implement a message passing system using the discrete adjacency matrix.        
@@ -45,6 +47,10 @@ class NodeFeaturesConv():
         G : graph
            A networkx graph
 
+        params: list
+            optional parameters from operations.csv: the number of hops (default 2) and the 
+            normalisation of the adjacency matrix ('none', 'sym' or 'rw', default 'none')
+
 
         Returns
         -------
@@ -56,7 +62,11 @@ class NodeFeaturesConv():
         -----
 
         Summary statistics of convoluted node features.
-    
+
+        Each hop multiplies the node feature matrix by the sparse matrix A + I, where A is 
+        the weighted adjacency matrix, optionally normalised symmetrically (D^-1/2 (A+I) D^-1/2)
+        or by rows (D^-1 (A+I)), with D the degrees of A + I. The statistics of all the 
+        features are computed at once for each hop.
 
 
         """                
@@ -64,175 +74,111 @@ class NodeFeaturesConv():
         
         # Define number of bins
         bins = [10]
+
+        n_hops = int(params[0]) if params else 2
+        normalisation = params[1] if params and len(params) > 1 else 'none'
         
         feature_list = {}
         
-        N = G.number_of_nodes()
-        
-        node_degrees = list(dict(nx.degree(G)).values())
+        node_degrees = np.array([d for u, d in G.degree()], dtype = float)
 
 
         # Only compute for networks with node features
         if 'feat' in G.nodes[0].keys():
             try:
                 
-                # Create a matrix features from each node
-                node_matrix = np.array([G.nodes[0]['feat']])
-                for i in range(1,N):
-                    node_matrix = np.vstack([node_matrix,G.nodes[i]['feat']])
-                
-                
-                num_feats = node_matrix.shape[1]
-                
-                A = nx.to_numpy_array(G)
-                A = A + np.eye(len(G))
-                
-                
-                for conv in range(2):
-                    
-                    # each loop imposes a one step random walk convolution
-                    node_matrix = np.dot(A,node_matrix)
-                    
-                    
-                    for i in range(0,num_feats):                
-                        feature_list['mean_feat_conv'+str(conv)+'_'+str(i)] = np.mean(node_matrix,0)[i]
-                        feature_list['max_feat_conv'+str(conv)+'_'+str(i)] = np.max(node_matrix,0)[i]
-                        feature_list['min_feat_conv'+str(conv)+'_'+str(i)] = np.min(node_matrix,0)[i]
-                        feature_list['median_feat_conv'+str(conv)+'_'+str(i)] = np.median(node_matrix,0)[i]
-                        feature_list['std_feat_conv'+str(conv)+'_'+str(i)] = np.std(node_matrix,0)[i]
-                        feature_list['sum_feat_conv'+str(conv)+'_'+str(i)] = np.sum(node_matrix,0)[i]      
-        
+                # matrices of node features after each hop of the convolution
+                if n_hops == 2 and normalisation == 'none':
+                    convolutions = self.precomputed.get('feature_convolutions')
+                else:
+                    node_matrix = self.precomputed.get('node_features')
+                    A = utils.convolution_matrix(G, normalisation)
+                    convolutions = utils.convolve(A, node_matrix, n_hops)
+
+                for conv, node_matrix in enumerate(convolutions):
+                    conv = str(conv)
+
+                    # statistics of each feature, over the nodes
+                    feat_means = node_matrix.mean(0)
+                    feat_stats = {'mean': feat_means,
+                                  'max': node_matrix.max(0),
+                                  'min': node_matrix.min(0),
+                                  'median': np.median(node_matrix, 0),
+                                  'std': node_matrix.std(0),
+                                  'sum': node_matrix.sum(0)}
+                    for i in range(node_matrix.shape[1]):
+                        for stat in ['mean', 'max', 'min', 'median', 'std', 'sum']:
+                            feature_list[stat + '_feat_conv' + conv + '_' + str(i)] = feat_stats[stat][i]
+
                     # Calculate some basic stats from this matrix
-                    feature_list['mean_conv'+str(conv)] = np.mean(node_matrix)
-                    feature_list['max_conv'+str(conv)] = np.max(node_matrix)
-                    feature_list['min_conv'+str(conv)] = np.min(node_matrix)
-                    feature_list['median_conv'+str(conv)] = np.median(node_matrix)
-                    feature_list['std_conv'+str(conv)] = np.std(node_matrix)
-                    feature_list['sum_conv'+str(conv)] = np.sum(node_matrix)
-                    
-                    dim=np.shape(node_matrix)
-                     
-                    # List containing the mean of each feature for all nodes
-                    mean_feat_val_list = [np.mean(node_matrix[:,i]) for i in range(dim[1])]
+                    _basic_stats(feature_list, node_matrix, '{}_conv' + conv)
                     
                     # Calculate some basic stats from the mean of each feature
-                    feature_list['feat_mean_max_conv'+str(conv)] = np.max(mean_feat_val_list)
-                    feature_list['feat_mean_min_conv'+str(conv)] = np.min(mean_feat_val_list)
-                    feature_list['feat_mean_median_conv'+str(conv)] = np.median(mean_feat_val_list)
-                    feature_list['feat_mean_std_conv'+str(conv)] = np.std(mean_feat_val_list)
-                    
-                    # Distribution calculations and fit
-                    for i in range(len(bins)):        
-                        opt_mod,opt_mod_sse = utils.best_fit_distribution(mean_feat_val_list,bins=bins[i])
-                        feature_list[str(conv)+'feat_opt_model_{}'.format(bins[i])] = opt_mod
-                        feature_list[str(conv)+'feat_powerlaw_a_{}'.format(bins[i])] = utils.power_law_fit(mean_feat_val_list,bins=bins[i])[0][-2]# value 'a' in power law
-                        feature_list[str(conv)+'feat_powerlaw_SSE_{}'.format(bins[i])] = utils.power_law_fit(mean_feat_val_list,bins=bins[i])[1] # value sse in power law
-               
-                    # List containing the mean feature value for each node
-                    mean_node_feat_list = [np.mean(node_matrix[i,:]) for i in range(dim[0])]
-                    
+                    _mean_stats(feature_list, feat_means, 'feat_mean_{}_conv' + conv)
+                    _fit_stats(feature_list, feat_means, conv + 'feat_{}', bins)
+
                     # Calculate some basic stats from the mean feature value for each node
-                    feature_list['node_mean_max_conv'+str(conv)] = np.max(mean_node_feat_list)
-                    feature_list['node_mean_min_conv'+str(conv)] = np.min(mean_node_feat_list)
-                    feature_list['node_mean_median_conv'+str(conv)] = np.median(mean_node_feat_list)
-                    feature_list['node_mean_std_conv'+str(conv)] = np.std(mean_node_feat_list)
-                    
-                    # Distribution calculations and fit
-                    for i in range(len(bins)):        
-                        opt_mod,opt_mod_sse = utils.best_fit_distribution(mean_node_feat_list,bins=bins[i])
-                        feature_list[str(conv)+'node_opt_model_{}'.format(bins[i])] = opt_mod
-                        feature_list[str(conv)+'node_powerlaw_a_{}'.format(bins[i])] = utils.power_law_fit(mean_node_feat_list,bins=bins[i])[0][-2]# value 'a' in power law
-                        feature_list[str(conv)+'node_powerlaw_SSE_{}'.format(bins[i])] = utils.power_law_fit(mean_node_feat_list,bins=bins[i])[1] # value sse in power law
+                    node_means = node_matrix.mean(1)
+                    _mean_stats(feature_list, node_means, 'node_mean_{}_conv' + conv)
+                    _fit_stats(feature_list, node_means, conv + 'node_{}', bins)
                     
                     # Divide the mean of the features of a node by its degree
-                    mean_node_feat_norm = [mean_node_feat_list[i]/node_degrees[i] for i in range(N)]
-                    
+                    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                        node_means_norm = node_means / node_degrees
+
                     # Calculate some basic stats for this normalisation
-                    feature_list['norm_mean_conv'+str(conv)] = np.mean(mean_node_feat_norm)
-                    feature_list['norm_max_conv'+str(conv)] = np.max(mean_node_feat_norm)
-                    feature_list['norm_min_conv'+str(conv)] = np.min(mean_node_feat_norm)
-                    feature_list['norm_median_conv'+str(conv)] = np.median(mean_node_feat_norm)
-                    feature_list['norm_std_conv'+str(conv)] = np.std(mean_node_feat_norm)
-                    feature_list['norm_sum_conv'+str(conv)] = np.sum(mean_node_feat_norm)
-                    
-                    # Distribution calculations and fit
-                    for i in range(len(bins)):        
-                        opt_mod,opt_mod_sse = utils.best_fit_distribution(mean_node_feat_norm,bins=bins[i])
-                        feature_list[str(conv)+'norm_opt_model_{}'.format(bins[i])] = opt_mod
-                        feature_list[str(conv)+'norm_powerlaw_a_{}'.format(bins[i])] = utils.power_law_fit(mean_node_feat_norm,bins=bins[i])[0][-2]# value 'a' in power law
-                        feature_list[str(conv)+'norm_powerlaw_SSE_{}'.format(bins[i])] = utils.power_law_fit(mean_node_feat_norm,bins=bins[i])[1] # value sse in power law
+                    _basic_stats(feature_list, node_means_norm, 'norm_{}_conv' + conv)
+                    _fit_stats(feature_list, node_means_norm, conv + 'norm_{}', bins)
 
-                
             except Exception as e:
                 print('Exception for node_features_conv:', e)
 
-                for conv in range(2):
-                    
-                    # each loop imposes a one step random walk convolution
-                    num_feats = 0
-                    
-                    for i in range(0,num_feats):                
-                        feature_list['mean_feat_conv'+str(conv)+'_'+str(i)] = np.nan
-                        feature_list['max_feat_conv'+str(conv)+'_'+str(i)] = np.nan
-                        feature_list['min_feat_conv'+str(conv)+'_'+str(i)] = np.nan
-                        feature_list['median_feat_conv'+str(conv)+'_'+str(i)] = np.nan
-                        feature_list['std_feat_conv'+str(conv)+'_'+str(i)] = np.nan
-                        feature_list['sum_feat_conv'+str(conv)+'_'+str(i)] = np.nan   
-        
-                    # Calculate some basic stats from this matrix
-                    # Calculate some basic stats from this matrix
-                    feature_list['mean_conv'+str(conv)] = np.nan
-                    feature_list['max_conv'+str(conv)] = np.nan
-                    feature_list['min_conv'+str(conv)] = np.nan
-                    feature_list['median_conv'+str(conv)] = np.nan
-                    feature_list['std_conv'+str(conv)] = np.nan
-                    feature_list['sum_conv'+str(conv)] = np.nan
+                for conv in range(n_hops):
+                    conv = str(conv)
 
-                    
-                    # Calculate some basic stats from the mean of each feature
-                    feature_list['feat_mean_max_conv'+str(conv)] = np.nan
-                    feature_list['feat_mean_min_conv'+str(conv)] = np.nan
-                    feature_list['feat_mean_median_conv'+str(conv)] = np.nan
-                    feature_list['feat_mean_std_conv'+str(conv)] = np.nan
-                    
-                    
-                    # Distribution calculations and fit
-                    for i in range(len(bins)):        
-                        
-                        feature_list[str(conv)+'feat_opt_model_{}'.format(bins[i])] = np.nan
-                        feature_list[str(conv)+'feat_powerlaw_a_{}'.format(bins[i])] = np.nan
-                        feature_list[str(conv)+'feat_powerlaw_SSE_{}'.format(bins[i])] = np.nan
-               
+                    _basic_stats(feature_list, None, '{}_conv' + conv)
+                    _mean_stats(feature_list, None, 'feat_mean_{}_conv' + conv)
+                    _fit_stats(feature_list, None, conv + 'feat_{}', bins)
+                    _mean_stats(feature_list, None, 'node_mean_{}_conv' + conv)
+                    _fit_stats(feature_list, None, conv + 'node_{}', bins)
+                    _basic_stats(feature_list, None, 'norm_{}_conv' + conv)
+                    _fit_stats(feature_list, None, conv + 'norm_{}', bins)
 
-                    # Calculate some basic stats from the mean feature value for each node
-                    feature_list['node_mean_max_conv'+str(conv)] = np.nan
-                    feature_list['node_mean_min_conv'+str(conv)] = np.nan
-                    feature_list['node_mean_median_conv'+str(conv)] = np.nan
-                    feature_list['node_mean_std_conv'+str(conv)] = np.nan
-                    
-                    # Distribution calculations and fit
-                    for i in range(len(bins)):        
+        self.features=feature_list
 
-                        feature_list[str(conv)+'node_opt_model_{}'.format(bins[i])] = np.nan
-                        feature_list[str(conv)+'node_powerlaw_a_{}'.format(bins[i])] = np.nan
-                        feature_list[str(conv)+'node_powerlaw_SSE_{}'.format(bins[i])] = np.nan
-                    
-                    
-                    # Calculate some basic stats for this normalisation
-                    feature_list['norm_mean_conv'+str(conv)] = np.nan
-                    feature_list['norm_max_conv'+str(conv)] = np.nan
-                    feature_list['norm_min_conv'+str(conv)] = np.nan
-                    feature_list['norm_median_conv'+str(conv)] = np.nan
-                    feature_list['norm_std_conv'+str(conv)] = np.nan
-                    feature_list['norm_sum_conv'+str(conv)] = np.nan
-                    
-                    # Distribution calculations and fit
-                    for i in range(len(bins)):        
 
-                        feature_list[str(conv)+'norm_opt_model_{}'.format(bins[i])] = np.nan
-                        feature_list[str(conv)+'norm_powerlaw_a_{}'.format(bins[i])] = np.nan
-                        feature_list[str(conv)+'norm_powerlaw_SSE_{}'.format(bins[i])] = np.nan
+def _basic_stats(feature_list, values, name):
+    """
+    Mean, max, min, median, std and sum of all the values (nan if values is None)
+    """
 
+    for stat, function in [('mean', np.mean), ('max', np.max), ('min', np.min),
+                           ('median', np.median), ('std', np.std), ('sum', np.sum)]:
+        feature_list[name.format(stat)] = function(values) if values is not None else np.nan
 
 
-        self.features=feature_list
+def _mean_stats(feature_list, values, name):
+    """
+    Max, min, median and std of the values (nan if values is None)
+    """
+
+    for stat, function in [('max', np.max), ('min', np.min), ('median', np.median), ('std', np.std)]:
+        feature_list[name.format(stat)] = function(values) if values is not None else np.nan
+
+
+def _fit_stats(feature_list, values, name, bins):
+    """
+    Optimal model and power law fit of the distribution of the values (nan if values is None)
+    """
+
+    for b in bins:
+        if values is not None:
+            opt_mod, opt_mod_sse = utils.best_fit_distribution(values, bins = b)
+            powerlaw_params, powerlaw_sse = utils.power_law_fit(values, bins = b)
+            feature_list[name.format('opt_model_{}'.format(b))] = opt_mod
+            feature_list[name.format('powerlaw_a_{}'.format(b))] = powerlaw_params[-2] # value 'a' in power law
+            feature_list[name.format('powerlaw_SSE_{}'.format(b))] = powerlaw_sse # value sse in power law
+        else:
+            feature_list[name.format('opt_model_{}'.format(b))] = np.nan
+            feature_list[name.format('powerlaw_a_{}'.format(b))] = np.nan
+            feature_list[name.format('powerlaw_SSE_{}'.format(b))] = np.nan
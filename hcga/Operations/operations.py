@@ -21,19 +21,14 @@
 
 
 
-import pandas as pd
 import numpy as np
-import csv
-from pprint import pprint
-from importlib import import_module
-import os
 import networkx as nx
 
-from scipy.sparse import linalg
-import scipy as sp
-
 import time
-from tqdm import tqdm
+
+from hcga.Operations.registry import get_operations, resolve_class
+from hcga.Operations.precomputed import Precomputed
+from hcga.utils import largest_connected_subgraph
 
 class Operations():
 
@@ -41,7 +36,7 @@ class Operations():
         Class that extracts all time-series features in a chosen YAML file
     """
 
-    def __init__(self, G, CSVfilename = 'operations.csv'):
+    def __init__(self, G, CSVfilename = 'operations.csv', artifacts = None):
 
         self.G = G
         self.operations_dict = []
@@ -52,9 +47,9 @@ class Operations():
         self.feature_dict = {}
 
 
-        # pre computed values
-        self.eigenvalues = []
-        self.eigenvectors = []
+        # pre computed values, shared by the operations (artifacts computed in batch can be given)
+        self.artifacts = artifacts
+        self.precomputed = None
 
 
         """
@@ -62,37 +57,22 @@ class Operations():
         on each subgraph. Add features that relate to the extra subgraphs. or features indicatnig there are subgraphs.
         """
         
-        if not nx.is_connected(G):  
-            Gc = G.subgraph(max(nx.connected_components(G), key=len)).copy()
-            mapping=dict(zip(Gc.nodes,range(0,len(Gc))))
-            Gc = nx.relabel_nodes(Gc,mapping)                
-            self.G_largest_subgraph = Gc            
-        else:
-            self.G_largest_subgraph = G
-        
-        
-        
+        self.G_largest_subgraph = largest_connected_subgraph(G)
 
 
         # functins to run automatically
         if not self.operations_dict:
             self.load_csv()
 
-        if not self.pre_computations:
+        if self.precomputed is None:
             self.pre_compute()
 
     def load_csv(self):
-        
-        module_dir = os.path.dirname(os.path.abspath(__file__))
-        CSV_file_path = os.path.join(module_dir, self.CSVfilename)
-
-
-        with open(CSV_file_path, 'r', newline='') as csv_file:
-            reader = csv.reader(line.replace('  ', ',') for line in csv_file)
-            operations_dict = list(reader)
-            operations_dict.pop(0)
+        """
+        Get the operations from the process-wide registry (the csv file is only parsed once per process)
+        """
 
-        self.operations_dict = operations_dict
+        self.operations_dict = get_operations(self.CSVfilename)
 
 
     def pre_compute(self):
@@ -102,9 +82,11 @@ class Operations():
         by various functions. This saves time by not pre-computing the same data
         for multiple functions.
 
+        The calculations are done lazily, the first time an operation needs them
+        (see hcga.Operations.precomputed).
+
         """
-        if not self.eigenvalues:
-            self.precompute_eigenvectors()
+        self.precomputed = Precomputed(self.G_largest_subgraph, self.artifacts)
 
 
 
@@ -127,9 +109,7 @@ class Operations():
         # First add features to do with subgraphs  
         ###############
        
-        filename = 'connected_components'
-        classname = 'ConnectedComponents'
-        feature_class = getattr(import_module('hcga.Operations.'+filename), classname)           
+        feature_class = resolve_class('connected_components', 'ConnectedComponents')
         feature_obj = feature_class(self.G)
         feature_obj.feature_extraction()
         feature_dict['CComp'] = feature_obj.features
@@ -138,45 +118,25 @@ class Operations():
         
         # now looping over operations dictionary to calculate features
         self.computational_times = {}
-        for i in range(len(operations_dict)):
-            
-            operation = operations_dict[i]
+        for operation in operations_dict:
 
-            #Extract the filename and class name
-            #main_params = ['filename','classname','shortname','keywords','calculation_speed','precomputed']
-            filename = operation[1]
-            classname = operation[2]
-            symbolic_name = operation[3]
-            keywords = operation[4]
-            calculation_speed = operation[5]
-            precomputed = operation[6]
+            classname = operation.classname
+            symbolic_name = operation.shortname
+            params = operation.params
 
             # skip calculation if its too slow
-            if calculation_speed not in calculation_speeds:
+            if operation.calculation_speed not in calculation_speeds:
                 continue
 
-            # Extracting all additional arguments if they exist
-            params = []   
-            for arg in range(7,len(operation)):
-                params.append(operation[arg])
-                
-            
             #print("Running file {} [{}/{}].".format(filename, i, len(operations_dict)))
             
-            # import the class from the file            
-            feature_class = getattr(import_module('hcga.Operations.'+filename), classname)           
-
-
-
-            """# import the class from the file
-            feature_class = getattr(import_module('hcga.Operations.'+filename), classname)"""
-
-
+            # the class is imported once per process by the registry
+            feature_class = operation.feature_class
 
             start_time = time.time()                    
 
-            if precomputed=='True ':
-                feature_obj = feature_class(self.G_largest_subgraph,(self.eigenvalues,self.eigenvectors))
+            if operation.precomputed:
+                feature_obj = feature_class(self.G_largest_subgraph, self.precomputed)
             else:
                 feature_obj = feature_class(self.G_largest_subgraph)
 
@@ -238,30 +198,4 @@ class Operations():
         """
         
         return feature_names, feature_vals
-        
-
-    def precompute_eigenvectors(self,weight=None, max_iter=None, tol=0):
-
-        try:
-            M = nx.to_scipy_sparse_matrix(self.G_largest_subgraph, nodelist=list(self.G_largest_subgraph), weight=weight,
-                                      dtype=float)
-            if not nx.is_directed(self.G_largest_subgraph):
-                eigenvalues, eigenvectors = linalg.eigsh(M.T, k = int(0.8*self.G_largest_subgraph.number_of_nodes()), which='LM',
-                                              maxiter=max_iter, tol=tol, v0 = numpy.ones(len(M))) #v0 is to fix randomness
-            else:
-                eigenvalues, eigenvectors = linalg.eigs(M.T, k = int(0.8*self.G_largest_subgraph.number_of_nodes()), which='LR',
-                                              maxiter=max_iter, tol=tol, v0 = numpy.ones(len(M)))
-
-            self.eigenvalues = eigenvalues
-            self.eigenvectors = eigenvectors
-
-        except:
-            self.eigenvalues = np.array([1,1])
-            self.eigenvectors = np.array([[1,1],[1,1]])
-            pass
-
-
-
-
-        return
 
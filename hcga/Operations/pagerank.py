@@ -22,14 +22,16 @@
 
 import networkx as nx
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 import numpy as np
 
 class PageRank():
     """
     Page rank class    
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -81,7 +83,7 @@ class PageRank():
         feature_list = {}
         
         #Calculate PageRank
-        pagerank = np.asarray(list(nx.pagerank(G).values()))
+        pagerank = self.precomputed.get('pagerank')
         # Basic stats regarding the PageRank distribution
         feature_list['mean'] = pagerank.mean()
         feature_list['std'] = pagerank.std()
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Data shared between the operations of a graph.
+
+An artifact (eigenvectors, node centralities, ...) is computed the first time an
+operation asks for it, and reused by the other operations. Artifacts can also be
+given when the store is created, for example when they have been computed for a
+whole batch of graphs at once (see hcga.batch).
+
+Node vectors are in the node order of the graph, list(G).
+"""
+
+import numpy as np
+import networkx as nx
+
+
+# functions computing each artifact from a Precomputed object, by name
+_artifact_functions = {}
+
+
+def artifact(name):
+    """
+    Decorator registering the function computing an artifact
+    """
+
+    def _register(function):
+        _artifact_functions[name] = function
+        return function
+
+    return _register
+
+
+class Precomputed():
+
+    """
+        Lazy store of the artifacts of a graph
+
+        Parameters
+        ----------
+
+        G: graph
+            the graph the artifacts are computed from
+        artifacts: dict
+            already computed artifacts, by name
+
+    """
+
+    def __init__(self, G, artifacts = None):
+
+        self.G = G
+        self.artifacts = dict(artifacts) if artifacts else {}
+
+    def get(self, name):
+        """
+        Return an artifact, computed if needed
+        """
+
+        if name not in self.artifacts:
+            if name not in _artifact_functions:
+                raise KeyError('Unknown artifact {}'.format(name))
+            self.artifacts[name] = _artifact_functions[name](self)
+
+        return self.artifacts[name]
+
+    def set(self, name, value):
+        """
+        Set the value of an artifact
+        """
+
+        self.artifacts[name] = value
+
+    def __contains__(self, name):
+        return name in self.artifacts
+
+    def clear(self):
+        """
+        Remove the computed artifacts
+        """
+
+        self.artifacts = {}
+
+
+@artifact('eigens')
+def eigens(precomputed, weight = None, max_iter = None, tol = 0):
+    """
+    Eigenvalues and eigenvectors of the adjacency matrix
+    """
+
+    from scipy.sparse import linalg
+
+    G = precomputed.G
+    try:
+        M = nx.to_scipy_sparse_matrix(G, nodelist = list(G), weight = weight, dtype = float)
+        if not nx.is_directed(G):
+            eigenvalues, eigenvectors = linalg.eigsh(M.T, k = int(0.8*G.number_of_nodes()), which = 'LM',
+                                                     maxiter = max_iter, tol = tol, v0 = np.ones(M.shape[0])) #v0 is to fix randomness
+        else:
+            eigenvalues, eigenvectors = linalg.eigs(M.T, k = int(0.8*G.number_of_nodes()), which = 'LR',
+                                                    maxiter = max_iter, tol = tol, v0 = np.ones(M.shape[0]))
+
+    except Exception:
+        eigenvalues = np.array([1, 1])
+        eigenvectors = np.array([[1, 1], [1, 1]])
+
+    return eigenvalues, eigenvectors
+
+
+@artifact('adjacency')
+def adjacency(precomputed):
+    """
+    Weighted adjacency matrix, as a sparse CSR matrix
+    """
+
+    G = precomputed.G
+    return nx.to_scipy_sparse_matrix(G, nodelist = list(G), weight = 'weight', dtype = float, format = 'csr')
+
+
+@artifact('distance_matrix')
+def distance_matrix(precomputed):
+    """
+    Shortest path lengths between all the pairs of nodes, ignoring the weights (inf if disconnected)
+    """
+
+    from scipy.sparse.csgraph import shortest_path
+    return shortest_path(precomputed.get('adjacency'), directed = False, unweighted = True)
+
+
+@artifact('small_world_references')
+def small_world_references(precomputed):
+    """
+    Clustering and path lengths of the random and lattice references of the graph, shared by the
+    graphs with the same degree sequence (see hcga.references)
+    """
+
+    from hcga import references
+    return references.reference_ensemble(precomputed.get('adjacency'))
+
+
+@artifact('node_flow_network')
+def node_flow_network(precomputed):
+    """
+    Auxiliary flow network of the node connectivities (see hcga.connectivity)
+    """
+
+    from hcga import connectivity
+    return connectivity.node_flow_network(precomputed.get('adjacency'))
+
+
+@artifact('gomory_hu_tree')
+def gomory_hu_tree(precomputed):
+    from hcga import connectivity
+    return connectivity.gomory_hu_tree(precomputed.get('adjacency'))
+
+
+@artifact('node_connectivity_matrix')
+def node_connectivity_matrix(precomputed):
+    """
+    Local node connectivity of all the pairs of nodes
+    """
+
+    from hcga import connectivity
+    return connectivity.all_pairs_node_connectivity(precomputed.get('adjacency'), precomputed.get('node_flow_network'))
+
+
+@artifact('node_connectivity')
+def node_connectivity(precomputed):
+    """
+    Node connectivity, from the local node connectivities if they have been computed
+    """
+
+    from hcga import connectivity
+    A = precomputed.get('adjacency')
+    if 'node_connectivity_matrix' in precomputed:
+        return connectivity.node_connectivity(A, connectivity = precomputed.get('node_connectivity_matrix'))
+
+    return connectivity.node_connectivity(A, precomputed.get('node_flow_network'))
+
+
+@artifact('edge_connectivity')
+def edge_connectivity(precomputed):
+    from hcga import connectivity
+    return connectivity.edge_connectivity(precomputed.get('adjacency'), precomputed.get('gomory_hu_tree'))
+
+
+@artifact('maximal_matching')
+def maximal_matching(precomputed):
+    """
+    Greedy maximal matching for a random order of the edges, as an array of node index pairs,
+    ignoring the edge directions (see hcga.heuristics)
+    """
+
+    from hcga import heuristics
+    A = precomputed.get('adjacency')
+    if nx.is_directed(precomputed.G):
+        A = (A + A.T).tocsr()
+
+    return heuristics.maximal_matching(A, seed = 0)
+
+
+@artifact('degree_centrality')
+def degree_centrality(precomputed):
+    return np.asarray(list(nx.degree_centrality(precomputed.G).values()))
+
+
+@artifact('triangles')
+def triangles(precomputed):
+    return np.asarray(list(nx.triangles(precomputed.G).values()))
+
+
+@artifact('transitivity')
+def transitivity(precomputed):
+    return nx.transitivity(precomputed.G)
+
+
+@artifact('clustering')
+def clustering(precomputed):
+    return np.asarray(list(nx.clustering(precomputed.G).values()))
+
+
+@artifact('pagerank')
+def pagerank(precomputed):
+    return np.asarray(list(nx.pagerank(precomputed.G).values()))
+
+
+@artifact('katz_centrality')
+def katz_centrality(precomputed):
+    return np.asarray(list(nx.katz_centrality(precomputed.G).values()))
+
+
+@artifact('average_neighbor_degree')
+def average_neighbor_degree(precomputed):
+    return np.asarray(list(nx.average_neighbor_degree(precomputed.G).values()))
+
+
+@artifact('degree_assortativity_coefficient')
+def degree_assortativity_coefficient(precomputed):
+    return nx.degree_assortativity_coefficient(precomputed.G)
+
+
+@artifact('degree_pearson_correlation_coefficient')
+def degree_pearson_correlation_coefficient(precomputed):
+    return nx.degree_pearson_correlation_coefficient(precomputed.G)
+
+
+def node_attribute_matrix(G, key, dtype = float):
+    """
+    Gather a node attribute of all the nodes in a contiguous array, with one row per node,
+    None if a node does not have the attribute or if the attribute shapes differ
+    """
+
+    values = []
+    for u, value in G.nodes(data = key):
+        if value is None:
+            return None
+        values.append(value)
+
+    try:
+        return np.ascontiguousarray(values, dtype = dtype)
+    except ValueError:
+        return None
+
+
+@artifact('node_features')
+def node_features(precomputed):
+    """
+    Node features 'feat' as a float matrix (N x d), None if the nodes have no features
+    """
+
+    node_matrix = node_attribute_matrix(precomputed.G, 'feat')
+    if node_matrix is not None and node_matrix.ndim == 1:
+        node_matrix = node_matrix.reshape(-1, 1)
+
+    return node_matrix
+
+
+@artifact('node_labels')
+def node_labels(precomputed):
+    """
+    Node labels 'label' as an int vector, None if the nodes have no labels
+    (labels given as one-hot vectors are converted to their index)
+    """
+
+    labels = node_attribute_matrix(precomputed.G, 'label')
+    if labels is None:
+        return None
+    if labels.ndim == 2:
+        return np.argmax(labels, axis = 1)
+
+    return labels.astype(int)
+
+
+@artifact('node_label_matrix')
+def node_label_matrix(precomputed):
+    """
+    One-hot matrix of the node labels (N x number of labels), None if the nodes have no labels
+    (the number of labels is the graph attribute 'num_node_labels' if it exists)
+    """
+
+    G = precomputed.G
+    labels = node_attribute_matrix(G, 'label')
+    if labels is None or labels.ndim == 2:
+        return labels
+
+    labels = labels.astype(int)
+    num_node_labels = G.graph.get('num_node_labels', labels.max() + 1 if len(labels) else 0)
+
+    return np.eye(num_node_labels)[labels]
+
+
+@artifact('feature_convolutions')
+def feature_convolutions(precomputed, n_convolutions = 2):
+    """
+    Node feature matrices convoluted once and twice with the adjacency matrix plus identity,
+    None if the nodes have no features
+    """
+
+    node_matrix = precomputed.get('node_features')
+    if node_matrix is None:
+        return None
+
+    from hcga.Operations.utils import convolution_matrix, convolve
+
+    return convolve(convolution_matrix(precomputed.G), node_matrix, n_convolutions)
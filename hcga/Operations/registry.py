@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Process-wide registry of the feature operations.
+
+The operation table (operations.csv) is parsed and validated once per process,
+and the feature class of each operation is imported once, the first time it is
+used. Operations can also be registered programmatically with
+register_operation, without editing the csv file.
+
+The registry is a module global, so operations registered before creating a
+multiprocessing Pool are inherited by the workers when they are forked, but
+have to be registered again in each worker with the 'spawn' start method.
+"""
+
+import os
+import csv
+import warnings
+from importlib import import_module
+
+
+CALCULATION_SPEEDS = ['fast', 'medium', 'slow', 'veryslow']
+MAIN_FIELDS = ['function name', 'filename', 'classname', 'shortname', 'keywords', 'calculation_speed', 'precomputed']
+
+# operation tables already loaded in this process, by csv filename
+_operation_tables = {}
+
+# operations registered with register_operation
+_plugin_operations = []
+
+
+class Operation():
+
+    """
+        Entry of the operation table
+
+        Parameters
+        ----------
+
+        name: string
+            name of the operation
+        filename: string
+            module of the feature class, in hcga.Operations or as a full module path
+        classname: string
+            name of the feature class in its module
+        shortname: string
+            prefix of the feature names of the operation
+        keywords: string
+            keywords describing the operation
+        calculation_speed: string
+            speed tier of the operation ('fast', 'medium', 'slow' or 'veryslow')
+        precomputed: bool
+            True if the feature class takes the precomputed data as second argument
+        params: list
+            additional arguments passed to feature_extraction
+        feature_class: class
+            the feature class, if given it is not imported from filename and classname
+
+    """
+
+    def __init__(self, name, filename, classname, shortname, keywords = '', calculation_speed = 'fast',
+                 precomputed = False, params = None, feature_class = None):
+
+        self.name = name
+        self.filename = filename
+        self.classname = classname
+        self.shortname = shortname
+        self.keywords = keywords
+        self.calculation_speed = calculation_speed
+        self.precomputed = precomputed
+        self.params = params if params else []
+        self._feature_class = feature_class
+
+        if calculation_speed not in CALCULATION_SPEEDS:
+            raise ValueError('Operation {}: unknown calculation speed {}, must be one of {}'.format(
+                name, calculation_speed, CALCULATION_SPEEDS))
+
+    @property
+    def feature_class(self):
+        """
+        Feature class of the operation, imported the first time it is needed
+        """
+
+        if self._feature_class is None:
+            self._feature_class = resolve_class(self.filename, self.classname)
+        return self._feature_class
+
+    def __repr__(self):
+        return 'Operation({}, {}.{}, {})'.format(self.shortname, self.filename, self.classname, self.calculation_speed)
+
+
+def resolve_class(filename, classname):
+    """
+    Import a feature class, from a module of hcga.Operations or from a full module path
+    """
+
+    module_name = filename if '.' in filename else 'hcga.Operations.' + filename
+    return getattr(import_module(module_name), classname)
+
+
+def load_operations_csv(csv_filename):
+    """
+    Parse and validate an operation table
+
+    Parameters
+    ----------
+    csv_filename: string
+        path of the csv file, or name of a file in hcga/Operations
+
+    Returns
+    -------
+    operations: list
+        list of Operation, in the order of the file
+
+    """
+
+    if not os.path.isfile(csv_filename):
+        csv_filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), csv_filename)
+
+    with open(csv_filename, 'r', newline = '') as csv_file:
+        rows = list(csv.reader(line.replace('  ', ',') for line in csv_file))
+
+    operations = []
+    for line, row in enumerate(rows[1:], start = 2):
+        row = [field.strip() for field in row]
+        if not any(row):
+            continue
+
+        if len(row) < len(MAIN_FIELDS):
+            raise ValueError('{}, line {}: expected at least {} fields, got {}'.format(
+                csv_filename, line, len(MAIN_FIELDS), len(row)))
+
+        if row[6] not in ['True', 'False']:
+            raise ValueError('{}, line {}: precomputed must be True or False, got {}'.format(csv_filename, line, row[6]))
+
+        try:
+            operations.append(Operation(row[0], row[1], row[2], row[3], keywords = row[4], calculation_speed = row[5],
+                                        precomputed = row[6] == 'True', params = row[7:]))
+        except ValueError as error:
+            raise ValueError('{}, line {}: {}'.format(csv_filename, line, error))
+
+    _check_shortnames(operations, csv_filename)
+
+    return operations
+
+
+def _check_shortnames(operations, source):
+    """
+    Warn if several operations have the same shortname (the features of the last one are kept)
+    """
+
+    shortnames = {}
+    for operation in operations:
+        if operation.shortname in shortnames:
+            warnings.warn('{}: operations {} and {} have the same shortname {}'.format(
+                source, shortnames[operation.shortname].name, operation.name, operation.shortname))
+        shortnames[operation.shortname] = operation
+
+
+def get_operations(csv_filename = 'operations.csv'):
+    """
+    Return the operations of an operation table followed by the registered operations,
+    the table is only loaded the first time
+    """
+
+    if csv_filename not in _operation_tables:
+        _operation_tables[csv_filename] = load_operations_csv(csv_filename)
+
+    return _operation_tables[csv_filename] + _plugin_operations
+
+
+def register_operation(shortname, feature_class, calculation_speed = 'fast', precomputed = False,
+                       params = None, name = None, keywords = ''):
+    """
+    Register an operation, computed after the ones of the operation table
+
+    Parameters
+    ----------
+    shortname: string
+        prefix of the feature names of the operation
+    feature_class: class or string
+        feature class, following the interface of the classes of hcga.Operations,
+        or its full import path as 'module.classname'
+    calculation_speed: string
+        speed tier of the operation ('fast', 'medium', 'slow' or 'veryslow')
+    precomputed: bool
+        True if the feature class takes the precomputed data as second argument
+    params: list
+        additional arguments passed to feature_extraction
+    name: string
+        name of the operation (default to the class name)
+    keywords: string
+        keywords describing the operation
+
+    Returns
+    -------
+    operation: Operation
+        the registered operation
+
+    """
+
+    if isinstance(feature_class, str):
+        filename, classname = feature_class.rsplit('.', 1)
+        feature_class = None
+    else:
+        filename, classname = feature_class.__module__, feature_class.__name__
+
+    for operation in _plugin_operations:
+        if operation.shortname == shortname:
+            raise ValueError('An operation with shortname {} is already registered'.format(shortname))
+
+    operation = Operation(name if name else classname, filename, classname, shortname, keywords = keywords,
+                          calculation_speed = calculation_speed, precomputed = precomputed,
+                          params = params, feature_class = feature_class)
+    _plugin_operations.append(operation)
+
+    return operation
+
+
+def unregister_operation(shortname):
+    """
+    Remove a registered operation
+    """
+
+    for operation in _plugin_operations:
+        if operation.shortname == shortname:
+            _plugin_operations.remove(operation)
+            return
+
+    raise KeyError('No registered operation with shortname {}'.format(shortname))
@@ -22,17 +22,20 @@
 import pandas as pd
 import numpy as np
 import networkx as nx
+from hcga import references
+from hcga.Operations.precomputed import Precomputed
 
 class RichClub():
     """
     Rich club class    
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
-    def feature_extraction(self):
+    def feature_extraction(self, params = None):
 
         """Returns the rich-club coefficient of the graph `G`.
     
@@ -51,6 +54,9 @@ class RichClub():
         ----------
         G : graph
            A networkx graph
+        params : list
+           'normalized' to divide the coefficients by the ones of a random reference
+           with the same degree sequence (unnormalised by default)
 
         Returns
         -------
@@ -59,7 +65,8 @@ class RichClub():
 
         Notes
         -----
-        Rich club calculated using networkx:
+        Rich club calculated as networkx, for all the degrees at once from the degree
+        histograms, with the random reference cached per degree sequence (see hcga.references):
             `Networkx_centrality <https://networkx.github.io/documentation/stable/reference/algorithms/rich_club.html>`_
         
         The rich club definition and algorithm are found in [1]_.  This
@@ -86,60 +93,49 @@ class RichClub():
 
         G = self.G
 
+        normalized = bool(params) and params[0] == 'normalized'
+
+        feature_names = ['num_rich','mean_rich_coef','std_rich_coef','max_rich_coef','ratio_rich_coef','ratio_top2_coef',
+                          'top10_10','top10_9','top10_8','top10_7','top10_6','top10_5','top10_4','top10_3',
+                          'top10_2','top10_1']
+
         feature_list = {}
         if not nx.is_directed(G) and len(G)>5:            
-            # Calculating the shortest paths stats
-            attempt = 0
-            attempt_max = 20
-            while attempt < attempt_max :
-                try:
-                    
-                    rich_club = list(nx.rich_club_coefficient(G).values())       
-                    
-                    # calculate number of nodes that qualify according to degree k
-                    feature_list['num_rich']=len(rich_club)
-                    
-                    feature_list['mean_rich_coef']=np.mean(rich_club)
-                    feature_list['std_rich_coef']=np.std(rich_club)
-                    feature_list['max_rich_coef']=np.max(rich_club)      
-                    
-                    feature_list['ratio_rich_coef']=np.min(rich_club)/np.max(rich_club)
-                    if rich_club[-2]>0:
-                        feature_list['ratio_top2_coef']=rich_club[-1]/rich_club[-2]
-                    else:
-                        feature_list['ratio_top2_coef']=0
-            
-                    # top ten degree rich club coefficients
-                    if len(rich_club)>=10:
-                        top10 = rich_club[-10:]
-                    else:
-                        top10 = [1] * (10-len(rich_club)) + rich_club
-                        
-                    """
-                    feature_list = feature_list + top10
-                    """
-                    
-                    l=[10,9,8,7,6,5,4,3,2,1]
-                    for i in range(len(top10)):
-                        feature_list['top10_{}'.format(l[i])]=top10[i]
-                    
-                    break
-                
-                except Exception as e:
-                    attempt += 1   
+            A = self.precomputed.get('adjacency')
+            rich_club = references.rich_club_coefficient(references.edge_array(A), len(G))
+            if normalized:
+                with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                    rich_club = rich_club / references.rich_club_reference(A)['rich_club']
+            rich_club = list(rich_club)
 
-            if attempt == attempt_max:
-                print('Number of attempts ('+str(attempt_max)+') to compute rich_club exceeded')
+            if len(rich_club) > 1:
+                # calculate number of nodes that qualify according to degree k
+                feature_list['num_rich']=len(rich_club)
+                
+                feature_list['mean_rich_coef']=np.mean(rich_club)
+                feature_list['std_rich_coef']=np.std(rich_club)
+                feature_list['max_rich_coef']=np.max(rich_club)      
+                
+                feature_list['ratio_rich_coef']=np.min(rich_club)/np.max(rich_club)
+                if rich_club[-2]>0:
+                    feature_list['ratio_top2_coef']=rich_club[-1]/rich_club[-2]
+                else:
+                    feature_list['ratio_top2_coef']=0
+        
+                # top ten degree rich club coefficients
+                if len(rich_club)>=10:
+                    top10 = rich_club[-10:]
+                else:
+                    top10 = [1] * (10-len(rich_club)) + rich_club
+                
+                l=[10,9,8,7,6,5,4,3,2,1]
+                for i in range(len(top10)):
+                    feature_list['top10_{}'.format(l[i])]=top10[i]
 
-                feature_names = ['num_rich','mean_rich_coef','std_rich_coef','max_rich_coef','ratio_rich_coef','ratio_top2_coef',
-                                  'top10_10','top10_9','top10_8','top10_7','top10_6','top10_5','top10_4','top10_3',
-                                  'top10_2','top10_1']
+            else:
                 for j in range(len(feature_names)):
                     feature_list[feature_names[j]]=0
         else:
-            feature_names = ['num_rich','mean_rich_coef','std_rich_coef','max_rich_coef','ratio_rich_coef','ratio_top2_coef',
-                                  'top10_10','top10_9','top10_8','top10_7','top10_6','top10_5','top10_4','top10_3',
-                                  'top10_2','top10_1']
             for j in range(len(feature_names)):
                     feature_list[feature_names[j]]=np.nan
             
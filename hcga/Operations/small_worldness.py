@@ -19,14 +19,18 @@
 # You should have received a copy of the GNU General Public License
 # along with hcga.  If not, see <http://www.gnu.org/licenses/>.
 
+import numpy as np
 import networkx as nx
+from hcga import references
+from hcga.Operations.precomputed import Precomputed
 
 class SmallWorld():
     """
     Small world class
     """
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -60,8 +64,12 @@ class SmallWorld():
 
         Notes
         -----
-        Small world calculations using networkx:
+        Small world calculations adapted from networkx:
             `Networkx_omega <https://networkx.github.io/documentation/latest/_modules/networkx/algorithms/smallworld.html#omega>`_
+
+        The clustering and path lengths of the random and lattice reference graphs
+        are computed once per degree sequence, and shared by all the graphs with the
+        same degree sequence (see hcga.references).
         
         The implementation is adapted from the algorithm by Telesford et al. [1]_.
     
@@ -106,7 +114,16 @@ class SmallWorld():
         #feature_list['sigma']=nx.sigma(G)
 
 
-        #omega = 0
-        feature_list['omega']=nx.omega(G)
+        if G.number_of_nodes() < 4:
+            feature_list['omega'] = np.nan
+            self.features = feature_list
+            return
+
+        ensemble = self.precomputed.get('small_world_references')
+        C = np.mean(self.precomputed.get('clustering'))
+        L = references.average_shortest_path_length(self.precomputed.get('adjacency'), self.precomputed.get('distance_matrix'))
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            feature_list['omega'] = references.omega(C, L, ensemble)
 
         self.features = feature_list
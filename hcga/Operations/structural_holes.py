@@ -22,12 +22,15 @@
 
 import numpy as np
 import networkx as nx
+from hcga import structural_holes
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 
 
 class StructuralHoles():
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -62,6 +65,9 @@ class StructuralHoles():
 
         Notes
         -----
+        The constraint and the effective size of all the nodes are computed with
+        sparse products of the normalised mutual weights (see hcga.structural_holes),
+        as networkx.structuralholes, ignoring the edge weights.
 
         References
         ----------
@@ -78,8 +84,11 @@ class StructuralHoles():
 
         feature_list = {}
 
+        # the edges are unweighted, as networkx with weight = None
+        W = self.precomputed.get('adjacency').copy()
+        W.data[:] = 1
         
-        constraint = list(nx.structuralholes.constraint(G).values())      
+        constraint = list(structural_holes.constraint(W))      
         
         try:
             # basic stats of constraint
@@ -103,7 +112,7 @@ class StructuralHoles():
             feature_list['constraint_min']=np.nan
             feature_list['constraint_opt_model']=np.nan
             
-        effective_size = list(nx.structuralholes.effective_size(G).values())  
+        effective_size = list(structural_holes.effective_size(W))  
         
         try:
             # basic stats of effective size
@@ -115,7 +124,7 @@ class StructuralHoles():
     
     
             # best distribution to fit data
-            opt_mod_es,_ = utils.best_fit_distribution(constraint,bins=10)
+            opt_mod_es,_ = utils.best_fit_distribution(effective_size,bins=10)
             feature_list['effective_size_opt_model']=opt_mod_es
             
         except Exception as e:
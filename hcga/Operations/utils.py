@@ -19,15 +19,14 @@
 # You should have received a copy of the GNU General Public License
 # along with hcga.  If not, see <http://www.gnu.org/licenses/>.
 
-import scipy.stats as st
-import statsmodels as sm
 import warnings
 import numpy as np
-from networkx.algorithms.community import quality
 
 # Identifying optimal model with Sum of square error (SSE)
 
 def power_law_fit(data,bins=10):
+    import scipy.stats as st
+
     y, x = np.histogram(data, bins=bins)
     x = (x + np.roll(x, -1))[:-1] / 2.0
     try:
@@ -55,6 +54,8 @@ def power_law_fit(data,bins=10):
 
 def best_fit_distribution(data, bins=10, ax=None):
     """Model data by finding best fit distribution to data"""
+    import scipy.stats as st
+
     # Get histogram of original data
     y, x = np.histogram(data, bins=bins, density=True)
     x = (x + np.roll(x, -1))[:-1] / 2.0
@@ -126,27 +127,111 @@ def best_fit_distribution(data, bins=10, ax=None):
 
 
 
-def clustering_quality(G,c):
-    """Method for calculating the quality of parition"""
+def clustering_quality(G, c, A = None):
+    """Method for calculating the quality of parition
+
+    The qualities are the ones of networkx (modularity with the edge weights, coverage,
+    performance, inter-community edges and non-edges, intra-community edges), computed
+    with partition_quality from the adjacency matrix A of G (in the node order list(G)),
+    which can be given to avoid building it for each partition.
+    """
+    import networkx as nx
 
     quality_names = ['mod','coverage','performance','inter_comm_edge','inter_comm_nedge','intra_comm_edge']
-    quality_values = []
 
-    quality_values.append(quality.modularity(G,c))
-    quality_values.append(quality.coverage(G,c))
-    quality_values.append(quality.performance(G,c))
-    quality_values.append(quality.inter_community_edges(G,c))
-    quality_values.append(quality.inter_community_non_edges(G,c))
-    quality_values.append(quality.intra_community_edges(G,c))
+    if A is None:
+        A = nx.to_scipy_sparse_matrix(G, nodelist = list(G), weight = 'weight', dtype = float, format = 'csr')
+
+    quality_values = partition_quality(A, partition_labels(G, c))
 
     return quality_names,quality_values
 
 
+def partition_labels(G, c):
+    """Community index of each node of G (in the order list(G)), from a partition c of the nodes"""
+    import networkx as nx
+
+    node_index = {u: i for i, u in enumerate(G)}
+    labels = np.full(len(node_index), -1, dtype = np.int64)
+
+    for label, community in enumerate(c):
+        for u in community:
+            if u not in node_index or labels[node_index[u]] != -1:
+                raise nx.NetworkXError('`partition` is not a valid partition of the nodes of G')
+            labels[node_index[u]] = label
+
+    if (labels == -1).any():
+        raise nx.NetworkXError('`partition` is not a valid partition of the nodes of G')
+
+    return labels
+
+
+def block_edge_matrix(A, labels, n_blocks, weighted = True):
+    """Sparse matrix of the sums of edge weights between the blocks of nodes given by labels
+
+    A is a symmetric sparse adjacency matrix. The self-loops are counted twice, as the other
+    edges within a block, so that the row sums are the total degrees of the blocks.
+    If weighted is False, the edges are counted instead.
+    """
+    import scipy.sparse
+
+    A = A.tocsr()
+    rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+    cols = A.indices
+
+    weights = np.where(rows == cols, 2., 1.)
+    if weighted:
+        weights = weights * A.data
+
+    return scipy.sparse.csr_matrix((weights, (labels[rows], labels[cols])), shape = (n_blocks, n_blocks))
+
+
+def partition_quality(A, labels):
+    """Qualities of a partition of an undirected graph, from its adjacency matrix and node labels
+
+    All the qualities are obtained from the block edge matrices of the partition, in O(E + k)
+    for k communities, instead of partitioning the graph for each quality.
+
+    Returns
+    -------
+    quality_values: list
+        modularity, coverage, performance, inter-community edges, inter-community non-edges
+        and intra-community edges, as defined in networkx
+    """
+
+    n_nodes = len(labels)
+    n_blocks = labels.max() + 1 if n_nodes > 0 else 0
+
+    # twice the number of edges, and the total weight of the edges, between and within blocks
+    edges = block_edge_matrix(A, labels, n_blocks, weighted = False)
+    weights = block_edge_matrix(A, labels, n_blocks)
+
+    n_edges = int(round(edges.sum())) // 2
+    intra_edges = int(round(edges.diagonal().sum())) // 2
+    inter_edges = n_edges - intra_edges
+
+    block_sizes = np.bincount(labels, minlength = n_blocks)
+    inter_non_edges = (n_nodes ** 2 - int((block_sizes ** 2).sum())) // 2 - inter_edges
+
+    # modularity, with the weighted degrees as networkx
+    block_degrees = np.asarray(weights.sum(axis = 1)).ravel()
+    degree_sum = float(block_degrees.sum())
+    m = degree_sum / 2
+    norm = 1 / degree_sum ** 2
+    modularity = float(np.sum(weights.diagonal() / 2 * (1 / m) - block_degrees ** 2 * norm))
+
+    coverage = intra_edges / n_edges
+    performance = (intra_edges + inter_non_edges) / (n_nodes * (n_nodes - 1) // 2)
+
+    return [modularity, coverage, performance, inter_edges, inter_non_edges, intra_edges]
+
+
 
 def summary_statistics(feature_list,dist,feat_name):
     
     """ Computes summary statistics of distribution """
-        
+    import scipy.stats as st
+
     feature_list[feat_name + '_mean'] = np.mean(dist)
     feature_list[feat_name + '_min'] = np.min(dist)
     feature_list[feat_name + '_max'] = np.max(dist)
@@ -185,3 +270,43 @@ def summary_statistics(feature_list,dist,feat_name):
         feature_list[feat_name + '_bayes_confint'] = np.nan 
 
     return feature_list
+
+
+def convolution_matrix(A, normalisation = 'none'):
+    """Sparse matrix A + I used to convolute node features, from an adjacency matrix or a graph
+
+    The matrix can be normalised symmetrically ('sym', D^-1/2 (A+I) D^-1/2) or by rows
+    ('rw', D^-1 (A+I)), where D are the degrees of A + I.
+    """
+    import scipy.sparse
+
+    if not scipy.sparse.issparse(A):
+        import networkx as nx
+        A = nx.to_scipy_sparse_matrix(A, nodelist = list(A), dtype = float)
+
+    A = (A + scipy.sparse.identity(A.shape[0])).tocsr()
+
+    if normalisation == 'none':
+        return A
+
+    degrees = np.asarray(A.sum(axis = 1)).ravel()
+    with np.errstate(divide = 'ignore'):
+        if normalisation == 'sym':
+            scaling = np.where(degrees > 0, 1.0 / np.sqrt(degrees), 0.)
+            return (scipy.sparse.diags(scaling) @ A @ scipy.sparse.diags(scaling)).tocsr()
+        if normalisation == 'rw':
+            scaling = np.where(degrees > 0, 1.0 / degrees, 0.)
+            return (scipy.sparse.diags(scaling) @ A).tocsr()
+
+    raise ValueError('Unknown normalisation {}'.format(normalisation))
+
+
+def convolve(A, node_matrix, n_hops = 2):
+    """Node feature matrices after each of the n_hops products with the convolution matrix A"""
+
+    convolutions = []
+    for hop in range(n_hops):
+        node_matrix = A @ node_matrix
+        convolutions.append(node_matrix)
+
+    return convolutions
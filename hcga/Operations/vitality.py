@@ -22,11 +22,13 @@
 import numpy as np
 import networkx as nx
 from hcga.Operations import utils
+from hcga.Operations.precomputed import Precomputed
 
 
 class Vitality():
-    def __init__(self, G):
+    def __init__(self, G, precomputed = None):
         self.G = G
+        self.precomputed = precomputed if precomputed is not None else Precomputed(G)
         self.feature_names = []
         self.features = {}
 
@@ -47,6 +49,10 @@ class Vitality():
 
         Notes
         -----
+        The closeness vitality of a node is the change of the Wiener index of the graph when
+        the node is removed, as networkx.closeness_vitality. It is computed from the distance
+        matrix of the graph, by recomputing only the shortest paths from the sources whose
+        distances change when the node is removed (see closeness_vitality).
 
 
         """
@@ -61,7 +67,8 @@ class Vitality():
 
 
         
-        closeness_vitality_vals = np.asarray(list(nx.closeness_vitality(G).values()))      
+        closeness_vitality_vals = closeness_vitality(self.precomputed.get('adjacency'),
+                                                     self.precomputed.get('distance_matrix'))
         
         
         try:
@@ -102,3 +109,90 @@ class Vitality():
             feature_list['opt_mod']=np.nan
 
         self.features = feature_list
+
+
+
+def closeness_vitality(A, distances = None, block_size = 10**7):
+    """Closeness vitality of all the nodes, from the adjacency matrix and the distance matrix
+
+    The closeness vitality of node v is W(G) - W(G - v), with W the Wiener index (the sum of
+    the shortest path lengths of all the pairs of nodes, ignoring the weights), as
+    networkx.closeness_vitality.
+
+    Instead of computing the Wiener index of G - v from scratch for each node, the distances
+    of G are reused. The distances from a source s change when v is removed if and only if
+    v is the only parent of a node in the shortest path tree (DAG) of s. The sources affected
+    by the removal of each node are found from the parents of all the nodes for all the
+    sources, and only their shortest paths are recomputed in G - v.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of an undirected graph
+    distances : array
+        shortest path lengths of all the pairs of nodes, computed if not given
+    block_size : int
+        maximum number of (source, edge) pairs considered at once to find the affected sources
+
+    Returns
+    -------
+    vitality : array
+        closeness vitality of each node
+    """
+    import scipy.sparse
+    from scipy.sparse.csgraph import shortest_path
+
+    n = A.shape[0]
+    A = scipy.sparse.csr_matrix((np.ones(A.nnz), A.indices, A.indptr), shape = A.shape)
+    A = (A - scipy.sparse.diags(A.diagonal())).tocsr()
+    A.eliminate_zeros()
+
+    if distances is None:
+        distances = shortest_path(A, directed = False, unweighted = True)
+
+    wiener_index = distances.sum() / 2
+
+    def removed(v):
+        # adjacency matrix of G - v, with v kept as an isolated node
+        keep = scipy.sparse.diags((np.arange(n) != v).astype(float))
+        return keep @ A @ keep
+
+    if not np.isfinite(wiener_index):
+        # the Wiener index of a disconnected graph is infinite, so is the vitality of all nodes
+        vitality = np.empty(n)
+        for v in range(n):
+            others = np.arange(n) != v
+            after = shortest_path(removed(v), directed = False, unweighted = True)[np.ix_(others, others)].sum() / 2
+            vitality[v] = wiener_index - after
+        return vitality
+
+    # affected[s, v] is True if the distances from s change when v is removed
+    affected = np.zeros((n, n), dtype = bool)
+    rows = np.repeat(np.arange(n), np.diff(A.indptr))
+    for start in range(0, n, max(1, block_size // max(1, A.nnz))):
+        block = distances[start:start + max(1, block_size // max(1, A.nnz))]
+
+        # the parents of node t for source s are its neighbours u one step closer to s
+        is_parent = block[:, A.indices] == block[:, rows] - 1
+        cumulative_parents = np.concatenate([np.zeros((len(block), 1)), np.cumsum(is_parent, axis = 1)], axis = 1)
+        cumulative_ids = np.concatenate([np.zeros((len(block), 1)), np.cumsum(is_parent * A.indices, axis = 1)], axis = 1)
+        n_parents = cumulative_parents[:, A.indptr[1:]] - cumulative_parents[:, A.indptr[:-1]]
+        parent_ids = cumulative_ids[:, A.indptr[1:]] - cumulative_ids[:, A.indptr[:-1]]
+
+        sources, nodes = np.nonzero(n_parents == 1)
+        affected[start + sources, parent_ids[sources, nodes].astype(int)] = True
+
+    vitality = np.empty(n)
+    for v in range(n):
+        others = np.arange(n) != v
+        sources = np.flatnonzero(affected[:, v] & others)
+
+        # the pairs of nodes whose distance changes are counted from both nodes, which are both affected
+        after = wiener_index - distances[v].sum()
+        if len(sources) > 0:
+            new_distances = shortest_path(removed(v), directed = False, unweighted = True, indices = sources)
+            after += (new_distances[:, others].sum() - distances[sources][:, others].sum()) / 2
+
+        vitality[v] = wiener_index - after
+
+    return vitality
@@ -1,3 +1,18 @@
-import hcga.Operations
-import hcga.graphs
+"""hcga: highly comparative graph analysis
 
+The submodules are imported when they are first accessed, so that importing
+hcga does not load the analysis and plotting dependencies.
+
+"""
+from importlib import import_module
+
+
+def __getattr__(name):
+    if not name.startswith('_'):
+        try:
+            return import_module('hcga.' + name)
+        except ModuleNotFoundError as e:
+            # only a missing submodule, not a missing dependency of an existing one
+            if e.name != 'hcga.' + name:
+                raise
+    raise AttributeError("module 'hcga' has no attribute {}".format(name))
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Batched computations for datasets of many small graphs.
+
+The largest connected components of the graphs are packed into a single
+block-diagonal sparse adjacency matrix, with a vector giving the graph of each
+node. The node quantities used by the vectorisable operations (degrees,
+triangles, clustering, PageRank, Katz centrality, neighbour degrees, degree
+assortativity and node feature convolutions) are then computed for the whole
+batch with sparse products and segment reductions, instead of one graph at a
+time. They are given to the operations as precomputed artifacts (see
+hcga.Operations.precomputed), with the same values as the networkx functions
+the operations would call otherwise.
+"""
+
+import numpy as np
+import scipy.sparse
+
+from hcga.utils import largest_connected_subgraph
+from hcga.Operations.utils import convolution_matrix, convolve
+from hcga.Operations.precomputed import node_attribute_matrix
+
+
+class GraphBatch():
+
+    """
+        Block-diagonal representation of a list of graphs.
+
+        Parameters
+        ----------
+
+        graphs: list
+            list of undirected networkx graphs
+
+        The nodes of each graph are in the order of its largest connected
+        component, as given to the operations.
+
+    """
+
+    def __init__(self, graphs):
+
+        self.n_graphs = len(graphs)
+        self.subgraphs = [largest_connected_subgraph(G) for G in graphs]
+
+        self.n_nodes = np.array([len(G) for G in self.subgraphs], dtype = np.int64)
+        self.node_ptr = np.concatenate([[0], np.cumsum(self.n_nodes)])
+        self.graph_index = np.repeat(np.arange(self.n_graphs), self.n_nodes)
+
+        rows, cols, weights = [], [], []
+        for i, G in enumerate(self.subgraphs):
+            node_index = {u: self.node_ptr[i] + j for j, u in enumerate(G)}
+            for u, nbrs in G.adjacency():
+                for v, data in nbrs.items():
+                    rows.append(node_index[u])
+                    cols.append(node_index[v])
+                    weights.append(data.get('weight', 1))
+
+        n = self.node_ptr[-1]
+        self.weighted_adjacency = scipy.sparse.csr_matrix((np.asarray(weights, dtype = float), (rows, cols)), shape = (n, n))
+        self.adjacency = scipy.sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape = (n, n))
+
+        self.selfloops = self.adjacency.diagonal()
+        self.adjacency_no_loops = (self.adjacency - scipy.sparse.diags(self.selfloops)).tocsr()
+        self.adjacency_no_loops.eliminate_zeros()
+
+        # degree as in networkx, self-loops counting twice
+        self.degree = np.asarray(self.adjacency.sum(axis = 1)).ravel() + self.selfloops
+
+        self.artifacts = [{} for i in range(self.n_graphs)]
+
+    def segment_sum(self, values):
+        """
+        Sum of node values over each graph
+        """
+
+        return np.bincount(self.graph_index, weights = values, minlength = self.n_graphs)
+
+    def _set(self, name, values, graphs = None):
+        """
+        Split a node vector by graph and set it as artifact of the given graphs (default all)
+        """
+
+        if graphs is None:
+            graphs = range(self.n_graphs)
+        for i in graphs:
+            self.artifacts[i][name] = values[self.node_ptr[i]:self.node_ptr[i+1]]
+
+    def compute(self):
+        """
+        Compute all the batched artifacts
+
+        Returns
+        -------
+        artifacts: list
+            dict of artifacts of each graph
+        """
+
+        self.compute_degree_centrality()
+        self.compute_clustering()
+        self.compute_pagerank()
+        self.compute_katz_centrality()
+        self.compute_average_neighbor_degree()
+        self.compute_degree_assortativity()
+        self.compute_feature_convolutions()
+
+        return self.artifacts
+
+    def compute_degree_centrality(self):
+        n_nodes = self.n_nodes[self.graph_index]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            degree_centrality = np.where(n_nodes > 1, self.degree / (n_nodes - 1), 1.)
+        self._set('degree_centrality', degree_centrality)
+
+    def compute_clustering(self):
+        """
+        Triangles, clustering and transitivity, ignoring the weights and self-loops as networkx
+        """
+
+        A = self.adjacency_no_loops
+        degree = np.asarray(A.sum(axis = 1)).ravel()
+
+        # number of closed walks of length 3 through each node, twice the number of triangles
+        closed_walks = np.asarray((A @ A).multiply(A).sum(axis = 1)).ravel()
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            clustering = np.where(closed_walks > 0, closed_walks / (degree * (degree - 1)), 0.)
+
+        self._set('triangles', (closed_walks // 2).astype(int))
+        self._set('clustering', clustering)
+
+        total_closed_walks = self.segment_sum(closed_walks)
+        total_triads = self.segment_sum(degree * (degree - 1))
+        for i in range(self.n_graphs):
+            self.artifacts[i]['transitivity'] = 0 if total_closed_walks[i] == 0 else total_closed_walks[i] / total_triads[i]
+
+    def _power_iteration(self, update, x, tol, max_iter):
+        """
+        Run a power iteration for all graphs at once, each graph stopping when its l1
+        change is below its number of nodes times tol (as in networkx)
+
+        Returns the final vector and the mask of graphs that converged
+        """
+
+        converged = np.zeros(self.n_graphs, dtype = bool)
+        for it in range(max_iter):
+            x_new = update(x)
+            err = self.segment_sum(np.abs(x_new - x))
+
+            # graphs already converged keep their values
+            active = ~converged[self.graph_index]
+            x = np.where(active, x_new, x)
+
+            converged |= err < self.n_nodes * tol
+            if converged.all():
+                break
+
+        return x, converged
+
+    def compute_pagerank(self, alpha = 0.85, max_iter = 100, tol = 1.0e-6):
+        """
+        Weighted PageRank, as networkx.pagerank
+        """
+
+        A = self.weighted_adjacency
+        S = np.asarray(A.sum(axis = 1)).ravel()
+        dangling = S == 0
+        S[~dangling] = 1.0 / S[~dangling]
+        A = scipy.sparse.diags(S) @ A
+        AT = A.T.tocsr()
+
+        p = 1.0 / self.n_nodes[self.graph_index]
+
+        def update(x):
+            dangling_sum = self.segment_sum(np.where(dangling, x, 0.))[self.graph_index]
+            return alpha * (AT @ x + dangling_sum * p) + (1 - alpha) * p
+
+        x, converged = self._power_iteration(update, p.copy(), tol, max_iter)
+
+        # graphs that did not converge are left to networkx, which raises the error
+        self._set('pagerank', x, np.flatnonzero(converged))
+
+    def compute_katz_centrality(self, alpha = 0.1, beta = 1.0, max_iter = 1000, tol = 1.0e-6):
+        """
+        Unweighted Katz centrality, as networkx.katz_centrality
+        """
+
+        AT = self.adjacency.T.tocsr()
+
+        def update(x):
+            return alpha * (AT @ x) + beta
+
+        x, converged = self._power_iteration(update, np.zeros(self.node_ptr[-1]), tol, max_iter)
+
+        norm = np.sqrt(self.segment_sum(x ** 2))
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            s = np.where(norm > 0, 1.0 / norm, 1.)
+
+        # graphs that did not converge are left to networkx, which raises the error
+        self._set('katz_centrality', x * s[self.graph_index], np.flatnonzero(converged))
+
+    def compute_average_neighbor_degree(self):
+        """
+        Unweighted average neighbour degree, as networkx.average_neighbor_degree
+        """
+
+        neighbor_degree = self.adjacency @ self.degree
+        self._set('average_neighbor_degree', neighbor_degree / np.maximum(self.degree, 1))
+
+    def compute_degree_assortativity(self):
+        """
+        Degree assortativity, as the Pearson correlation of the degrees at both ends of the edges
+        """
+
+        A = self.adjacency.tocoo()
+        edge_graph = self.graph_index[A.row]
+        x = self.degree[A.row]
+        y = self.degree[A.col]
+
+        count = np.bincount(edge_graph, minlength = self.n_graphs)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            mean_x = np.bincount(edge_graph, weights = x, minlength = self.n_graphs) / count
+            mean_y = np.bincount(edge_graph, weights = y, minlength = self.n_graphs) / count
+            dx = x - mean_x[edge_graph]
+            dy = y - mean_y[edge_graph]
+            covariance = np.bincount(edge_graph, weights = dx * dy, minlength = self.n_graphs)
+            variance_x = np.bincount(edge_graph, weights = dx ** 2, minlength = self.n_graphs)
+            variance_y = np.bincount(edge_graph, weights = dy ** 2, minlength = self.n_graphs)
+            correlation = covariance / np.sqrt(variance_x * variance_y)
+
+        # with less than two degree pairs, networkx raises an error
+        for i in np.flatnonzero(count >= 2):
+            self.artifacts[i]['degree_assortativity_coefficient'] = correlation[i]
+            self.artifacts[i]['degree_pearson_correlation_coefficient'] = correlation[i]
+
+    def compute_feature_convolutions(self, n_convolutions = 2):
+        """
+        Node features convoluted with the weighted adjacency matrix plus identity
+        (only for the graphs whose nodes all have features of the same dimension)
+        """
+
+        node_matrices = []
+        for G in self.subgraphs:
+            node_matrix = node_attribute_matrix(G, 'feat')
+            if node_matrix is not None and node_matrix.ndim == 1:
+                node_matrix = node_matrix.reshape(-1, 1)
+            node_matrices.append(node_matrix)
+
+        feat_dims = {node_matrix.shape[1] for node_matrix in node_matrices if node_matrix is not None}
+        if len(feat_dims) != 1:
+            return
+
+        has_feat = np.array([node_matrix is not None for node_matrix in node_matrices])
+        node_matrix = np.zeros((self.node_ptr[-1], feat_dims.pop()))
+        for i in np.flatnonzero(has_feat):
+            node_matrix[self.node_ptr[i]:self.node_ptr[i+1]] = node_matrices[i]
+
+        convolutions = convolve(convolution_matrix(self.weighted_adjacency), node_matrix, n_convolutions)
+
+        for i in np.flatnonzero(has_feat):
+            self.artifacts[i]['feature_convolutions'] = [node_matrix[self.node_ptr[i]:self.node_ptr[i+1]]
+                                                         for node_matrix in convolutions]
+
+
+def batch_artifacts(graphs, batch_size = 4096):
+    """
+    Compute the batched artifacts of a list of graphs, by batches of batch_size graphs
+
+    Returns
+    -------
+    artifacts: list
+        dict of artifacts of each graph
+    """
+
+    artifacts = []
+    for start in range(0, len(graphs), batch_size):
+        artifacts += GraphBatch(graphs[start:start + batch_size]).compute()
+
+    return artifacts
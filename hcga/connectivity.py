@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Flow based connectivity of undirected graphs.
+
+The maximum flows are computed with scipy.sparse.csgraph.maximum_flow on integer
+capacity matrices built once per graph:
+
+- the edge flow network, with a unit capacity in both directions of each edge,
+  gives the Gomory-Hu tree of the graph (in n - 1 flows, with Gusfield's
+  algorithm), and all the local and global edge connectivities from it,
+- the auxiliary node flow network of networkx, where each node i is split into
+  an entry node 2i and an exit node 2i + 1 joined by a unit capacity, gives the
+  local node connectivities, and the global node connectivity with Even's
+  algorithm,
+- the k-components (maximal k-node-connected subgraphs) of all orders are found
+  by splitting the biconnected blocks along node cuts of the same network.
+
+The values are the ones of the networkx functions with the same names, with the
+nodes in the order of the rows of the adjacency matrix.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+import scipy.sparse
+
+
+def _without_selfloops(A):
+    """Binary adjacency matrix without the self-loops"""
+
+    A = scipy.sparse.csr_matrix((np.ones(A.nnz, dtype = np.int32), A.indices, A.indptr), shape = A.shape)
+    A = (A - scipy.sparse.diags(A.diagonal())).tocsr().astype(np.int32)
+    A.eliminate_zeros()
+
+    return A
+
+
+def degrees(A):
+    """Degrees of the nodes, with the self-loops counted twice as in networkx"""
+
+    return np.diff(A.indptr) + (A.diagonal() != 0)
+
+
+def edge_flow_network(A):
+    """Capacity matrix with a unit capacity in both directions of each edge"""
+
+    return _without_selfloops(A)
+
+
+def node_flow_network(A):
+    """Capacity matrix of the auxiliary network for node connectivity
+
+    Node i is split into the entry node 2i and the exit node 2i + 1, with a unit capacity
+    from 2i to 2i + 1, and each edge (i, j) gives unit capacities from 2i + 1 to 2j and
+    from 2j + 1 to 2i.
+    """
+
+    A = _without_selfloops(A).tocoo()
+    n = A.shape[0]
+
+    rows = np.concatenate([2 * np.arange(n), 2 * A.row + 1])
+    cols = np.concatenate([2 * np.arange(n) + 1, 2 * A.col])
+
+    return scipy.sparse.csr_matrix((np.ones(len(rows), dtype = np.int32), (rows, cols)), shape = (2 * n, 2 * n))
+
+
+def maximum_flow(C, source, target):
+    """Maximum flow value between two nodes of a capacity matrix, and the flow matrix"""
+    from scipy.sparse.csgraph import maximum_flow as _maximum_flow
+
+    result = _maximum_flow(C, source, target)
+    flow = result.flow if hasattr(result, 'flow') else result.residual
+
+    return result.flow_value, flow
+
+
+def minimum_cut(C, source, target):
+    """Minimum cut value between two nodes of a capacity matrix, and the mask of the nodes
+    on the source side of the cut (reachable from the source in the residual network)
+    """
+    from scipy.sparse.csgraph import breadth_first_order
+
+    flow_value, flow = maximum_flow(C, source, target)
+
+    residual = (C - flow).tocsr()
+    residual.data[residual.data < 0] = 0
+    residual.eliminate_zeros()
+
+    source_side = np.zeros(C.shape[0], dtype = bool)
+    source_side[breadth_first_order(residual, source, directed = True, return_predecessors = False)] = True
+
+    return flow_value, source_side
+
+
+def gomory_hu_tree(A):
+    """Gomory-Hu tree of a connected graph, with n - 1 minimum cuts (Gusfield's algorithm)
+
+    Returns
+    -------
+    parent: array
+        parent of each node in the tree (node 0 is the root and its own parent)
+    cut_values: array
+        value of the minimum cut between each node and its parent (0 for the root)
+    """
+
+    C = edge_flow_network(A)
+    n = C.shape[0]
+
+    parent = np.zeros(n, dtype = np.int64)
+    cut_values = np.zeros(n, dtype = np.int64)
+
+    for s in range(1, n):
+        t = parent[s]
+        cut_value, source_side = minimum_cut(C, s, t)
+        cut_values[s] = cut_value
+
+        parent[(np.arange(n) != s) & source_side & (parent == t)] = s
+
+        if source_side[parent[t]]:
+            parent[s], parent[t] = parent[t], s
+            cut_values[s], cut_values[t] = cut_values[t], cut_value
+
+    return parent, cut_values
+
+
+def all_pairs_edge_connectivity(A, tree = None):
+    """Local edge connectivity of all the pairs of nodes, as the smallest cut value on the
+    path between them in the Gomory-Hu tree (with 0 on the diagonal)
+    """
+
+    parent, cut_values = gomory_hu_tree(A) if tree is None else tree
+    n = len(parent)
+
+    children = [[] for i in range(n)]
+    for node in range(1, n):
+        children[parent[node]].append(node)
+        children[node].append(parent[node])
+
+    connectivity = np.zeros((n, n), dtype = np.int64)
+    for source in range(n):
+        # smallest cut on the tree path from source, by depth first search
+        stack = [(source, -1, np.iinfo(np.int64).max)]
+        while stack:
+            node, previous, smallest_cut = stack.pop()
+            connectivity[source, node] = smallest_cut if node != source else 0
+            for neighbour in children[node]:
+                if neighbour != previous:
+                    cut_value = cut_values[neighbour] if parent[neighbour] == node else cut_values[node]
+                    stack.append((neighbour, node, min(smallest_cut, cut_value)))
+
+    return connectivity
+
+
+def edge_connectivity(A, tree = None):
+    """Edge connectivity of a connected graph, the smallest cut value of its Gomory-Hu tree
+    (bounded by the minimum degree, as networkx.edge_connectivity)
+    """
+
+    parent, cut_values = gomory_hu_tree(A) if tree is None else tree
+    min_degree = degrees(A).min() if A.shape[0] > 0 else 0
+
+    return int(min(min_degree, cut_values[1:].min())) if len(parent) > 1 else int(min_degree)
+
+
+def local_node_connectivity(C, source, target):
+    """Local node connectivity between two nodes, from the auxiliary node flow network C"""
+
+    return maximum_flow(C, 2 * source + 1, 2 * target)[0]
+
+
+def all_pairs_node_connectivity(A, C = None):
+    """Local node connectivity of all the pairs of nodes, as networkx.all_pairs_node_connectivity
+    (with 0 on the diagonal)
+    """
+
+    C = node_flow_network(A) if C is None else C
+    n = A.shape[0]
+
+    connectivity = np.zeros((n, n), dtype = np.int64)
+    for source in range(n):
+        for target in range(source + 1, n):
+            connectivity[source, target] = connectivity[target, source] = local_node_connectivity(C, source, target)
+
+    return connectivity
+
+
+def node_connectivity(A, C = None, connectivity = None):
+    """Node connectivity of a connected graph, as networkx.node_connectivity
+
+    With Even's algorithm, the local connectivities between a node of minimum degree and its
+    non-neighbours, and between its non-adjacent neighbours, or from the local connectivities
+    of all the pairs of non-adjacent nodes if they are given.
+    """
+
+    n = A.shape[0]
+    node_degrees = degrees(A)
+    if n == 0:
+        return 0
+
+    adjacency = _without_selfloops(A)
+
+    if connectivity is not None:
+        non_adjacent = ~(adjacency.toarray().astype(bool)) & ~np.eye(n, dtype = bool)
+        return int(min(node_degrees.min(), connectivity[non_adjacent].min())) if non_adjacent.any() else int(node_degrees.min())
+
+    C = node_flow_network(A) if C is None else C
+
+    v = np.argmin(node_degrees)
+    K = node_degrees[v]
+
+    neighbours = adjacency.indices[adjacency.indptr[v]:adjacency.indptr[v + 1]]
+    non_neighbours = np.setdiff1d(np.arange(n), np.append(neighbours, v))
+    for w in non_neighbours:
+        K = min(K, local_node_connectivity(C, v, w))
+
+    for i, x in enumerate(neighbours):
+        x_neighbours = adjacency.indices[adjacency.indptr[x]:adjacency.indptr[x + 1]]
+        for y in np.setdiff1d(neighbours[i + 1:], x_neighbours):
+            K = min(K, local_node_connectivity(C, x, y))
+
+    return int(K)
+
+
+def average_node_connectivity(connectivity):
+    """Average local node connectivity of the pairs of nodes, from all the local connectivities"""
+
+    n = connectivity.shape[0]
+    if n < 2:
+        return 0
+
+    return connectivity[np.triu_indices(n, 1)].sum() / (n * (n - 1) / 2)
+
+
+def minimum_node_cut(C, source, target):
+    """Minimum node cut between two non-adjacent nodes, from the auxiliary node flow network C
+
+    The arcs of the minimum cut of the flow network are either arcs of nodes, which are in the
+    node cut, or arcs of edges, whose head node is in the node cut (or the tail node if the head
+    is the target), so that the node cut has at most as many nodes as the cut has arcs.
+
+    Returns
+    -------
+    flow_value: int
+        local node connectivity of the two nodes
+    cut: array
+        nodes of the cut
+    """
+
+    flow_value, source_side = minimum_cut(C, 2 * source + 1, 2 * target)
+
+    C = C.tocoo()
+    crossing = source_side[C.row] & ~source_side[C.col]
+    tails, heads = C.row[crossing] // 2, C.col[crossing] // 2
+    nodes = np.where((C.row[crossing] % 2 == 0) | (heads == target), tails, heads)
+
+    return flow_value, np.unique(nodes)
+
+
+def node_cut(A, k = None, C = None, connectivity = None, approximate = False):
+    """Node connectivity of a connected graph and a minimum node cut, with Even's algorithm
+
+    The search stops at the first cut with less than k nodes, or with connectivity nodes
+    if the node connectivity is already known. With approximate, only the cuts separating
+    the node of minimum degree from another node are searched (the cuts containing this node
+    are missed, so the connectivity may be overestimated).
+
+    Returns
+    -------
+    connectivity: int
+        node connectivity of the graph (or the size of the first cut with less than k nodes)
+    cut: array
+        nodes of the cut, None for a complete graph which has no node cut
+    """
+
+    n = A.shape[0]
+    adjacency = _without_selfloops(A)
+    node_degrees = np.diff(adjacency.indptr)
+    C = node_flow_network(adjacency) if C is None else C
+
+    def neighbours(u):
+        return adjacency.indices[adjacency.indptr[u]:adjacency.indptr[u + 1]]
+
+    v = np.argmin(node_degrees)
+    best, best_pair = node_degrees[v], None
+
+    pairs = ((v, w) for w in np.setdiff1d(np.arange(n), np.append(neighbours(v), v)))
+    if not approximate:
+        x_neighbours = neighbours(v)
+        pairs = _chain(pairs, ((x, y) for i, x in enumerate(x_neighbours)
+                               for y in np.setdiff1d(x_neighbours[i + 1:], neighbours(x))))
+
+    for x, y in pairs:
+        if (k is not None and best < k) or (connectivity is not None and best <= connectivity):
+            break
+        flow_value = local_node_connectivity(C, x, y)
+        if flow_value < best:
+            best, best_pair = flow_value, (x, y)
+
+    if best_pair is not None:
+        return int(best), minimum_node_cut(C, *best_pair)[1]
+
+    # the neighbours of the node of minimum degree, unless the graph is complete
+    return int(best), (neighbours(v) if best < n - 1 else None)
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+def _k_core(A, nodes, k):
+    """Nodes of the k-core of the subgraph induced by some nodes"""
+
+    while len(nodes) > 0:
+        keep = np.diff(A[nodes][:, nodes].indptr) >= k
+        if keep.all():
+            break
+        nodes = nodes[keep]
+
+    return nodes
+
+
+def _connected_parts(A, nodes):
+    """Nodes of the connected components of the subgraph induced by some nodes"""
+    from scipy.sparse.csgraph import connected_components
+
+    n_parts, labels = connected_components(A[nodes][:, nodes], directed = False)
+
+    return [nodes[labels == i] for i in range(n_parts)]
+
+
+def biconnected_blocks(A):
+    """Nodes of the biconnected components of a graph"""
+    import networkx as nx
+
+    G = nx.Graph()
+    G.add_nodes_from(range(A.shape[0]))
+    G.add_edges_from(zip(*scipy.sparse.triu(A, k = 1).nonzero()))
+
+    return [np.sort(list(block)) for block in nx.biconnected_components(G)]
+
+
+def k_components(A, C = None, connectivity = None, approximate = False):
+    """k-components of all orders k, the maximal subgraphs of node connectivity at least k,
+    as networkx.k_components
+
+    The 1-components are the connected components and the 2-components the biconnected
+    blocks (with more than 2 nodes). Each block is then searched independently: the nodes of
+    degree less than k are removed (k-core), and each connected part is either k-connected, in
+    which case it is a k-component for all the orders up to its node connectivity, or it is
+    split into the unions of a node cut with less than k nodes and each component left after
+    removing the cut, as a k-component is never separated by such a cut (Wen et al., 2016).
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of an undirected graph
+    C : sparse matrix
+        auxiliary node flow network of the graph, used if the graph is biconnected
+    connectivity : int
+        node connectivity of the graph, used if the graph is biconnected
+    approximate : bool
+        True to search the node cuts with approximate=True (see node_cut), faster on large
+        graphs but may give too large components
+
+    Returns
+    -------
+    k_components : dict
+        node indices of the k-components of each order k, from the largest order
+    """
+
+    A = _without_selfloops(A)
+    n = A.shape[0]
+    components = defaultdict(list)
+
+    for part in _connected_parts(A, np.arange(n)):
+        if len(part) > 1:
+            components[1].append(part)
+
+    stack = [(2, block) for block in biconnected_blocks(A) if len(block) > 2]
+    while stack:
+        k, nodes = stack.pop()
+
+        for part in _connected_parts(A, _k_core(A, nodes, k)):
+            if len(part) <= k:
+                continue
+
+            if len(part) == n and connectivity is not None:
+                # the whole graph, whose flow network and node connectivity are already known
+                part_connectivity, cut = node_cut(A, k, C, connectivity, approximate)
+            else:
+                part_connectivity, cut = node_cut(A[part][:, part], k, approximate = approximate)
+
+            if part_connectivity >= k:
+                for order in range(k, part_connectivity + 1):
+                    components[order].append(part)
+                order = part_connectivity + 1
+            else:
+                order = k
+
+            if cut is None:
+                continue
+
+            # each side of the cut, with the cut
+            rest = np.setdiff1d(np.arange(len(part)), cut)
+            for side in _connected_parts(A[part][:, part], rest):
+                stack.append((order, part[np.union1d(side, cut)]))
+
+    return {k: [set(component.tolist()) for component in components[k]] for k in sorted(components, reverse = True)}
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Global and local efficiencies on sparse adjacency matrices.
+
+The local efficiency of a node is the global efficiency of the subgraph induced
+by its neighbours (its ego network without the node itself), as in
+networkx.local_efficiency. The ego networks are taken directly from the CSR
+arrays of the adjacency matrix: the ones with the same number of nodes are
+stacked into dense boolean blocks, and the distances in all of them are found
+together by breadth-first search, one layer of the search per (batched) matrix
+product. The large ego networks are searched one by one with the breadth-first
+search of scipy.sparse.csgraph.
+
+The edges are unweighted. As in networkx, a node with a self-loop is one of its
+own neighbours, so it belongs to its ego network, but the self-loops do not
+change the distances.
+"""
+
+import numpy as np
+import scipy.sparse
+
+
+def _inverse_sum(distances):
+    """Sum of the inverse distances, without the zero and infinite distances"""
+
+    with np.errstate(divide = 'ignore'):
+        inverse_distances = 1. / np.asarray(distances, dtype = np.float64)
+    inverse_distances[~np.isfinite(inverse_distances)] = 0.
+
+    return inverse_distances.sum()
+
+
+def global_efficiency(distances):
+    """Global efficiency (average inverse distance between the pairs of distinct nodes) from the
+    shortest path lengths, as networkx.global_efficiency (0 with less than two nodes)
+    """
+
+    n = len(distances)
+    if n < 2:
+        return 0.
+
+    return _inverse_sum(distances) / (n * (n - 1))
+
+
+def _edge_keys(A):
+    """Sorted keys i * n + j of the edges of a binary adjacency matrix"""
+
+    n = A.shape[0]
+    rows = np.repeat(np.arange(n, dtype = np.int64), np.diff(A.indptr))
+
+    return rows * n + A.indices
+
+
+def _dense_efficiencies(keys, n, neighbourhoods):
+    """Efficiencies of the ego networks of the same size k, given by their nodes (b x k)"""
+
+    b, k = neighbourhoods.shape
+    if k < 2:
+        return np.zeros(b)
+
+    # adjacency matrices of the ego networks, by lookup of the edges between their nodes
+    queries = neighbourhoods[:, :, None] * n + neighbourhoods[:, None, :]
+    positions = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+    adjacency = (keys[positions] == queries).astype(np.float32)
+
+    # breadth-first search from all the nodes at once, one distance at a time
+    inverse_distance_sums = adjacency.sum(axis = (1, 2), dtype = np.float64)
+    reached = adjacency.astype(bool) | np.eye(k, dtype = bool)
+    frontier = adjacency
+    distance = 1
+    while frontier.any():
+        distance += 1
+        frontier = ((frontier @ adjacency) > 0) & ~reached
+        reached |= frontier
+        inverse_distance_sums += frontier.sum(axis = (1, 2), dtype = np.float64) / distance
+        frontier = frontier.astype(np.float32)
+
+    return inverse_distance_sums / (k * (k - 1))
+
+
+def _sparse_efficiency(A, neighbourhood, chunk_size = 256):
+    """Efficiency of a large ego network, searched from chunks of its nodes"""
+    from scipy.sparse.csgraph import shortest_path
+
+    k = len(neighbourhood)
+    subgraph = A[neighbourhood][:, neighbourhood]
+
+    inverse_distance_sum = 0.
+    for start in range(0, k, chunk_size):
+        distances = shortest_path(subgraph, directed = False, unweighted = True,
+                                  indices = np.arange(start, min(start + chunk_size, k)))
+        inverse_distance_sum += _inverse_sum(distances)
+
+    return inverse_distance_sum / (k * (k - 1))
+
+
+def local_efficiencies(A, nodes = None, max_dense_size = 64, batch_entries = 2 ** 22):
+    """Local efficiencies of the nodes, whose mean is networkx.local_efficiency
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of an undirected graph
+    nodes : array
+        nodes to compute the local efficiency of (all the nodes by default), to split the
+        computation in independent parts
+    max_dense_size : int
+        largest ego network searched as a dense block
+    batch_entries : int
+        maximum number of entries of the dense blocks searched together
+
+    Returns
+    -------
+    local_efficiencies : array
+        local efficiency of each node
+    """
+
+    A = scipy.sparse.csr_matrix(A)
+    n = A.shape[0]
+
+    # the neighbourhoods include the self-loops, the edges between the neighbours do not
+    neighbours = scipy.sparse.csr_matrix((np.ones(A.nnz), A.indices, A.indptr), shape = A.shape)
+    neighbours.sort_indices()
+    A = (neighbours - scipy.sparse.diags(neighbours.diagonal())).tocsr()
+    A.eliminate_zeros()
+    A.sort_indices()
+
+    nodes = np.arange(n) if nodes is None else np.asarray(nodes, dtype = np.int64)
+    degrees = np.diff(neighbours.indptr)[nodes]
+    keys = _edge_keys(A)
+
+    efficiencies = np.zeros(len(nodes))
+    for k in np.unique(degrees):
+        if k < 2:
+            continue
+        same_size = np.flatnonzero(degrees == k)
+
+        if k > max_dense_size:
+            for i in same_size:
+                neighbourhood = neighbours.indices[neighbours.indptr[nodes[i]]:neighbours.indptr[nodes[i] + 1]]
+                efficiencies[i] = _sparse_efficiency(A, neighbourhood)
+            continue
+
+        batch_size = max(1, batch_entries // (k * k))
+        for batch in np.array_split(same_size, int(np.ceil(len(same_size) / batch_size))):
+            neighbourhoods = neighbours.indices[neighbours.indptr[nodes[batch]][:, None] + np.arange(k)].astype(np.int64)
+            efficiencies[batch] = _dense_efficiencies(keys, n, neighbourhoods)
+
+    return efficiencies
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Columnar storage of feature matrices.
+
+A feature store is a directory with one .npy file per block of columns (one
+block per operation, e.g. all the 'BS_*' features) and an index.json file
+with the column names of each block. The blocks are stored in column-major
+order, so that a subset of features can be loaded by memory mapping without
+reading the rest of the matrix, and rows can be written incrementally while
+the features are extracted.
+
+The store can also hold the number of nodes and edges of each graph, in which
+case the features normalised by them (with suffixes '_N' and '_E') are
+available as virtual columns, computed when they are loaded.
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+
+INDEX_FILE = 'index.json'
+NORMALISATION_FILE = 'normalisation.npy'
+NORMALISATIONS = ['N', 'E']
+
+
+class FeatureStore():
+
+    """
+        Columnar store of a feature matrix (rows are graphs, columns are features).
+
+        Parameters
+        ----------
+
+        directory: string
+            directory of the store on disk, if None the store is kept in memory.
+            If the directory contains a store, it is opened (memory mapped).
+        buffer_size: int
+            number of rows kept in memory before being written to the blocks
+
+    """
+
+    def __init__(self, directory = None, buffer_size = 1024):
+
+        self.directory = directory
+        self.buffer_size = buffer_size
+
+        self.columns = []
+        self.n_rows = 0
+        self.blocks = []  # list of dict with block name, column names, column positions and data array
+        self.normalisation = None  # array with the number of nodes and edges of each graph
+
+        self._buffer = None
+        self._buffer_rows = []
+
+        if directory is not None and os.path.isfile(os.path.join(directory, INDEX_FILE)):
+            self._open()
+
+    def create(self, columns, n_rows, dtype = np.float64):
+        """
+        Create an empty store with given column names and number of rows
+        """
+
+        self.columns = list(columns)
+        self.n_rows = n_rows
+        self.blocks = []
+        self.normalisation = None
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok = True)
+
+            # the files of a previous store in the directory do not apply to the new one
+            for filename in os.listdir(self.directory):
+                if filename == NORMALISATION_FILE or (filename.startswith('block_') and filename.endswith('.npy')):
+                    os.remove(os.path.join(self.directory, filename))
+
+        for name, positions in _column_blocks(self.columns).items():
+            block = {'name': name,
+                     'columns': [self.columns[j] for j in positions],
+                     'positions': np.asarray(positions)}
+
+            if self.directory is None:
+                block['data'] = np.zeros((n_rows, len(positions)), dtype = dtype, order = 'F')
+            else:
+                block['file'] = 'block_{}.npy'.format(len(self.blocks))
+                block['data'] = np.lib.format.open_memmap(os.path.join(self.directory, block['file']), mode = 'w+',
+                                                          dtype = dtype, shape = (n_rows, len(positions)), fortran_order = True)
+            self.blocks.append(block)
+
+        if self.directory is not None:
+            index = {'n_rows': n_rows,
+                     'columns': self.columns,
+                     'blocks': [{'name': block['name'], 'file': block['file'], 'columns': block['columns']} for block in self.blocks]}
+
+            with open(os.path.join(self.directory, INDEX_FILE), 'w') as index_file:
+                json.dump(index, index_file)
+
+        self._buffer = np.empty((self.buffer_size, len(self.columns)), dtype = dtype)
+        self._buffer_rows = []
+
+    def _open(self):
+        """
+        Open an existing store, the blocks are memory mapped
+        """
+
+        with open(os.path.join(self.directory, INDEX_FILE), 'r') as index_file:
+            index = json.load(index_file)
+
+        self.columns = index['columns']
+        self.n_rows = index['n_rows']
+
+        if os.path.isfile(os.path.join(self.directory, NORMALISATION_FILE)):
+            self.normalisation = np.load(os.path.join(self.directory, NORMALISATION_FILE))
+
+        column_positions = {column: j for j, column in enumerate(self.columns)}
+        self.blocks = []
+        for block in index['blocks']:
+            self.blocks.append({'name': block['name'],
+                                'file': block['file'],
+                                'columns': block['columns'],
+                                'positions': np.array([column_positions[c] for c in block['columns']], dtype = int),
+                                'data': np.load(os.path.join(self.directory, block['file']), mmap_mode = 'r')})
+
+    def set_normalisation(self, N, E):
+        """
+        Set the number of nodes N and edges E of each graph, used for the normalised columns
+        """
+
+        self.normalisation = np.array([N, E], dtype = np.float64)
+
+        if self.directory is not None:
+            np.save(os.path.join(self.directory, NORMALISATION_FILE), self.normalisation)
+
+    @property
+    def compounded_columns(self):
+        """
+        Names of the raw columns followed by the columns normalised by N and by E
+        """
+
+        return self.compound(self.columns)
+
+    def compound(self, columns):
+        """
+        Return the names of the given raw columns followed by their normalised columns
+        """
+
+        compounded_columns = list(columns)
+        if self.normalisation is not None:
+            for normalisation in NORMALISATIONS:
+                compounded_columns += [column + '_' + normalisation for column in columns]
+
+        return compounded_columns
+
+    def _resolve(self, column, raw_columns):
+        """
+        Return the raw column and the normalisation (None if raw) of a column name
+        """
+
+        if column in raw_columns:
+            return column, None
+
+        if self.normalisation is not None:
+            for normalisation in NORMALISATIONS:
+                if column.endswith('_' + normalisation) and column[:-len(normalisation)-1] in raw_columns:
+                    return column[:-len(normalisation)-1], normalisation
+
+        raise KeyError('Feature {} not in the feature store'.format(column))
+
+    def write_row(self, i, values):
+        """
+        Write the values of row i (rows are buffered, call flush at the end)
+        """
+
+        self._buffer[len(self._buffer_rows)] = values
+        self._buffer_rows.append(i)
+
+        if len(self._buffer_rows) == self.buffer_size:
+            self.flush()
+
+    def write(self, rows, values):
+        """
+        Write a set of rows at once
+        """
+
+        values = np.asarray(values)
+        for block in self.blocks:
+            block['data'][rows, :] = values[:, block['positions']]
+
+    def flush(self):
+        """
+        Write the buffered rows to the blocks
+        """
+
+        if self._buffer_rows:
+            self.write(np.asarray(self._buffer_rows), self._buffer[:len(self._buffer_rows)])
+            self._buffer_rows = []
+
+        if self.directory is not None:
+            for block in self.blocks:
+                if block['data'].flags.writeable:
+                    block['data'].flush()
+
+    def load(self, columns = None, rows = None):
+        """
+        Load a subset of the feature matrix as a DataFrame
+
+        Parameters
+        ----------
+        columns: list
+            names of the features to load, raw or normalised (default all raw features)
+        rows: list or slice
+            graphs to load (default all)
+
+        Returns
+        -------
+        feature_matrix: DataFrame
+            features as columns and graphs as rows
+
+        """
+
+        if columns is None:
+            columns = self.columns
+        if rows is None:
+            rows = slice(None)
+
+        column_blocks = {}
+        for b, block in enumerate(self.blocks):
+            for k, column in enumerate(block['columns']):
+                column_blocks[column] = (b, k)
+
+        # read each needed block only once, with the selected raw columns
+        resolved = [self._resolve(column, column_blocks) for column in columns]
+        requested = {}
+        for raw_column, _ in resolved:
+            b, k = column_blocks[raw_column]
+            if k not in requested.setdefault(b, []):
+                requested[b].append(k)
+
+        raw_values = {}
+        for b, ks in requested.items():
+            data = np.asarray(self.blocks[b]['data'][:, ks][rows])
+            for j, k in enumerate(ks):
+                raw_values[self.blocks[b]['columns'][k]] = data[:, j]
+
+        # normalised columns are computed on the fly
+        values = {}
+        for column, (raw_column, normalisation) in zip(columns, resolved):
+            if normalisation is None:
+                values[column] = raw_values[raw_column]
+            else:
+                with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                    values[column] = raw_values[raw_column] / self.normalisation[NORMALISATIONS.index(normalisation)][rows]
+
+        index = np.arange(self.n_rows)[rows]
+
+        return pd.DataFrame(values, index = index, columns = columns)
+
+    def clean(self, chunk_size = None, dtype = np.float64):
+        """
+        Find the raw and normalised features to remove because they contain nan or 
+        infinite values, only zeros, or constant values.
+
+        The blocks are read by chunks of columns, and the three masks are computed in
+        a single pass over each chunk, for the raw and normalised values at once.
+
+        Parameters
+        ----------
+        chunk_size: int
+            number of raw columns read at once (default to chunks of about 10^7 values)
+        dtype: numpy dtype
+            type used for the checks (np.float32 halves the memory of each chunk)
+
+        Returns
+        -------
+        kept_columns: list
+            names of the features to keep, in the order of compounded_columns
+        dropped_columns: dict
+            names of the removed features for each reason ('nan_inf', 'zeros', 'constant')
+
+        """
+
+        denominators = [np.ones(self.n_rows)]
+        if self.normalisation is not None:
+            denominators += list(self.normalisation)
+        denominators = np.array(denominators, dtype = dtype)[:, :, np.newaxis]
+
+        if chunk_size is None:
+            chunk_size = max(1, 10**7 // (len(denominators) * max(self.n_rows, 1)))
+
+        kept = {}
+        dropped_columns = {'nan_inf': [], 'zeros': [], 'constant': []}
+        for block in self.blocks:
+            for start in range(0, len(block['columns']), chunk_size):
+                chunk = np.asarray(block['data'][:, start:start + chunk_size], dtype = dtype)
+                columns = block['columns'][start:start + chunk_size]
+
+                # raw and normalised values of the chunk, as (n_normalisations, n_rows, n_columns)
+                with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                    values = chunk[np.newaxis] / denominators
+
+                finite = np.isfinite(values).all(axis = 1)
+                zeros = (values == 0).all(axis = 1)
+                constant = (values == values[:, :1]).all(axis = 1)
+
+                for i, names in enumerate(self._normalised_names(columns, len(denominators))):
+                    for j, name in enumerate(names):
+                        if not finite[i, j]:
+                            dropped_columns['nan_inf'].append(name)
+                        elif zeros[i, j]:
+                            dropped_columns['zeros'].append(name)
+                        elif constant[i, j]:
+                            dropped_columns['constant'].append(name)
+                        else:
+                            kept[name] = True
+
+        kept_columns = [column for column in self.compounded_columns if column in kept]
+
+        return kept_columns, dropped_columns
+
+    def _normalised_names(self, columns, n_normalisations):
+        """
+        Names of the raw columns and of each of their normalisations
+        """
+
+        names = [list(columns)]
+        for normalisation in NORMALISATIONS[:n_normalisations - 1]:
+            names.append([column + '_' + normalisation for column in columns])
+
+        return names
+
+    def save(self, directory):
+        """
+        Copy the store to a directory on disk
+        """
+
+        if self.directory is not None and os.path.abspath(directory) == os.path.abspath(self.directory):
+            self.flush()
+            return self
+
+        store = FeatureStore(directory)
+        store.create(self.columns, self.n_rows, dtype = self.blocks[0]['data'].dtype if self.blocks else np.float64)
+        for block, new_block in zip(self.blocks, store.blocks):
+            new_block['data'][:] = block['data']
+        store.flush()
+
+        if self.normalisation is not None:
+            store.set_normalisation(*self.normalisation)
+
+        return store
+
+
+def save_dataframe(feature_matrix, directory):
+    """
+    Save a DataFrame in a feature store
+    """
+
+    store = FeatureStore(directory)
+    store.create(feature_matrix.columns, len(feature_matrix))
+    store.write(np.arange(len(feature_matrix)), feature_matrix.values)
+    store.flush()
+
+    return store
+
+
+def _column_blocks(columns):
+    """
+    Group the columns by operation, given by the prefix of the feature names
+    """
+
+    blocks = {}
+    for j, column in enumerate(columns):
+        blocks.setdefault(column.split('_')[0], []).append(j)
+
+    return blocks
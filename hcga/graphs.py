@@ -30,20 +30,18 @@ import numpy as np
 import pandas as pd
 import pickle as pickle
 import networkx as nx
+import os
 
-from hcga.utils import read_graphfile
+from hcga.utils import read_graphfile, unique_graphs
 from hcga.Operations.operations import Operations
+from hcga import shared_graphs, references
+from hcga.feature_store import FeatureStore, save_dataframe
 
 from tqdm import tqdm
 import time
 
-from multiprocessing import Pool
 from functools import partial
 
-import matplotlib
-matplotlib.use("agg")
-import matplotlib.pyplot as plt
-
 #fix RNGs for reproducibility
 import random
 random.seed(10)
@@ -75,6 +73,9 @@ class Graphs():
         self.graph_metadata = graph_meta_data # A list of vectors with additional feature data describing the graph
         self.node_metadata = node_meta_data # A list of arrays with additional feature data describing nodes on the graph
         self.n_processes = 4
+        self.shared_memory = True # transfer the graphs to the workers through shared memory
+        self.batch_size = 4096 # number of graphs in each batch of batched computations
+        self.reference_cache = None # directory where the small-world reference graphs are cached (in memory if None)
         self.dataset = dataset
         
         if not graphs:
@@ -172,7 +173,7 @@ class Graphs():
         self.graph_labels = graph_labels
 
     
-    def calculate_features(self,calc_speed='slow',parallel=True):
+    def calculate_features(self,calc_speed='slow',parallel=True,feature_store=None,deduplicate=True,batched=True):
         """
         Extract the features from each graph in the set of graphs
 
@@ -183,14 +184,54 @@ class Graphs():
             set of features to consider (from the operations.csv file). Can take 'slow', 'medium' or 'fast'. 
         parallel: bool
             True to run with multiprocessing 
+        feature_store: string
+            directory where the raw features are written as they are extracted (kept in memory if None)
+        deduplicate: bool
+            True to compute the features only once for isomorphic graphs with the same 
+            node and edge attributes, their rows are then copied to every graph of the class
+        batched: bool
+            True to compute the vectorisable node quantities (degrees, clustering, PageRank, ...)
+            for batches of graphs at once, before running the operations on each graph
 
         """
 
+        from multiprocessing import Pool
+        from hcga.batch import batch_artifacts
+
+        self.graph_feature_set = []
+        self.feature_store = FeatureStore(feature_store)
+
+        if deduplicate:
+            representatives, self.graph_classes = unique_graphs(self.graphs)
+            print('Number of unique graphs: ', len(representatives))
+        else:
+            representatives, self.graph_classes = list(range(len(self.graphs))), np.arange(len(self.graphs))
+        graphs = [self.graphs[i] for i in representatives]
+        members = [np.flatnonzero(self.graph_classes == c) for c in range(len(graphs))]
+
+        if batched:
+            artifacts = batch_artifacts(graphs, batch_size = self.batch_size)
+        else:
+            artifacts = [None] * len(graphs)
+
+        references.set_cache_directory(self.reference_cache)
+
         if parallel:
-            calculate_features_single_graphf = partial(calculate_features_single_graph, calc_speed)
-            
-            with Pool(processes = self.n_processes) as p_feat:  #initialise the parallel computation
-                self.graph_feature_set = list(tqdm(p_feat.imap(calculate_features_single_graphf, self.graphs), total = len(self.graphs)))
+            if self.shared_memory and shared_graphs.can_share(graphs):
+                # only the offsets of each graph and of its artifacts in the shared arrays are sent to the workers
+                calculate_features_shared_graphf = partial(_star, partial(calculate_features_shared_graph, calc_speed))
+                chunksize = max(1, len(graphs) // (20 * self.n_processes))
+
+                with shared_graphs.SharedGraphs(graphs, artifacts) as shared:
+                    with Pool(processes = self.n_processes, initializer = _initialize_worker, initargs = (self.reference_cache, shared.metadata)) as p_feat:
+                        for c, G_operations in enumerate(tqdm(p_feat.imap(calculate_features_shared_graphf, zip(shared.offsets, shared.graph_attributes, shared.artifact_offsets), chunksize = chunksize), total = len(graphs))):
+                            self._store_features(G_operations, members[c])
+            else:
+                calculate_features_single_graphf = partial(_star, partial(calculate_features_single_graph, calc_speed))
+
+                with Pool(processes = self.n_processes, initializer = _initialize_worker, initargs = (self.reference_cache,)) as p_feat:  #initialise the parallel computation
+                    for c, G_operations in enumerate(tqdm(p_feat.imap(calculate_features_single_graphf, zip(graphs, artifacts)), total = len(graphs))):
+                        self._store_features(G_operations, members[c])
             
             comp_times = []
             for op in self.graph_feature_set:
@@ -208,68 +249,85 @@ class Graphs():
                 
                 
         else: 
-            graph_feature_set = []
             cnt = 0
-            for G in tqdm(self.graphs):
+            for c, G in enumerate(tqdm(graphs)):
                 print("-------------------------------------------------")              
     
                 print("----- Computing features for graph "+str(cnt)+" -----")               
                 start_time = time.time()    
                 print("-------------------------------------------------")               
     
-                G_operations = Operations(G)
-                G_operations.feature_extraction(calc_speed=calc_speed)
-                graph_feature_set.append(G_operations)
+                G_operations = calculate_features_single_graph(calc_speed, G, artifacts[c])
+                self._store_features(G_operations, members[c])
                 print("-------------------------------------------------")               
                 print("Time to calculate all features for graph "+ str(cnt) +": --- %s seconds ---" % round(time.time() - start_time,3))               
                 cnt = cnt+1
-                self.graph_feature_set_temp = graph_feature_set
-            self.graph_feature_set = graph_feature_set            
+                self.graph_feature_set_temp = self.graph_feature_set
 
-        feature_names = self.graph_feature_set[0]._extract_data()[0]
-            
-        # Create graph feature matrix
-        feature_vals_matrix = np.empty([len(self.graph_feature_set),3*len(feature_names)])  
-        
-        # Append features for each graph as rows   
-        for i in range(len(self.graph_feature_set)):            
+        self.feature_store.flush()
+        self.graph_feature_set = [self.graph_feature_set[c] for c in self.graph_classes]
 
-            N = self.graphs[i].number_of_nodes()
-            E = self.graphs[i].number_of_edges()
-            graph_feats = np.asarray(self.graph_feature_set[i]._extract_data()[1])
-            compounded_feats = np.hstack([graph_feats, graph_feats/N,graph_feats/E]) 
-           
-            debug_features = False
-            if debug_features:
-                namesf =  self.graph_feature_set[i]._extract_data()[0]
-                for ci, cf in enumerate( self.graph_feature_set[i]._extract_data()[1]):
-                    print(namesf[ci], cf)
+        # the features normalised by number of nodes and edges are computed by the store when needed
+        N = [G.number_of_nodes() for G in self.graphs]
+        E = [G.number_of_edges() for G in self.graphs]
+        self.feature_store.set_normalisation(N, E)
 
-            feature_vals_matrix[i,:] = compounded_feats
-        
-        compounded_feature_names = feature_names + [s +'_N' for s in feature_names] + [s +'_E' for s in feature_names]
-        
-        raw_feature_matrix = pd.DataFrame(feature_vals_matrix, columns = compounded_feature_names)
-        
-        self.raw_feature_matrix = raw_feature_matrix 
-        print('Number of raw features: ', np.shape( raw_feature_matrix )[1])
+        self.clean_feature_matrix()
 
-        # remove infinite and nan columns
-        feature_matrix_clean = raw_feature_matrix.replace([np.inf, -np.inf], np.nan).dropna(1,how="any")
-        print('Number of features without nans/infs: ', np.shape( feature_matrix_clean)[1])
-        
-        #remove columns with all zeros
-        feats_all_zeros = (feature_matrix_clean==0).all(0)        
-        feature_matrix_clean = feature_matrix_clean.drop(columns=feats_all_zeros[feats_all_zeros].index)
-        
-        # remove features with constant values
-        feature_matrix_clean = feature_matrix_clean.loc[:, (feature_matrix_clean != feature_matrix_clean.iloc[0]).any()]
-        
-        self.graph_feature_matrix = feature_matrix_clean
-        print("Final number of features extracted:", np.shape(feature_matrix_clean)[1])
+    @property
+    def raw_feature_matrix(self):
+        """
+        Full matrix of raw features and features normalised by number of nodes and edges
+        (materialised on access, prefer feature_store.load to select some columns)
+        """
+
+        return self.feature_store.load(self.feature_store.compounded_columns)
+
+    def clean_feature_matrix(self, chunk_size = None, dtype = np.float64):
+        """
+        Remove the features with nan or infinite values, with only zeros or with constant values,
+        and set the graph feature matrix with the remaining ones. 
+
+        The checks are done in a single pass over chunks of the feature store, and the removed
+        features are stored in dropped_features with the reason of their removal.
+
+        Parameters
+        ----------
+        chunk_size: int
+            number of raw features checked at once (default to chunks of about 10^7 values)
+        dtype: numpy dtype
+            type used for the checks, np.float32 reduces memory usage
 
+        """
+
+        print('Number of raw features: ', len(self.feature_store.compounded_columns))
+
+        kept_columns, dropped_features = self.feature_store.clean(chunk_size = chunk_size, dtype = dtype)
+        self.dropped_features = dropped_features
+
+        print('Number of features with nans/infs: ', len(dropped_features['nan_inf']))
+        print('Number of features with only zeros: ', len(dropped_features['zeros']))
+        print('Number of features with constant values: ', len(dropped_features['constant']))
+
+        self.graph_feature_matrix = self.feature_store.load(kept_columns)
+        print("Final number of features extracted:", len(kept_columns))
 
         
+    def _store_features(self, G_operations, rows):
+        """
+        Append the features of a graph to the feature set and write them in the feature store,
+        in the rows of all the graphs of its class
+        """
+
+        feature_names, feature_vals = G_operations._extract_data()
+
+        if not self.graph_feature_set:
+            self.feature_store.create(feature_names, len(self.graphs))
+
+        for i in rows:
+            self.feature_store.write_row(i, feature_vals)
+        self.graph_feature_set.append(G_operations)
+
     def extract_feature(self,n):
         """
         Extract a feature from the feature matrix
@@ -604,6 +662,7 @@ class Graphs():
 
         from sklearn.decomposition import PCA
         import matplotlib.cm as cm  
+        plt = _pyplot()
         pca = PCA(n_components=2)
         
         X1 = X[np.argsort(y),:]
@@ -624,6 +683,7 @@ class Graphs():
 
         import matplotlib.cm as cm  
         import random
+        plt = _pyplot()
         #mean_importance = np.mean(np.asarray(top_feats),0)                  
         #top_feat_indices = np.argsort(mean_importance)[::-1]  
         plt.figure()
@@ -648,55 +708,65 @@ class Graphs():
             data_split.append(feature_data[indices])        
         
         import seaborn as sns
+        plt = _pyplot()
         plt.figure()
         sns.set(style="whitegrid")
         ax = sns.violinplot(data=data_split,palette="muted",width=1)
         ax.set(xlabel='Class label', ylabel=feature_names[feature_id])
         plt.savefig(image_folder + '/violin_plot_'+self.dataset+'_'+feature_names[feature_id]+'_'+name+'.svg', bbox_inches = 'tight') 
         
-    def save_feature_set(self,filename = 'Outputs/feature_set.pkl'):
+    def save_feature_set(self,filename = 'Outputs/feature_set'):
         """
-        Save the features in a pickle
+        Save the raw features of each graph in a feature store directory
         """
 
-        import pickle as pkl        
-        feature_set = self.graph_feature_set
-        
-        with open(filename,'wb') as output:
-            pkl.dump(feature_set,output,pkl.HIGHEST_PROTOCOL)
+        self.feature_store = self.feature_store.save(filename)
 
 
-    def load_feature_set(self,filename = 'Outputs/feature_set.pkl'):
+    def load_feature_set(self,filename = 'Outputs/feature_set'):
         """
-        Load the features from a pickle
+        Load the raw features from a feature store directory (memory mapped)
         """
 
-        import pickle as pkl
-        with open(filename,'rb') as output:
-            feature_set = pkl.load(output)
-        
-        self.graph_feature_set = feature_set
+        self.feature_store = FeatureStore(filename)
             
-    def save_feature_matrix(self,filename = 'Outputs/feature_matrix.pkl'):
+    def save_feature_matrix(self,filename = 'Outputs/feature_matrix'):
         """
-        Save the features in a pickle
+        Save the features in a feature store directory
         """
 
-        import pickle as pkl        
-        feature_matrix = self.graph_feature_matrix
-        
-        with open(filename,'wb') as output:
-            pkl.dump(feature_matrix,output,pkl.HIGHEST_PROTOCOL) 
+        save_dataframe(self.graph_feature_matrix, filename)
         
     
-    def load_feature_matrix(self,filename = 'Outputs/feature_matrix.pkl'):
+    def load_feature_matrix(self,filename = 'Outputs/feature_matrix', columns = None, rows = None):
         """
-        Load the features from a pickle
+        Load the features from a feature store directory (or a pickle from older versions)
+
+        Parameters
+        ----------
+        filename: string
+            directory of the feature store
+        columns: list
+            names of the features to load, only these are read from disk (default all)
+        rows: list
+            indices of the graphs to load (default all), the graph labels are restricted to these graphs
+
         """
 
-        import pickle as pkl
-        with open(filename,'rb') as output:
-            feature_matrix = pkl.load(output)
+        if os.path.isfile(filename):
+            import pickle as pkl
+            with open(filename,'rb') as output:
+                feature_matrix = pkl.load(output)
+
+            if columns is not None:
+                feature_matrix = feature_matrix[columns]
+            if rows is not None:
+                feature_matrix = feature_matrix.iloc[rows]
+        else:
+            feature_matrix = FeatureStore(filename).load(columns = columns, rows = rows)
+
+        if rows is not None and len(self.graph_labels) > 0:
+            self.graph_labels = np.asarray(self.graph_labels)[rows]
         
         self.graph_feature_matrix = feature_matrix
 
@@ -755,17 +825,58 @@ def classification(X,y,ml_model, verbose=True):
     
 
 
-def calculate_features_single_graph(calc_speed, G):
+def calculate_features_single_graph(calc_speed, G, artifacts = None):
     """
     Calculate the feature of a single graph, for parallel computations
+    (artifacts are the precomputed data of the graph computed in batch, if any)
     """
 
-    G_operations = Operations(G)
+    G_operations = Operations(G, artifacts = artifacts)
     G_operations.feature_extraction(calc_speed=calc_speed)
+
+    # the precomputed data is only needed during the extraction
+    G_operations.precomputed = None
+    G_operations.artifacts = None
     
     return G_operations
 
 
+def calculate_features_shared_graph(calc_speed, offsets, graph_attributes = None, artifact_offsets = None):
+    """
+    Calculate the feature of a single graph stored in shared memory, for parallel computations
+    (the operations get the adjacency matrix, node features and batched artifacts from the shared arrays)
+    """
+
+    G = shared_graphs.shared_graph(offsets, graph_attributes)
+    artifacts = shared_graphs.shared_artifacts(G, offsets, artifact_offsets)
+    G_operations = calculate_features_single_graph(calc_speed, G, artifacts)
+
+    # the parent process already has the graph, do not send it back
+    G_operations.G = None
+    G_operations.G_largest_subgraph = None
+
+    return G_operations
+
+
+def _initialize_worker(reference_cache = None, shared_metadata = None):
+    """
+    Initializer of the worker processes: set the cache directory of the small-world
+    references, and attach the shared graphs if any
+    """
+
+    references.set_cache_directory(reference_cache)
+    if shared_metadata is not None:
+        shared_graphs.attach_shared_graphs(shared_metadata)
+
+
+def _star(function, args):
+    """
+    Call a function with a tuple of arguments, for Pool.imap
+    """
+
+    return function(*args)
+
+
 def univariate_classification(X,y):
     """
     Apply a univariate classification on each feature
@@ -787,6 +898,7 @@ def top_features(X,top_feats,feature_names, image_folder, threshold = 0.9):
     import pandas as pd
     from scipy.cluster.hierarchy import dendrogram, linkage
     import seaborn as sns
+    plt = _pyplot()
     
     mean_importance = np.mean(np.asarray(top_feats),0)                  
     sorted_mean_importance = np.sort(mean_importance)[::-1]     
@@ -873,3 +985,15 @@ def reduce_feature_set(X,top_feats, threshold=0.9):
     X_reduced = X[:,top_feat_indices]
     
     return X_reduced, top_feat_indices
+
+
+def _pyplot():
+    """
+    Import matplotlib with a non-interactive backend, only when plotting
+    """
+
+    import matplotlib
+    matplotlib.use("agg")
+    import matplotlib.pyplot as plt
+
+    return plt
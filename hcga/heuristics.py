@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Greedy combinatorial heuristics on sparse adjacency matrices.
+
+The greedy maximal independent sets and maximal matchings for a random order
+of the nodes (or edges) are computed in rounds: in each round, all the nodes
+which come before their undecided neighbours in the order are added at once,
+and their neighbours are removed. The result is the one of the sequential
+greedy algorithm for the same order (Blelloch et al. 2012), in a number of
+rounds logarithmic in the size of the graph for random orders, and several
+orders (seeds) are processed together as the rows of a priority matrix.
+
+The self-loops are ignored, and the nodes are in the order of the rows of the
+adjacency matrix.
+"""
+
+import heapq
+
+import numpy as np
+import scipy.sparse
+
+
+def _without_selfloops(A):
+    """Binary adjacency matrix without the self-loops"""
+
+    A = scipy.sparse.csr_matrix((np.ones(A.nnz), A.indices, A.indptr), shape = A.shape)
+    A = (A - scipy.sparse.diags(A.diagonal())).tocsr()
+    A.eliminate_zeros()
+
+    return A
+
+
+def _neighbour_minimum(A, values, empty):
+    """Minimum of the values (n_rows x n) over the neighbours of each node, empty if no neighbours"""
+
+    minimum = np.full(values.shape, empty, dtype = values.dtype)
+    if A.nnz == 0:
+        return minimum
+
+    has_neighbours = np.diff(A.indptr) > 0
+    minimum[:, has_neighbours] = np.minimum.reduceat(values[:, A.indices], A.indptr[:-1][has_neighbours], axis = 1)
+
+    return minimum
+
+
+def greedy_independent_sets(A, priorities):
+    """Greedy maximal independent sets, adding the nodes by increasing priority
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of an undirected graph
+    priorities : array
+        distinct priorities of the nodes for each set (n_sets x n)
+
+    Returns
+    -------
+    independent_sets : array
+        boolean membership of the nodes in each set (n_sets x n)
+    """
+
+    A = _without_selfloops(A)
+    priorities = np.atleast_2d(priorities)
+    last = np.iinfo(np.int64).max
+
+    independent = np.zeros(priorities.shape, dtype = bool)
+    undecided = np.ones(priorities.shape, dtype = bool)
+    while undecided.any():
+        first = undecided & (priorities < _neighbour_minimum(A, np.where(undecided, priorities, last), last))
+        independent |= first
+
+        # the neighbours of the new nodes cannot be added anymore
+        covered = (A @ first.T.astype(np.float64)).T > 0
+        undecided &= ~(first | covered)
+
+    return independent
+
+
+def maximal_independent_sets(A, n_sets = 1, seed = None):
+    """Greedy maximal independent sets for random orders of the nodes, as
+    networkx.maximal_independent_set (one set per order)
+    """
+
+    random_state = np.random.RandomState(seed)
+    n = A.shape[0]
+    priorities = np.array([random_state.permutation(n) for i in range(n_sets)], dtype = np.int64).reshape(n_sets, n)
+
+    return greedy_independent_sets(A, priorities)
+
+
+def maximal_matching(A, seed = None):
+    """Greedy maximal matching for a random order of the edges
+
+    Returns
+    -------
+    matching : array
+        edges (i, j) of the matching, with i < j
+    """
+
+    random_state = np.random.RandomState(seed)
+    edges = scipy.sparse.triu(_without_selfloops(A), k = 1).tocoo()
+    u, v = edges.row, edges.col
+    n, m = A.shape[0], len(u)
+
+    priorities = random_state.permutation(m)
+    last = np.iinfo(np.int64).max
+
+    in_matching = np.zeros(m, dtype = bool)
+    matched = np.zeros(n, dtype = bool)
+    undecided = np.ones(m, dtype = bool)
+    while undecided.any():
+        # edges coming first among the undecided edges of both their nodes
+        node_minimum = np.full(n, last, dtype = np.int64)
+        np.minimum.at(node_minimum, u[undecided], priorities[undecided])
+        np.minimum.at(node_minimum, v[undecided], priorities[undecided])
+        first = undecided & (priorities == node_minimum[u]) & (priorities == node_minimum[v])
+
+        in_matching |= first
+        matched[u[first]] = True
+        matched[v[first]] = True
+        undecided &= ~(matched[u] | matched[v])
+
+    return np.stack([u[in_matching], v[in_matching]], axis = 1)
+
+
+def dominating_set(A, start = 0):
+    """Dominating set of networkx.dominating_set, with the nodes taken in order from start
+    (networkx takes them in the iteration order of a set, which is close to this order)
+
+    A node is added if it is not dominated yet, so the set is also the greedy maximal
+    independent set for this order.
+    """
+
+    A = _without_selfloops(A)
+    n = A.shape[0]
+    indptr, indices = A.indptr.tolist(), A.indices.tolist()
+
+    dominated = [False] * n
+    dominating = []
+    for v in list(range(start, n)) + list(range(start)):
+        if not dominated[v]:
+            dominating.append(v)
+            dominated[v] = True
+            for u in indices[indptr[v]:indptr[v + 1]]:
+                dominated[u] = True
+
+    return np.array(dominating, dtype = np.int64)
+
+
+def min_dominating_set(A):
+    """Greedy approximation of the minimum dominating set (set cover of the closed neighbourhoods)
+
+    The node whose closed neighbourhood covers the most nodes not covered yet is added until
+    all the nodes are covered (the first one in case of ties), which gives a set at most
+    log(n) times larger than the minimum (Vazirani, Approximation Algorithms, 2001).
+    """
+
+    A = _without_selfloops(A)
+    n = A.shape[0]
+    neighbourhoods = (A + scipy.sparse.identity(n, format = 'csr')).tocsr()
+
+    indptr, indices = neighbourhoods.indptr, neighbourhoods.indices
+
+    uncovered = np.ones(n, dtype = bool)
+    n_uncovered = n
+    gain = np.diff(indptr).astype(np.int64)
+
+    # lazy max-heap of the gains, which can only decrease: an entry is updated when it is out of date
+    heap = list(zip((-gain).tolist(), range(n)))
+    heapq.heapify(heap)
+
+    dominating = []
+    while n_uncovered > 0:
+        negative_gain, v = heapq.heappop(heap)
+        if -negative_gain != gain[v]:
+            heapq.heappush(heap, (-int(gain[v]), v))
+            continue
+        dominating.append(v)
+
+        covered = indices[indptr[v]:indptr[v + 1]]
+        covered = covered[uncovered[covered]]
+        uncovered[covered] = False
+        n_uncovered -= len(covered)
+
+        # each newly covered node reduces the gain of the nodes of its neighbourhood
+        np.subtract.at(gain, np.concatenate([indices[indptr[u]:indptr[u + 1]] for u in covered]), 1)
+
+    return np.array(dominating, dtype = np.int64)
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Force-directed layouts of undirected graphs.
+
+ForceAtlas2 (Jacomy et al. 2014), with the forces and the adaptive speed of the
+fa2 package (linear attraction, repulsion and gravity), for several random
+starts at once: the positions of all the starts are stored in a single
+(n_starts, N, 2) array, and each iteration updates all the starts with array
+operations.
+
+The repulsion between all the pairs of nodes is computed exactly for small
+graphs. For larger graphs, it is approximated on a hierarchy of grids over the
+layout (a uniform grid version of the Barnes-Hut approximation): at each level,
+a node is repelled by the centres of mass of the cells which are not adjacent to
+its own cell but whose parent cells are adjacent to its parent cell, and the
+nodes in the adjacent cells of the finest level are treated exactly.
+"""
+
+import numpy as np
+import scipy.sparse
+
+
+def _repulsion_exact(pos, mass, coefficient, block_size = 2**20):
+    """Repulsion between all the pairs of nodes, for each start"""
+
+    n_starts, n, _ = pos.shape
+    force = np.empty_like(pos)
+
+    # force on node i: m_i sum_j W_ij (x_i - x_j), with W_ij = m_j / d_ij^2
+    rows = max(1, block_size // max(1, n_starts * n))
+    for start in range(0, n, rows):
+        block = pos[:, start:start + rows]
+        distance2 = (block[:, :, None, 0] - pos[:, None, :, 0]) ** 2 + (block[:, :, None, 1] - pos[:, None, :, 1]) ** 2
+        with np.errstate(divide = 'ignore'):
+            W = np.where(distance2 > 0, mass / distance2, 0.)
+        force[:, start:start + rows] = block * W.sum(axis = 2)[..., None] - W @ pos
+
+    return coefficient * mass[None, :, None] * force
+
+
+def _repulsion_grid(pos, mass, coefficient, n_levels):
+    """Repulsion approximated on a hierarchy of grids, for each start"""
+
+    n_starts, n, _ = pos.shape
+    masses = np.broadcast_to(mass, (n_starts, n)).ravel()
+    start_index = np.repeat(np.arange(n_starts), n)
+    x, y = pos[..., 0].ravel(), pos[..., 1].ravel()
+    force_x, force_y = np.zeros(len(x)), np.zeros(len(x))
+
+    # square box around the layout of each start, nodes in [0, 1) x [0, 1)
+    lower_x, lower_y = pos[..., 0].min(axis = 1), pos[..., 1].min(axis = 1)
+    size = np.maximum(pos[..., 0].max(axis = 1) - lower_x, pos[..., 1].max(axis = 1) - lower_y)
+    scale = np.where(size > 0, 1. / np.where(size > 0, size * (1 + 1e-9), 1.), 1.)[start_index]
+    relative_x, relative_y = (x - lower_x[start_index]) * scale, (y - lower_y[start_index]) * scale
+
+    for level in range(2, n_levels + 1):
+        g = 2 ** level
+        cell_x = np.minimum((relative_x * g).astype(np.int64), g - 1)
+        cell_y = np.minimum((relative_y * g).astype(np.int64), g - 1)
+        cell_id = (start_index * g + cell_x) * g + cell_y
+
+        cell_mass = np.bincount(cell_id, weights = masses, minlength = n_starts * g * g)
+        occupied = cell_mass > 0
+        centre_x = np.bincount(cell_id, weights = masses * x, minlength = n_starts * g * g)[occupied] / cell_mass[occupied]
+        centre_y = np.bincount(cell_id, weights = masses * y, minlength = n_starts * g * g)[occupied] / cell_mass[occupied]
+        cell_centre_x, cell_centre_y = np.zeros(len(cell_mass)), np.zeros(len(cell_mass))
+        cell_centre_x[occupied], cell_centre_y[occupied] = centre_x, centre_y
+
+        # interaction list: children of the cells adjacent to the parent cell, not adjacent to the cell
+        other_x = 2 * (cell_x // 2)[:, None] + np.arange(-2, 4)
+        other_y = 2 * (cell_y // 2)[:, None] + np.arange(-2, 4)
+        valid = (((other_x >= 0) & (other_x < g))[:, :, None] & ((other_y >= 0) & (other_y < g))[:, None, :]
+                 & ~((np.abs(other_x - cell_x[:, None]) <= 1)[:, :, None] & (np.abs(other_y - cell_y[:, None]) <= 1)[:, None, :]))
+        other_id = (start_index[:, None, None] * g + np.clip(other_x, 0, g - 1)[:, :, None]) * g + np.clip(other_y, 0, g - 1)[:, None, :]
+
+        other_mass = np.where(valid, cell_mass[other_id], 0.)
+        delta_x = x[:, None, None] - cell_centre_x[other_id]
+        delta_y = y[:, None, None] - cell_centre_y[other_id]
+        distance2 = delta_x ** 2 + delta_y ** 2
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            factor = np.where((other_mass > 0) & (distance2 > 0), other_mass / distance2, 0.)
+        force_x += (delta_x * factor).sum(axis = (1, 2))
+        force_y += (delta_y * factor).sum(axis = (1, 2))
+
+    # nodes in the adjacent cells of the finest level, exactly
+    order = np.argsort(cell_id, kind = 'stable')
+    sorted_id = cell_id[order]
+
+    other_x = (cell_x[:, None] + np.array([-1, -1, -1, 0, 0, 0, 1, 1, 1])).ravel()
+    other_y = (cell_y[:, None] + np.array([-1, 0, 1, -1, 0, 1, -1, 0, 1])).ravel()
+    nodes = np.repeat(np.arange(len(x)), 9)
+    valid = (other_x >= 0) & (other_x < g) & (other_y >= 0) & (other_y < g)
+    nodes = nodes[valid]
+    other_id = (start_index[nodes] * g + other_x[valid]) * g + other_y[valid]
+
+    first = np.searchsorted(sorted_id, other_id, side = 'left')
+    counts = np.searchsorted(sorted_id, other_id, side = 'right') - first
+    i = np.repeat(nodes, counts)
+    j = order[np.repeat(first - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())]
+
+    delta_x, delta_y = x[i] - x[j], y[i] - y[j]
+    distance2 = delta_x ** 2 + delta_y ** 2
+    with np.errstate(divide = 'ignore'):
+        factor = np.where(distance2 > 0, masses[j] / distance2, 0.)
+    force_x += np.bincount(i, weights = delta_x * factor, minlength = len(x))
+    force_y += np.bincount(i, weights = delta_y * factor, minlength = len(x))
+
+    return coefficient * (masses * np.stack([force_x, force_y])).T.reshape(pos.shape)
+
+
+def _adjust_speed(displacement, previous_displacement, mass, speed, speed_efficiency, jitter_tolerance = 1.):
+    """Adaptive speed of each start, as in ForceAtlas2, and the scaling of the displacement of each node"""
+
+    n = displacement.shape[1]
+    swinging = mass * np.linalg.norm(previous_displacement - displacement, axis = 2)
+    total_swinging = swinging.sum(axis = 1)
+    total_effective_traction = 0.5 * (mass * np.linalg.norm(previous_displacement + displacement, axis = 2)).sum(axis = 1)
+
+    # optimal jitter tolerance
+    estimated_optimal_jitter_tolerance = 0.05 * np.sqrt(n)
+    min_jitter_tolerance = np.sqrt(estimated_optimal_jitter_tolerance)
+    jt = jitter_tolerance * np.maximum(min_jitter_tolerance, np.minimum(10., estimated_optimal_jitter_tolerance * total_effective_traction / n ** 2))
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        swinging_too_much = (total_effective_traction > 0) & (total_swinging / total_effective_traction > 2.)
+        speed_efficiency = np.where(swinging_too_much & (speed_efficiency > 0.05), 0.5 * speed_efficiency, speed_efficiency)
+        jt = np.where(swinging_too_much, np.maximum(jt, jitter_tolerance), jt)
+
+        target_speed = np.where(total_swinging > 0, jt * speed_efficiency * total_effective_traction / total_swinging, np.inf)
+
+    speed_efficiency = np.where(total_swinging > jt * total_effective_traction,
+                                np.where(speed_efficiency > 0.05, 0.7 * speed_efficiency, speed_efficiency),
+                                np.where(speed < 1000, 1.3 * speed_efficiency, speed_efficiency))
+
+    speed = speed + np.minimum(target_speed - speed, 0.5 * speed)
+    factor = speed[:, None] / (1. + np.sqrt(speed[:, None] * swinging))
+
+    return speed, speed_efficiency, factor
+
+
+def forceatlas2(A, n_starts = 20, iterations = 2000, scaling_ratio = 2., gravity = 1., tol = 1e-4,
+                exact_size = 500, seed = None):
+    """ForceAtlas2 layouts of a graph from several random starts
+
+    The forces and the adaptive speed are the ones of fa2.ForceAtlas2 with linear attraction,
+    repulsion and gravity. The iterations of a start stop early when the mean displacement of
+    the nodes is below tol times the mean distance of the nodes to their centre of mass.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        weighted adjacency matrix of an undirected graph
+    n_starts : int
+        number of random starts, with positions uniform in the unit square
+    iterations : int
+        maximum number of iterations
+    scaling_ratio : float
+        strength of the repulsion
+    gravity : float
+        strength of the attraction to the origin
+    tol : float
+        tolerance of the convergence criterion
+    exact_size : int
+        largest number of nodes with an exact repulsion, approximated on grids above
+    seed : int
+        seed of the random positions
+
+    Returns
+    -------
+    pos : array
+        positions of the nodes for each start (n_starts x N x 2)
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    A = scipy.sparse.csr_matrix(A)
+    n = A.shape[0]
+    mass = 1. + np.diff(A.indptr)
+
+    upper = scipy.sparse.triu(A, k = 1).tocoo()
+    edges = np.arange(len(upper.data))
+    incidence = scipy.sparse.csr_matrix((np.concatenate([np.ones(len(edges)), -np.ones(len(edges))]),
+                                         (np.concatenate([upper.row, upper.col]), np.concatenate([edges, edges]))),
+                                        shape = (n, len(edges)))
+
+    pos = random_state.random_sample((n_starts, n, 2))
+    if n == 0 or iterations == 0:
+        return pos
+
+    n_levels = max(2, int(np.round(np.log(n) / np.log(4))))
+
+    displacement = np.zeros_like(pos)
+    speed = np.ones(n_starts)
+    speed_efficiency = np.ones(n_starts)
+
+    # starts still iterating
+    active = np.arange(n_starts)
+    for iteration in range(iterations):
+        p = pos[active]
+        previous_displacement = displacement[active]
+
+        if n <= exact_size:
+            force = _repulsion_exact(p, mass, scaling_ratio)
+        else:
+            force = _repulsion_grid(p, mass, scaling_ratio, n_levels)
+
+        distance = np.linalg.norm(p, axis = 2)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            force -= p * np.where(distance > 0, mass * gravity / distance, 0.)[..., None]
+
+        # attraction along the edges, added to the first node and subtracted from the second
+        if upper.nnz > 0:
+            attraction = -(p[:, upper.row] - p[:, upper.col]) * upper.data[None, :, None]
+            force += (incidence @ attraction.transpose(1, 0, 2).reshape(len(upper.data), -1)).reshape(n, len(active), 2).transpose(1, 0, 2)
+
+        speed[active], speed_efficiency[active], factor = _adjust_speed(force, previous_displacement, mass,
+                                                                        speed[active], speed_efficiency[active])
+        step = force * factor[..., None]
+        pos[active] = p + step
+        displacement[active] = force
+
+        # convergence of each start
+        spread = np.linalg.norm(pos[active] - pos[active].mean(axis = 1, keepdims = True), axis = 2).mean(axis = 1)
+        converged = np.linalg.norm(step, axis = 2).mean(axis = 1) < tol * spread
+        active = active[~converged]
+        if len(active) == 0:
+            break
+
+    return pos
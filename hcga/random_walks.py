@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Return times of random walks, from sparse solves of the grounded Laplacian.
+
+The second order centrality of networkx is the standard deviation of the return
+times to each node of the random walk made regular with self-loops (so that all
+the nodes have the largest degree d of the graph, counting the existing
+self-loops, which networkx overwrites instead when it adds its own). The walk has the transition
+matrix P = I - L / d, with L the (weighted) Laplacian of the graph, and its
+mean first passage times m_ki to node i (with m_ii = n) sum to n^2 Z_ii, with
+Z = d L^+ + J / n its fundamental matrix (Kemeny and Snell 1960). So the
+centrality of node i is sqrt(2 n^2 d L^+_ii + n - n^2) and only needs the
+diagonal of the pseudo-inverse of L.
+
+The pseudo-inverse is obtained from the inverse G of the Laplacian grounded at
+a node r (L without the row and column r, which is positive definite for a
+connected graph), L^+ = (I - J / n) G (I - J / n), where G is extended with zeros
+on row and column r. The diagonal of G is computed by solves with blocks of unit
+vectors as right-hand sides, either with a sparse LU factorisation of the
+grounded Laplacian, or with conjugate gradients for graphs too large to
+factorise, so that the memory is O(n * block_size) plus the factorisation instead
+of the O(n^2) dense matrices of networkx.
+"""
+
+import numpy as np
+import scipy.sparse
+
+
+def laplacian(A):
+    """Weighted Laplacian of an undirected graph, without the self-loops"""
+
+    A = scipy.sparse.csr_matrix(A, dtype = np.float64)
+    A = A - scipy.sparse.diags(A.diagonal())
+
+    return (scipy.sparse.diags(np.asarray(A.sum(axis = 1)).ravel()) - A).tocsc()
+
+
+def _block_conjugate_gradients(L, B, tol = 1e-10, max_iter = None):
+    """Solve L X = B for a positive definite L with Jacobi preconditioned conjugate gradients,
+    on all the columns of B at once
+    """
+
+    max_iter = 10 * L.shape[0] if max_iter is None else max_iter
+    inverse_diagonal = 1. / L.diagonal()[:, None]
+
+    X = np.zeros(B.shape)
+    R = B.copy()
+    Z = inverse_diagonal * R
+    directions = Z.copy()
+    rz = (R * Z).sum(axis = 0)
+    tolerance = tol * np.linalg.norm(B, axis = 0)
+
+    for i in range(max_iter):
+        active = np.linalg.norm(R, axis = 0) > tolerance
+        if not active.any():
+            break
+
+        Q = L @ directions
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            alpha = np.where(active, rz / (directions * Q).sum(axis = 0), 0.)
+        X += alpha * directions
+        R -= alpha * Q
+
+        Z = inverse_diagonal * R
+        rz_new = (R * Z).sum(axis = 0)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            beta = np.where(active, rz_new / rz, 0.)
+        directions = Z + beta * directions
+        rz = rz_new
+
+    return X
+
+
+def _grounded_inverse(L, ground, block_size, method):
+    """Diagonal of the inverse G of the Laplacian grounded at a node, and G 1 (both with a
+    zero at the ground node)
+    """
+
+    n = L.shape[0]
+    keep = np.flatnonzero(np.arange(n) != ground)
+    grounded = L[keep][:, keep].tocsc()
+
+    if method == 'direct':
+        from scipy.sparse.linalg import splu
+        factorisation = splu(grounded, permc_spec = 'MMD_AT_PLUS_A', options = dict(SymmetricMode = True))
+        solve = factorisation.solve
+    else:
+        grounded = grounded.tocsr()
+        def solve(B):
+            return _block_conjugate_gradients(grounded, B)
+
+    diagonal = np.zeros(n)
+    for start in range(0, n - 1, block_size):
+        columns = np.arange(start, min(start + block_size, n - 1))
+        unit_vectors = np.zeros((n - 1, len(columns)))
+        unit_vectors[columns, np.arange(len(columns))] = 1.
+        diagonal[keep[columns]] = solve(unit_vectors)[columns, np.arange(len(columns))]
+
+    row_sums = np.zeros(n)
+    row_sums[keep] = solve(np.ones((n - 1, 1)))[:, 0]
+
+    return diagonal, row_sums
+
+
+def second_order_centrality(A, method = 'auto', block_size = 256, max_direct_size = 20000):
+    """Second order centrality of all the nodes, as networkx.second_order_centrality
+
+    Parameters
+    ----------
+    A : sparse matrix
+        weighted adjacency matrix of a connected undirected graph, with non-negative weights
+    method : str
+        'direct' for a sparse LU factorisation of the grounded Laplacian, 'iterative' for
+        conjugate gradients, or 'auto' for 'direct' up to max_direct_size nodes (or if the
+        factorisation runs out of memory) and 'iterative' above
+    block_size : int
+        number of right-hand sides solved together
+    max_direct_size : int
+        largest graph factorised with the 'auto' method
+
+    Returns
+    -------
+    second_order_centrality : array
+        standard deviation of the return times to each node
+    """
+
+    L = laplacian(A)
+    n = L.shape[0]
+    if n == 1:
+        return np.zeros(1)
+
+    largest_degree = np.asarray(scipy.sparse.csr_matrix(A).sum(axis = 1)).max()
+
+    # grounded at a node of largest degree, whose elimination would create the most fill-in
+    ground = int(np.argmax(L.diagonal()))
+
+    if method == 'auto':
+        method = 'direct' if n <= max_direct_size else 'iterative'
+        if method == 'direct':
+            try:
+                diagonal, row_sums = _grounded_inverse(L, ground, block_size, 'direct')
+            except MemoryError:
+                diagonal, row_sums = _grounded_inverse(L, ground, block_size, 'iterative')
+        else:
+            diagonal, row_sums = _grounded_inverse(L, ground, block_size, 'iterative')
+    else:
+        diagonal, row_sums = _grounded_inverse(L, ground, block_size, method)
+
+    pseudo_inverse_diagonal = diagonal - 2 * row_sums / n + row_sums.sum() / n ** 2
+
+    return np.sqrt(np.maximum(2 * n ** 2 * largest_degree * pseudo_inverse_diagonal + n - n ** 2, 0.))
@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Reference graphs of the small-world and rich-club coefficients.
+
+The small-world coefficient omega compares a graph with random and lattice
+reference graphs with the same degree sequence, obtained by degree preserving
+edge swaps as in networkx.random_reference and networkx.lattice_reference. The references only depend on the degree sequence,
+so the clustering and average shortest path lengths of an ensemble of
+references are computed once per degree sequence and reused by all the graphs
+of a dataset with the same degree sequence.
+
+The ensembles are cached in memory in each process, and on disk if a cache
+directory is set (see set_cache_directory), with one .npz file per degree
+sequence, so they are shared between the workers and between runs. The
+rich-club coefficients of the random references of the normalised rich-club
+coefficient are cached in the same way.
+
+The swaps are done on an edge array, and the connectivity of the graph is only
+checked after a window of swaps, which is undone if the graph got disconnected
+(the window grows after each success and shrinks after each failure), as in
+Viger and Latapy (2005), instead of after each swap.
+"""
+
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+import scipy.sparse
+
+
+# directory of the ensembles cached on disk (None to keep them in memory only)
+_cache_directory = None
+
+# ensembles already computed or loaded by this process, by cache key
+_cache = {}
+
+
+def set_cache_directory(directory):
+    """
+    Set the directory where the reference ensembles are cached (None for memory only)
+    """
+
+    global _cache_directory
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok = True)
+    _cache_directory = directory
+
+
+def edge_array(A):
+    """Edges (i, j) with i < j of an adjacency matrix, without the self-loops"""
+
+    A = scipy.sparse.triu(A, k = 1).tocoo()
+    return np.stack([A.row, A.col], axis = 1).astype(np.int64)
+
+
+def edge_adjacency(edges, n):
+    """Binary symmetric adjacency matrix of an edge array"""
+
+    edges = np.asarray(edges, dtype = np.int64).reshape(-1, 2)
+    rows = np.concatenate([edges[:, 0], edges[:, 1]])
+    cols = np.concatenate([edges[:, 1], edges[:, 0]])
+
+    return scipy.sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape = (n, n))
+
+
+def _is_connected(edges, n):
+    from scipy.sparse.csgraph import connected_components
+
+    return connected_components(edge_adjacency(edges, n), directed = False, return_labels = False) == 1
+
+
+def _random_pairs(random_state, m, chunk_size = 4096):
+    """Endless stream of random pairs of oriented edges (i, flip_i, j, flip_j)"""
+
+    while True:
+        indices = random_state.randint(m, size = (chunk_size, 2))
+        flips = random_state.randint(2, size = (chunk_size, 2))
+        yield from zip(indices[:, 0].tolist(), flips[:, 0].tolist(), indices[:, 1].tolist(), flips[:, 1].tolist())
+
+
+def swap_edges(edges, n, n_swaps, max_attempts, random_state, accept = None, connected = True):
+    """Degree preserving edge swaps of a graph, keeping it connected if connected is True
+
+    A swap replaces two edges (a, b) and (c, d) by (a, d) and (c, b), if the four nodes are
+    distinct, the new edges do not exist already and accept(a, b, c, d) is True.
+
+    Parameters
+    ----------
+    edges : array
+        edges of the graph (m x 2)
+    n : int
+        number of nodes
+    n_swaps : int
+        number of swaps to do
+    max_attempts : int
+        maximum number of attempted swaps
+    random_state : numpy.random.RandomState
+        random number generator
+    accept : function
+        optional condition on the swaps
+    connected : bool
+        if True, the swaps disconnecting the graph are undone
+
+    Returns
+    -------
+    edges : array
+        edges of the graph after the swaps
+    """
+
+    m = len(edges)
+    if m < 2 or n_swaps < 1 or max_attempts < 1:
+        return np.array(edges, dtype = np.int64).reshape(-1, 2)
+
+    edges = np.asarray(edges).tolist()
+    neighbours = [set() for i in range(n)]
+    for u, v in edges:
+        neighbours[u].add(v)
+        neighbours[v].add(u)
+
+    pairs = _random_pairs(random_state, m)
+
+    swaps, attempts, window = 0, 0, 1
+    while swaps < n_swaps and attempts < max_attempts:
+        done = []
+        while len(done) < window and swaps + len(done) < n_swaps and attempts < max_attempts:
+            i, flip_i, j, flip_j = next(pairs)
+            attempts += 1
+
+            a, b = edges[i][::-1] if flip_i else edges[i]
+            c, d = edges[j][::-1] if flip_j else edges[j]
+
+            # the four nodes must be distinct, and no parallel edges are created
+            if i == j or a == c or a == d or b == c or b == d:
+                continue
+            if d in neighbours[a] or b in neighbours[c]:
+                continue
+            if accept is not None and not accept(a, b, c, d):
+                continue
+
+            edges[i], edges[j] = [a, d], [c, b]
+            neighbours[a].remove(b), neighbours[b].remove(a), neighbours[c].remove(d), neighbours[d].remove(c)
+            neighbours[a].add(d), neighbours[d].add(a), neighbours[c].add(b), neighbours[b].add(c)
+            done.append((i, j, a, b, c, d))
+
+        if not done:
+            continue
+
+        if not connected or _is_connected(edges, n):
+            swaps += len(done)
+            window = min(2 * window, m)
+        else:
+            # undo the window of swaps, in reverse order
+            for i, j, a, b, c, d in reversed(done):
+                edges[i], edges[j] = [a, b], [c, d]
+                neighbours[a].remove(d), neighbours[d].remove(a), neighbours[c].remove(b), neighbours[b].remove(c)
+                neighbours[a].add(b), neighbours[b].add(a), neighbours[c].add(d), neighbours[d].add(c)
+            window = max(1, window // 2)
+
+    return np.array(edges, dtype = np.int64)
+
+
+def _max_attempts(n, m, n_swaps):
+    """Maximum number of attempted swaps, with int(2m / (n - 1)) tries per swap as networkx
+    (at least 2 for connected graphs, and 0 only for graphs with m < (n - 1) / 2 edges)
+    """
+
+    return n_swaps * int(n * m / (n * (n - 1) / 2)) if n > 1 else 0
+
+
+def random_reference(edges, n, niter = 1, random_state = None):
+    """Random graph with the same degree sequence, with about niter swaps per edge (as
+    networkx.random_reference)
+    """
+
+    random_state = np.random.RandomState(random_state) if not isinstance(random_state, np.random.RandomState) else random_state
+    n_swaps = niter * len(edges)
+
+    return swap_edges(edges, n, n_swaps, _max_attempts(n, len(edges), n_swaps), random_state)
+
+
+def lattice_reference(edges, n, niter = 1, random_state = None):
+    """Lattice graph with the same degree sequence, with about niter swaps per edge (as
+    networkx.lattice_reference)
+
+    The nodes are placed on a ring, and a swap is only done if the new edges are not
+    further from the diagonal of the adjacency matrix (in ring distance) than the old ones.
+    """
+
+    random_state = np.random.RandomState(random_state) if not isinstance(random_state, np.random.RandomState) else random_state
+    n_swaps = niter * len(edges)
+
+    def distance(u, v):
+        return min(abs(u - v), n - abs(u - v))
+
+    def accept(a, b, c, d):
+        return distance(a, b) + distance(c, d) >= distance(a, d) + distance(c, b)
+
+    return swap_edges(edges, n, n_swaps, _max_attempts(n, len(edges), n_swaps), random_state, accept)
+
+
+def average_clustering(A):
+    """Average clustering coefficient of a binary adjacency matrix without self-loops"""
+
+    degrees = np.asarray(A.sum(axis = 1)).ravel()
+    closed_walks = np.asarray((A @ A).multiply(A).sum(axis = 1)).ravel()
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        clustering = np.where(degrees > 1, closed_walks / (degrees * (degrees - 1)), 0.)
+
+    return clustering.mean()
+
+
+def average_shortest_path_length(A, distances = None):
+    """Average shortest path length of a connected graph, ignoring the weights"""
+    from scipy.sparse.csgraph import shortest_path
+
+    n = A.shape[0]
+    if distances is None:
+        distances = shortest_path(A, directed = False, unweighted = True)
+
+    return distances.sum() / (n * (n - 1))
+
+
+def degree_sequence(A):
+    """Sorted degree sequence of a graph, without the self-loops"""
+
+    A = scipy.sparse.csr_matrix(A)
+    return np.sort(np.diff(A.indptr) - (A.diagonal() != 0))[::-1]
+
+
+def _cache_key(degrees, *params):
+    return hashlib.sha1(np.asarray(degrees, dtype = np.int64).tobytes()
+                        + str(params).encode()).hexdigest()
+
+
+def _load(key):
+    if _cache_directory is None:
+        return None
+
+    filename = os.path.join(_cache_directory, key + '.npz')
+    if not os.path.exists(filename):
+        return None
+
+    with np.load(filename) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _save(key, ensemble):
+    if _cache_directory is None:
+        return
+
+    # written to a temporary file first, so that other processes never read a partial file
+    f, filename = tempfile.mkstemp(dir = _cache_directory, suffix = '.npz')
+    with os.fdopen(f, 'wb') as f:
+        np.savez(f, **ensemble)
+    os.replace(filename, os.path.join(_cache_directory, key + '.npz'))
+
+
+def reference_ensemble(A, niter = 5, nrand = 10, seed = 0):
+    """Clustering and average shortest path lengths of the references of a connected graph
+
+    The ensemble has nrand random references (with 2 * niter swaps per edge) and nrand lattice
+    references (with niter swaps per edge, each from a random reference), as networkx.omega.
+    It is computed from the first graph with a given degree sequence, and reused for the
+    other graphs with the same degree sequence.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of a connected undirected graph with at least 4 nodes
+    niter : int
+        number of swaps per edge of the lattice references
+    nrand : int
+        number of references of each type
+    seed : int
+        seed of the random number generator
+
+    Returns
+    -------
+    ensemble : dict
+        arrays 'random_path_length' and 'lattice_clustering',
+        with the values of each reference
+    """
+
+    degrees = degree_sequence(A)
+    key = _cache_key(degrees, niter, nrand, seed)
+
+    return _cached(key, lambda: _reference_ensemble(A, niter, nrand, seed))
+
+
+def _cached(key, compute):
+    """Value of a cache key, from memory, from disk or computed (a dict of arrays)"""
+
+    if key not in _cache:
+        value = _load(key)
+        if value is None:
+            value = compute()
+            _save(key, value)
+        _cache[key] = value
+
+    return _cache[key]
+
+
+def _degree_ordered_edges(A):
+    """Edge array with the nodes relabelled by decreasing degree, so that the references
+    only depend on the degree sequence
+    """
+
+    n = A.shape[0]
+    order = np.argsort(-(np.diff(scipy.sparse.csr_matrix(A).indptr) - (A.diagonal() != 0)), kind = 'stable')
+    position = np.empty(n, dtype = np.int64)
+    position[order] = np.arange(n)
+
+    return position[edge_array(A)]
+
+
+def _reference_ensemble(A, niter, nrand, seed):
+    n = A.shape[0]
+    random_state = np.random.RandomState(seed)
+    edges = _degree_ordered_edges(A)
+
+    ensemble = {'random_path_length': [], 'lattice_clustering': []}
+    for i in range(nrand):
+        random_edges = random_reference(edges, n, niter = 2 * niter, random_state = random_state)
+        random_adjacency = edge_adjacency(random_edges, n)
+        ensemble['random_path_length'].append(average_shortest_path_length(random_adjacency))
+
+        lattice_edges = lattice_reference(random_edges, n, niter = niter, random_state = random_state)
+        ensemble['lattice_clustering'].append(average_clustering(edge_adjacency(lattice_edges, n)))
+
+    return {name: np.asarray(values) for name, values in ensemble.items()}
+
+
+def omega(clustering, path_length, ensemble):
+    """Small-world coefficient omega = Lr / L - C / Cl of a graph with average clustering C and
+    average shortest path length L, as networkx.omega (Cl is the largest of C and the clustering
+    of the lattice references)
+    """
+
+    lattice_clustering = max(clustering, ensemble['lattice_clustering'].max())
+
+    return ensemble['random_path_length'].mean() / path_length - clustering / lattice_clustering
+
+
+def rich_club_coefficient(edges, n):
+    """Rich-club coefficients phi(k) = 2 E_k / (N_k (N_k - 1)) of all the degrees k with N_k > 1,
+    as networkx.rich_club_coefficient (unnormalised)
+
+    N_k is the number of nodes with degree larger than k, and E_k the number of edges between
+    them, i.e. the number of edges whose smallest end degree is larger than k, so all the
+    coefficients are given by cumulative sums of the degree histograms of the nodes and of the
+    edge ends with the smallest degree.
+
+    Parameters
+    ----------
+    edges : array
+        edges of the graph (m x 2), without self-loops or parallel edges
+    n : int
+        number of nodes
+
+    Returns
+    -------
+    rich_club : array
+        rich-club coefficient of the degrees 0, 1, ... while N_k > 1
+    """
+
+    edges = np.asarray(edges, dtype = np.int64).reshape(-1, 2)
+    degrees = np.bincount(edges.ravel(), minlength = n)
+
+    n_larger = n - np.cumsum(np.bincount(degrees))
+    n_larger = n_larger[n_larger > 1]
+
+    smallest_degrees = np.minimum(degrees[edges[:, 0]], degrees[edges[:, 1]])
+    edges_larger = len(edges) - np.cumsum(np.bincount(smallest_degrees, minlength = len(n_larger)))[:len(n_larger)]
+
+    return 2 * edges_larger / (n_larger * (n_larger - 1))
+
+
+def rich_club_reference(A, Q = 100, seed = 0):
+    """Rich-club coefficients of a random reference of a graph, with Q swaps per edge (as in
+    networkx.rich_club_coefficient), shared by the graphs with the same degree sequence
+
+    The reference does not have to be connected, and the number of attempted swaps is limited
+    to 10 per swap as in networkx.double_edge_swap.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        adjacency matrix of an undirected graph
+    Q : int
+        number of swaps per edge
+    seed : int
+        seed of the random number generator
+
+    Returns
+    -------
+    reference : dict
+        array 'rich_club' of the rich-club coefficients of the reference
+    """
+
+    degrees = degree_sequence(A)
+    key = _cache_key(degrees, 'rich_club', Q, seed)
+
+    def _rich_club_reference():
+        n = A.shape[0]
+        edges = _degree_ordered_edges(A)
+        n_swaps = Q * len(edges)
+        reference_edges = swap_edges(edges, n, n_swaps, 10 * n_swaps, np.random.RandomState(seed), connected = False)
+
+        return {'rich_club': rich_club_coefficient(reference_edges, n)}
+
+    return _cached(key, _rich_club_reference)
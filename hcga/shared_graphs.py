@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Transfer of graphs to the worker processes through shared memory.
+
+The parent packs the graphs of a dataset into a few flat arrays (CSR adjacency
+and node attribute matrices) living in `multiprocessing.shared_memory`
+segments, together with the artifacts computed in batch (see hcga.batch).
+Each task sent to a worker then only contains the offsets of its graph in
+these arrays. The worker rebuilds the graph for the operations that need it,
+and gives the others the adjacency matrix, node features and batched artifacts
+as views of the shared arrays, through hcga.Operations.precomputed.
+"""
+
+import numpy as np
+import networkx as nx
+import scipy.sparse
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: # python < 3.8
+    shared_memory = None
+
+
+# graph attributes sent with the offsets of each graph
+SHARED_GRAPH_ATTRIBUTES = ['num_node_labels']
+
+# prefix of the names of the shared arrays of the artifacts
+ARTIFACT_PREFIX = 'artifact.'
+
+# shared arrays attached in a worker process, set by attach_shared_graphs
+_shared_arrays = {}
+_shared_buffers = {}
+_shared_segments = []
+
+
+def can_share(graphs):
+    """
+    Check if a list of graphs can be transferred through shared memory
+    (only simple undirected graphs with vector or integer node attributes are supported)
+    """
+
+    if shared_memory is None:
+        return False
+
+    for G in graphs:
+        if G.is_directed() or G.is_multigraph():
+            return False
+
+    for key in ['feat', 'label']:
+        if _attribute_shape(graphs, key) is False:
+            return False
+
+    return True
+
+
+class SharedGraphs():
+
+    """
+        Graphs packed into shared memory segments.
+
+        The adjacency of all the graphs is stored as a single CSR structure
+        (with one indptr per graph and sorted indices, as the adjacency
+        matrices of the operations), the edge weights as a float array (nan if
+        the edge has no weight) and the node attributes 'feat' and 'label' as
+        arrays with one row per node (integer labels are kept as integers).
+        The position in the CSR of each neighbour of each node, in the
+        adjacency order of the graph, is stored as well, so that the graph
+        rebuilt in the worker has the neighbour order of the original graph.
+        The graph attributes in SHARED_GRAPH_ATTRIBUTES are sent with the
+        offsets of each graph.
+
+        Each artifact is stored as a flat array concatenating its values for
+        all the graphs, the offset and shape of the value of each graph being
+        in artifact_offsets (the artifacts given as lists of arrays, such as
+        the feature convolutions, are stacked into one array).
+
+        Parameters
+        ----------
+
+        graphs: list
+            list of undirected networkx graphs
+        artifacts: list
+            dict of artifacts of each graph (or None), as given by hcga.batch.batch_artifacts
+
+        Only the edge weights and the node attributes used by the operations
+        are transferred, and the nodes are relabelled from 0 to N-1 following
+        the node order of each graph.
+
+    """
+
+    def __init__(self, graphs, artifacts = None):
+
+        self.segments = []
+        self.metadata = {}
+        self.offsets = []
+        self.graph_attributes = []
+        self.artifact_offsets = [{} for G in graphs]
+
+        n_nodes = np.array([len(G) for G in graphs], dtype=np.int64)
+        n_entries = np.array([2*G.number_of_edges() - nx.number_of_selfloops(G) for G in graphs], dtype=np.int64)
+
+        node_starts = np.concatenate([[0], np.cumsum(n_nodes)])
+        entry_starts = np.concatenate([[0], np.cumsum(n_entries)])
+        indptr_starts = node_starts + np.arange(len(graphs) + 1)
+
+        # the indices of each graph start from 0, so they fit in the int32 indices of scipy
+        index_dtype = np.int32 if n_entries.max(initial=0) < np.iinfo(np.int32).max else np.int64
+        indptr = self._create('indptr', (indptr_starts[-1],), index_dtype)
+        indices = self._create('indices', (entry_starts[-1],), index_dtype)
+        adjacency_order = self._create('adjacency_order', (entry_starts[-1],), index_dtype)
+        weights = self._create('weights', (entry_starts[-1],), np.float64)
+
+        feat_shape = _attribute_shape(graphs, 'feat')
+        label_shape = _attribute_shape(graphs, 'label')
+        if feat_shape is not None:
+            feats = self._create('feat', (node_starts[-1],) + feat_shape, np.float64)
+        if label_shape is not None:
+            labels = self._create('label', (node_starts[-1],) + label_shape, np.float64 if label_shape else np.int64)
+
+        for i, G in enumerate(graphs):
+            node_index = {u: j for j, u in enumerate(G)}
+
+            # fill the CSR arrays of this graph, with the neighbours of each node sorted
+            rows = np.repeat(np.arange(n_nodes[i]), [len(nbrs) for nbrs in G.adj.values()])
+            cols = np.fromiter((node_index[v] for nbrs in G.adj.values() for v in nbrs), dtype=np.int64, count=n_entries[i])
+            data = np.fromiter((d.get('weight', np.nan) for nbrs in G.adj.values() for d in nbrs.values()), dtype=np.float64, count=n_entries[i])
+            order = np.lexsort((cols, rows))
+
+            entry_slice = slice(entry_starts[i], entry_starts[i+1])
+            indptr[indptr_starts[i]:indptr_starts[i+1]] = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_nodes[i]))])
+            indices[entry_slice] = cols[order]
+            weights[entry_slice] = data[order]
+            adjacency_order[entry_starts[i] + order] = np.arange(n_entries[i])
+
+            node_slice = slice(node_starts[i], node_starts[i+1])
+            if feat_shape is not None:
+                feats[node_slice] = [G.nodes[u]['feat'] for u in G]
+            if label_shape is not None:
+                labels[node_slice] = [G.nodes[u]['label'] for u in G]
+
+            self.offsets.append((indptr_starts[i], indptr_starts[i+1],
+                                 entry_starts[i], entry_starts[i+1],
+                                 node_starts[i], node_starts[i+1]))
+            self.graph_attributes.append({key: G.graph[key] for key in SHARED_GRAPH_ATTRIBUTES if key in G.graph})
+
+        if artifacts is not None:
+            self._share_artifacts(artifacts)
+
+    def _share_artifacts(self, artifacts):
+        """Pack the artifacts of the graphs into one shared array per artifact"""
+
+        names = sorted({name for graph_artifacts in artifacts if graph_artifacts for name in graph_artifacts})
+        for name in names:
+            values = {i: np.asarray(graph_artifacts[name]) for i, graph_artifacts in enumerate(artifacts)
+                      if graph_artifacts and graph_artifacts.get(name) is not None}
+            if not values:
+                continue
+
+            sizes = np.array([value.size for value in values.values()], dtype=np.int64)
+            starts = np.concatenate([[0], np.cumsum(sizes)])
+            shared = self._create(ARTIFACT_PREFIX + name, (starts[-1],), np.result_type(*values.values()))
+            for start, end, (i, value) in zip(starts[:-1], starts[1:], values.items()):
+                shared[start:end] = value.ravel()
+                self.artifact_offsets[i][name] = (start, value.shape)
+
+    def _create(self, name, shape, dtype):
+        """Create a shared memory segment and return a numpy view of it"""
+
+        nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        segment = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.segments.append(segment)
+        self.metadata[name] = (segment.name, shape, np.dtype(dtype).str)
+
+        return np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+    def close(self):
+        """Release the shared memory segments"""
+
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _attribute_shape(graphs, key):
+    """
+    Return the shape of a node attribute if all nodes of all graphs have it as
+    a vector of the same dimension, (dim,), or as an integer, (). Return None if
+    no node has it and False otherwise.
+    """
+
+    shapes = set()
+    for G in graphs:
+        for u in G:
+            if key not in G.nodes[u]:
+                shapes.add(None)
+            elif np.ndim(G.nodes[u][key]) == 1:
+                shapes.add((len(G.nodes[u][key]),))
+            elif isinstance(G.nodes[u][key], (int, np.integer)):
+                shapes.add(())
+            else:
+                return False
+
+    if not shapes or shapes == {None}:
+        return None
+    if len(shapes) > 1:
+        return False
+
+    return shapes.pop()
+
+
+def attach_shared_graphs(metadata):
+    """
+    Attach the shared memory segments in a worker process (used as
+    initializer of the multiprocessing Pool)
+    """
+
+    _shared_arrays.clear()
+    _shared_buffers.clear()
+    for name, (segment_name, shape, dtype) in metadata.items():
+        segment = _attach_segment(segment_name)
+        _shared_segments.append(segment)
+        _shared_buffers[name] = segment.buf
+        _shared_arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+
+def _attach_segment(segment_name):
+    """Attach an existing segment, its cleanup is left to the parent process"""
+
+    try:
+        return shared_memory.SharedMemory(name=segment_name, track=False)
+    except TypeError: # python < 3.13, the workers share the resource tracker of the parent
+        return shared_memory.SharedMemory(name=segment_name)
+
+
+def _shared_slice(name, start, end):
+    """
+    Rows start to end of a shared array, as an array of its own on the shared buffer
+    (scipy.sparse copies the index arrays that are views of a much larger array)
+    """
+
+    array = _shared_arrays[name]
+
+    return np.ndarray((end - start,) + array.shape[1:], dtype=array.dtype,
+                      buffer=_shared_buffers[name], offset=start * array.strides[0])
+
+
+def _shared_csr(offsets):
+    """CSR arrays (indptr, indices, weights, adjacency_order) of a graph in the shared arrays"""
+
+    ptr_start, ptr_end, entry_start, entry_end, node_start, node_end = offsets
+
+    return (_shared_slice('indptr', ptr_start, ptr_end),
+            _shared_slice('indices', entry_start, entry_end),
+            _shared_slice('weights', entry_start, entry_end),
+            _shared_slice('adjacency_order', entry_start, entry_end))
+
+
+def shared_graph(offsets, graph_attributes = None):
+    """
+    Rebuild a graph in a worker process from its offsets in the shared arrays
+    (the node features are views of the shared arrays)
+    """
+
+    indptr, indices, weights, adjacency_order = _shared_csr(offsets)
+    node_start, node_end = offsets[4:]
+    n_nodes = node_end - node_start
+
+    G = nx.Graph(**(graph_attributes or {}))
+    node_attributes = [{} for u in range(n_nodes)]
+    if 'feat' in _shared_arrays:
+        for attrs, feat in zip(node_attributes, _shared_arrays['feat'][node_start:node_end]):
+            attrs['feat'] = feat
+    if 'label' in _shared_arrays:
+        for attrs, label in zip(node_attributes, _shared_arrays['label'][node_start:node_end].tolist()):
+            attrs['label'] = label
+    G.add_nodes_from(zip(range(n_nodes), node_attributes))
+
+    # each edge once, from its end with the smallest index, following the adjacency order of the
+    # original graph (the cycle bases and other traversals depend on the order of the neighbours)
+    rows = np.repeat(np.arange(n_nodes), np.diff(indptr))
+    neighbours = indices[adjacency_order]
+    upper = neighbours >= rows
+    edges = zip(rows[upper].tolist(), neighbours[upper].tolist())
+    edge_weights = weights[adjacency_order][upper]
+    weighted = ~np.isnan(edge_weights)
+    if weighted.all():
+        G.add_edges_from((u, v, {'weight': w}) for (u, v), w in zip(edges, edge_weights.tolist()))
+    elif not weighted.any():
+        G.add_edges_from(edges)
+    else:
+        G.add_edges_from((u, v, {'weight': w} if has_weight else {})
+                         for (u, v), w, has_weight in zip(edges, edge_weights.tolist(), weighted.tolist()))
+
+    return G
+
+
+def shared_artifacts(G, offsets, artifact_offsets = None):
+    """
+    Artifacts of a graph rebuilt by shared_graph, as views of the shared arrays: the artifacts
+    computed in batch and, if the graph is connected (the operations then use it as its own
+    largest connected component), its adjacency matrix and node features
+
+    The views are writable, as the Cython routines of scipy.sparse.csgraph only accept
+    writable buffers, but they are shared by all the graphs: the operations must not
+    modify their artifacts in place.
+    """
+
+    artifacts = {}
+    for name, (start, shape) in (artifact_offsets or {}).items():
+        value = _shared_arrays[ARTIFACT_PREFIX + name][start:start + int(np.prod(shape))].reshape(shape)
+        artifacts[name] = value if shape else value[()]
+
+    if len(G) == 0 or not nx.is_connected(G):
+        return artifacts
+
+    # weighted adjacency matrix as in hcga.Operations.precomputed (missing weights are 1),
+    # sharing the indices of the CSR arrays
+    indptr, indices, weights, adjacency_order = _shared_csr(offsets)
+    data = np.where(np.isnan(weights), 1., weights)
+    artifacts['adjacency'] = scipy.sparse.csr_matrix((data, indices, indptr), shape=(len(G), len(G)))
+    if 'feat' in _shared_arrays:
+        node_start, node_end = offsets[4:]
+        node_matrix = _shared_arrays['feat'][node_start:node_end]
+        artifacts['node_features'] = node_matrix.reshape(-1, 1) if node_matrix.ndim == 1 else node_matrix
+
+    return artifacts
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Structural holes (Burt's constraint and effective size) on sparse matrices.
+
+The measures of networkx.structuralholes are sums over the pairs of neighbours
+of each node of products of normalised mutual weights, so they are computed for
+all the nodes at once with sparse products restricted to the edges of the graph,
+from the mutual weights M = W + W^T of the (directed or undirected) weighted
+adjacency matrix W. The neighbours of a node are its predecessors and successors
+(networkx gives nan to the nodes of directed graphs without successors, here only
+the nodes without neighbours are nan).
+
+The self-loops are ignored: a node is not its own neighbour, and the self-loop of
+a neighbour is not a tie (networkx counts both, which can give negative effective
+sizes).
+"""
+
+import numpy as np
+import scipy.sparse
+
+
+def _without_selfloops(W):
+    """Weighted adjacency matrix without the self-loops"""
+
+    W = scipy.sparse.csr_matrix(W, dtype = np.float64)
+    W = (W - scipy.sparse.diags(W.diagonal())).tocsr()
+    W.eliminate_zeros()
+
+    return W
+
+
+def _neighbourhoods(W):
+    """Binary symmetric matrix of the neighbours (predecessors or successors) of the nodes"""
+
+    W = scipy.sparse.csr_matrix(W)
+    B = scipy.sparse.csr_matrix((np.ones(W.nnz), W.indices, W.indptr), shape = W.shape)
+
+    return ((B + B.T) > 0).astype(np.float64).tocsr()
+
+
+def _row_scaled(M, scale):
+    """Rows of M divided by the scale of each row (0 if the scale is 0)"""
+
+    with np.errstate(divide = 'ignore'):
+        inverse_scale = np.where(scale != 0, 1. / scale, 0.)
+
+    return (scipy.sparse.diags(inverse_scale) @ M).tocsr()
+
+
+def normalized_mutual_weights(W):
+    """Mutual weights M = W + W^T and their normalisations by the sum (P) and by the maximum
+    of each row, as networkx.structuralholes.normalized_mutual_weight
+    """
+
+    M = scipy.sparse.csr_matrix(W + W.T)
+    P = _row_scaled(M, np.asarray(M.sum(axis = 1)).ravel())
+    M_max = _row_scaled(M, M.max(axis = 1).toarray().ravel())
+
+    return M, P, M_max
+
+
+def constraint(W):
+    """Constraint of all the nodes, as networkx.structuralholes.constraint
+
+    The local constraint of u with respect to a neighbour v is (P_uv + (P P)_uv)^2, and the
+    constraint of u the sum of its local constraints, nan for the nodes without neighbours.
+
+    Parameters
+    ----------
+    W : sparse matrix
+        weighted adjacency matrix of a directed or undirected graph
+
+    Returns
+    -------
+    constraint : array
+        constraint of each node
+    """
+
+    W = _without_selfloops(W)
+    B = _neighbourhoods(W)
+    _, P, _ = normalized_mutual_weights(W)
+
+    local_constraint = (P + P @ P).multiply(B).tocsr()
+    local_constraint.data **= 2
+
+    return np.where(np.diff(B.indptr) > 0, np.asarray(local_constraint.sum(axis = 1)).ravel(), np.nan)
+
+
+def effective_size(W):
+    """Effective size of all the nodes, as networkx.structuralholes.effective_size
+
+    The redundancy of u is the sum over its pairs of neighbours v, w of P_uw M_max_vw, so the
+    effective size is the number of neighbours minus the sum over the edges (u, w) of
+    P_uw (B M_max)_uw, with B the neighbourhood matrix. For unweighted undirected graphs, this
+    is n - 2t/n (Borgatti 1997), with n the number of neighbours and t the number of edges
+    between them. It is nan for the nodes without neighbours.
+
+    Parameters
+    ----------
+    W : sparse matrix
+        weighted adjacency matrix of a directed or undirected graph
+
+    Returns
+    -------
+    effective_size : array
+        effective size of each node
+    """
+
+    W = _without_selfloops(W)
+    B = _neighbourhoods(W)
+    _, P, M_max = normalized_mutual_weights(W)
+
+    n_neighbours = np.diff(B.indptr)
+    redundancy = np.asarray((B @ M_max).multiply(P).sum(axis = 1)).ravel()
+
+    return np.where(n_neighbours > 0, n_neighbours - redundancy, np.nan)
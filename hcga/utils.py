@@ -25,6 +25,7 @@ import numpy as np
 import scipy as sc
 import os
 import re
+import hashlib
 
 def read_graphfile(datadir, dataname, max_nodes=None):
     ''' Read data from https://ls11-www.cs.tu-dortmund.de/staff/morris/graphkerneldatasets
@@ -32,6 +33,7 @@ def read_graphfile(datadir, dataname, max_nodes=None):
 
     Returns:
         List of networkx objects with graph and node labels
+        (node labels are integers, their number is in the graph attribute 'num_node_labels')
     '''
     prefix = os.path.join(datadir, dataname, dataname)
     filename_graph_indic = prefix + '_graph_indicator.txt'
@@ -112,12 +114,11 @@ def read_graphfile(datadir, dataname, max_nodes=None):
       
         # add features and labels
         G.graph['label'] = graph_labels[i-1]
+        if len(node_labels) > 0:
+            G.graph['num_node_labels'] = num_unique_node_labels
         for u in G.nodes():
             if len(node_labels) > 0:
-                node_label_one_hot = [0] * num_unique_node_labels
-                node_label = node_labels[u-1]
-                node_label_one_hot[node_label] = 1
-                G.nodes[u]['label'] = node_label_one_hot		
+                G.nodes[u]['label'] = node_labels[u-1]
             if len(node_attrs) > 0:
                 G.nodes[u]['feat'] = node_attrs[u-1]
         if len(node_attrs) > 0:
@@ -139,3 +140,98 @@ def read_graphfile(datadir, dataname, max_nodes=None):
         graphs.append(nx.relabel_nodes(G, mapping))
     return graphs, graph_labels
 
+
+def largest_connected_subgraph(G):
+    ''' Largest connected component of a graph, with nodes relabelled from 0 to N-1
+
+    Returns the graph itself if it is connected. The operations and the batched
+    computations all use this function, so that their node orders agree. The
+    nodes and edges of the component are taken in the order of G (a subgraph
+    view follows the order of the component set instead), so that a graph and
+    its copy relabelled from 0 to N-1 give the same component.
+    '''
+
+    if nx.is_connected(G):
+        return G
+
+    component = max(nx.connected_components(G), key=len)
+    nodes = [u for u in G if u in component]
+    mapping = {u: i for i, u in enumerate(nodes)}
+
+    Gc = G.__class__()
+    Gc.graph.update(G.graph)
+    Gc.add_nodes_from((mapping[u], G.nodes[u]) for u in nodes)
+    if G.is_multigraph():
+        Gc.add_edges_from((mapping[u], mapping[v], k, d) for u, v, k, d in G.edges(nodes, keys=True, data=True))
+    else:
+        Gc.add_edges_from((mapping[u], mapping[v], d) for u, v, d in G.edges(nodes, data=True))
+
+    return Gc
+
+
+def graph_hash(G, node_attributes = ['feat', 'label'], edge_attribute = 'weight', iterations = 3):
+    ''' Weisfeiler-Lehman hash of a graph, including node and edge attributes
+
+    Isomorphic graphs with the same attributes have the same hash, but different
+    graphs may share a hash, see unique_graphs for the exact check.
+
+    Returns:
+        Hexadecimal string
+    '''
+
+    def _hash(string):
+        return hashlib.blake2b(string.encode(), digest_size = 16).hexdigest()
+
+    labels = {}
+    for u in G:
+        attributes = [repr(np.asarray(G.nodes[u][key]).tolist()) for key in node_attributes if key in G.nodes[u]]
+        labels[u] = _hash(','.join(attributes))
+
+    for it in range(iterations):
+        labels = {u: _hash(labels[u] + ''.join(sorted(labels[v] + repr(G[u][v].get(edge_attribute)) for v in G[u])))
+                  for u in G}
+
+    return _hash('{},{},'.format(G.number_of_nodes(), G.number_of_edges()) + ''.join(sorted(labels.values())))
+
+
+def unique_graphs(graphs, node_attributes = ['feat', 'label'], edge_attribute = 'weight'):
+    ''' Group the graphs in classes of isomorphic graphs with identical attributes
+
+    The graphs are bucketed by their Weisfeiler-Lehman hash, then compared
+    exactly with an isomorphism test within each bucket.
+
+    Returns:
+        index of the first graph of each class, and class index of each graph
+    '''
+
+    def _node_match(attributes_1, attributes_2):
+        for key in node_attributes:
+            if (key in attributes_1) != (key in attributes_2):
+                return False
+            if key in attributes_1 and not np.array_equal(attributes_1[key], attributes_2[key]):
+                return False
+        return True
+
+    def _edge_match(attributes_1, attributes_2):
+        return attributes_1.get(edge_attribute) == attributes_2.get(edge_attribute)
+
+    representatives = []
+    classes = []
+    buckets = {}
+    for i, G in enumerate(graphs):
+        bucket = buckets.setdefault(graph_hash(G, node_attributes, edge_attribute), [])
+
+        graph_class = None
+        for c in bucket:
+            if nx.is_isomorphic(graphs[representatives[c]], G, node_match = _node_match, edge_match = _edge_match):
+                graph_class = c
+                break
+
+        if graph_class is None:
+            graph_class = len(representatives)
+            representatives.append(i)
+            bucket.append(graph_class)
+
+        classes.append(graph_class)
+
+    return representatives, np.array(classes, dtype = int)
@@ -13,7 +13,6 @@ setup(
                      'networkx',
                      'statsmodels', 
                      'sklearn', 
-                     'fa2', 
                      'xgboost', 
                      'seaborn'], #external packages as dependencies
    include_package_data = True
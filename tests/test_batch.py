@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# This file is part of hcga.
+#
+# Copyright (C) 2019,
+# Robert Peach (r.peach13@imperial.ac.uk),
+# Alexis Arnaudon (alexis.arnaudon@epfl.ch),
+# https://github.com/ImperialCollegeLondon/hcga.git
+#
+# hcga is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# hcga is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hcga.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import networkx as nx
+import pytest
+
+from hcga import shared_graphs
+from hcga.batch import batch_artifacts
+from hcga.graphs import calculate_features_shared_graph, calculate_features_single_graph
+from hcga.utils import largest_connected_subgraph
+
+
+def disconnected_graph():
+    """Graph with nodes 10 to 23 added out of order, whose largest component has 6 nodes"""
+
+    G = nx.Graph()
+    nodes = [17, 12, 23, 10, 20, 15, 13, 22, 11, 18, 21, 14, 16, 19]
+    for u in nodes:
+        G.add_node(u, feat = np.array([u, u % 3, u % 5], dtype = float))
+
+    # largest component, whose nodes are not in set order in G
+    G.add_edges_from([(17, 12), (12, 23), (23, 10), (10, 17), (17, 20), (20, 15)], weight = 2.)
+    G.add_edges_from([(13, 22), (22, 11), (11, 13), (18, 21), (14, 16), (16, 19)])
+
+    return G
+
+
+def connected_graph():
+    """Connected graph with nodes 0 to 13 (as the datasets), with unsorted neighbours,
+    a self-loop and some unweighted edges
+    """
+
+    G = disconnected_graph()
+    G.add_edges_from([(15, 13), (11, 18), (21, 14), (19, 19)])
+
+    return nx.convert_node_labels_to_integers(G)
+
+
+def test_largest_connected_subgraph_order():
+    G = disconnected_graph()
+    Gc = largest_connected_subgraph(G)
+
+    assert list(Gc) == list(range(6))
+    assert [G.nodes[u]['feat'][0] for u in [17, 12, 23, 10, 20, 15]] == [Gc.nodes[u]['feat'][0] for u in Gc]
+
+
+@pytest.mark.skipif(shared_graphs.shared_memory is None, reason = 'shared memory requires python >= 3.8')
+@pytest.mark.parametrize('graph', [disconnected_graph, connected_graph])
+def test_batched_shared_features(graph):
+    G = graph()
+
+    unbatched = calculate_features_single_graph('fast', graph()).feature_dict
+
+    with shared_graphs.SharedGraphs([G], batch_artifacts([G])) as shared:
+        shared_graphs.attach_shared_graphs(shared.metadata)
+        batched = calculate_features_shared_graph('fast', shared.offsets[0], shared.graph_attributes[0], shared.artifact_offsets[0]).feature_dict
+
+    assert 'NFC' in batched
+    assert batched.keys() == unbatched.keys()
+    for name in unbatched:
+        assert batched[name].keys() == unbatched[name].keys(), name
+        for feature in unbatched[name]:
+            assert np.allclose(batched[name][feature], unbatched[name][feature], equal_nan = True), (name, feature)